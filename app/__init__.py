@@ -13,6 +13,9 @@ def create_app():
     cors.init_app(app)
     migrate.init_app(app,db)
     
+    # Agregados de família ficam em flask.g só durante a requisição
+    app.teardown_request(Family.clear_aggregates_cache)
+    
     app.register_blueprint(auth.auth_bp)
     app.register_blueprint(family.family_bp)
     app.register_blueprint(asset.asset_bp)
@@ -7,4 +7,97 @@ class Config:
     SECRET_KEY = os.getenv("SECRET_KEY", "secret")
     SQLALCHEMY_DATABASE_URI = os.getenv("DATABASE_URL", "sqlite:///local.db")
     SQLALCHEMY_TRACK_MODIFICATIONS = False
-    JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY", "jwt-secret")
\ No newline at end of file
+    JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY", "jwt-secret")
+
+    # Atualização de cotações (pool de threads, limite por provedor e prazo total)
+    QUOTE_FETCH_MAX_WORKERS = int(os.getenv("QUOTE_FETCH_MAX_WORKERS", "16"))
+    QUOTE_FETCH_DEADLINE_SECONDS = float(os.getenv("QUOTE_FETCH_DEADLINE_SECONDS", "30"))
+    QUOTE_PROVIDER_CONCURRENCY = {
+        "yahoo_finance": 8,
+        "coingecko": 2,
+        "bacen": 2,
+        "alpha_vantage": 1
+    }
+    # Cadeia de provedores por tipo de ativo (reordenada pela saúde observada),
+    # timeout por requisição e circuit breaker por provedor
+    QUOTE_PROVIDER_CHAINS = {
+        "renda_variavel": ["yahoo_finance", "alpha_vantage"],
+        "criptomoeda": ["coingecko"],
+        "moeda_estrangeira": ["bacen"]
+    }
+    QUOTE_PROVIDER_TIMEOUT_SECONDS = float(os.getenv("QUOTE_PROVIDER_TIMEOUT_SECONDS", "10"))
+    QUOTE_PROVIDER_SLOW_SECONDS = float(os.getenv("QUOTE_PROVIDER_SLOW_SECONDS", "2"))
+    QUOTE_BREAKER_FAILURE_THRESHOLD = int(os.getenv("QUOTE_BREAKER_FAILURE_THRESHOLD", "3"))
+    QUOTE_BREAKER_RESET_SECONDS = float(os.getenv("QUOTE_BREAKER_RESET_SECONDS", "60"))
+    # Modo dos provedores: "live", "record" (grava respostas em fixtures) ou
+    # "replay" (responde das fixtures, com latência e falhas injetadas)
+    QUOTE_PROVIDER_MODE = os.getenv("QUOTE_PROVIDER_MODE", "live")
+    QUOTE_FIXTURES_DIR = os.getenv("QUOTE_FIXTURES_DIR", "data/quote_fixtures")
+    QUOTE_REPLAY_LATENCY_MS = float(os.getenv("QUOTE_REPLAY_LATENCY_MS", "0"))
+    QUOTE_REPLAY_JITTER_MS = float(os.getenv("QUOTE_REPLAY_JITTER_MS", "0"))
+    QUOTE_REPLAY_ERROR_RATE = float(os.getenv("QUOTE_REPLAY_ERROR_RATE", "0"))
+    # Semente das falhas injetadas e das cotações simuladas (vazio = aleatório)
+    QUOTE_PROVIDER_SEED = int(os.getenv("QUOTE_PROVIDER_SEED")) if os.getenv("QUOTE_PROVIDER_SEED") else None
+    # Símbolos por requisição nos provedores que aceitam vários de uma vez
+    # (o Yahoo não entra: o endpoint v7 em lote exige o handshake de crumb/cookie)
+    QUOTE_PROVIDER_BATCH_SIZE = {
+        "coingecko": 250
+    }
+    # Linhas por INSERT ao gravar o histórico de cotações
+    QUOTE_INSERT_CHUNK_SIZE = int(os.getenv("QUOTE_INSERT_CHUNK_SIZE", "1000"))
+
+    # Janela (dias) do histórico usado em volatilidade, covariância e correlação
+    RISK_LOOKBACK_DAYS = int(os.getenv("RISK_LOOKBACK_DAYS", "90"))
+
+    # VaR/CVaR: confiança, horizontes (dias) e Monte Carlo (caminhos, processos
+    # do pool, 0 = um por CPU, e semente para resultados reproduzíveis)
+    RISK_VAR_CONFIDENCE = float(os.getenv("RISK_VAR_CONFIDENCE", "0.95"))
+    RISK_VAR_HORIZONS = [1, 10]
+    RISK_MC_PATHS = int(os.getenv("RISK_MC_PATHS", "100000"))
+    RISK_MC_WORKERS = int(os.getenv("RISK_MC_WORKERS", "0"))
+    RISK_MC_SEED = int(os.getenv("RISK_MC_SEED", "0"))
+
+    # Snapshots de risco: intervalo do worker que recalcula as famílias
+    # alteradas, famílias por execução e retenção da série histórica (0 = sempre)
+    RISK_SNAPSHOT_INTERVAL_SECONDS = int(os.getenv("RISK_SNAPSHOT_INTERVAL_SECONDS", "60"))
+    RISK_SNAPSHOT_BATCH_SIZE = int(os.getenv("RISK_SNAPSHOT_BATCH_SIZE", "100"))
+    RISK_SNAPSHOT_RETENTION_DAYS = int(os.getenv("RISK_SNAPSHOT_RETENTION_DAYS", "365"))
+
+    # Stress test: perda máxima (% do patrimônio) por tolerância de risco do
+    # perfil de suitability, padrão sem perfil, indexadores pós-fixados (sem
+    # sensibilidade a juros) e cenários por requisição
+    STRESS_LOSS_LIMITS = {
+        "conservative": 5.0,
+        "moderate": 10.0,
+        "aggressive": 20.0
+    }
+    STRESS_DEFAULT_LOSS_LIMIT = float(os.getenv("STRESS_DEFAULT_LOSS_LIMIT", "10"))
+    STRESS_FLOATING_INDICES = ["CDI", "SELIC"]
+    STRESS_MAX_SCENARIOS = int(os.getenv("STRESS_MAX_SCENARIOS", "50"))
+
+    # Stream (SSE) de cotações e valuation por família: eventos na fila de
+    # cada cliente, intervalo do keep-alive e reconexão sugerida ao navegador.
+    # No PostgreSQL os workers recebem as cotações via LISTEN/NOTIFY no canal
+    PRICE_STREAM_CHANNEL = os.getenv("PRICE_STREAM_CHANNEL", "price_stream")
+    PRICE_STREAM_QUEUE_SIZE = int(os.getenv("PRICE_STREAM_QUEUE_SIZE", "100"))
+    PRICE_STREAM_HEARTBEAT_SECONDS = float(os.getenv("PRICE_STREAM_HEARTBEAT_SECONDS", "15"))
+    PRICE_STREAM_RETRY_MS = int(os.getenv("PRICE_STREAM_RETRY_MS", "3000"))
+
+    # Cache de cotações: validade por provedor (s), tempo máximo servindo preço
+    # antigo enquanto atualiza em segundo plano e cache de falhas
+    QUOTE_CACHE_TTL = {
+        "yahoo_finance": 60,
+        "alpha_vantage": 300,
+        "coingecko": 60,
+        "bacen": 3600
+    }
+    QUOTE_CACHE_MAX_STALE_SECONDS = int(os.getenv("QUOTE_CACHE_MAX_STALE_SECONDS", "86400"))
+    QUOTE_NEGATIVE_CACHE_TTL_SECONDS = int(os.getenv("QUOTE_NEGATIVE_CACHE_TTL_SECONDS", "300"))
+
+    # Retenção do histórico de cotações: cotações brutas (intradiárias) e
+    # barras diárias OHLC; 0 mantém as barras indefinidamente
+    QUOTE_RAW_RETENTION_DAYS = int(os.getenv("QUOTE_RAW_RETENTION_DAYS", "30"))
+    QUOTE_BAR_RETENTION_DAYS = int(os.getenv("QUOTE_BAR_RETENTION_DAYS", "1825"))
+
+    # Histórico de preços em arquivos colunares (por ativo e mês) para análises
+    PRICE_HISTORY_DIR = os.getenv("PRICE_HISTORY_DIR", "data/price_history")
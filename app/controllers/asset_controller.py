@@ -4,10 +4,16 @@ from app.schema.asset_schema import AssetSchema
 from app.config.extensions import db
 from app.decorators.family_access import require_family
 from app.services.asset_validation_service import AssetValidationService
+from app.services.asset_loader import AssetLoader
 from sqlalchemy import cast, String
+from datetime import datetime
 
 asset_schema = AssetSchema()
 assets_schema = AssetSchema(many=True)
+asset_identity_schema = AssetSchema(only=(
+    "id", "name", "asset_type", "family_id", "details", "ticker",
+    "indexador", "coin_id", "currency", "asset_class"
+))
 
 def list_assets_controller(req):
     family_id = req.args.get("family_id")
@@ -27,9 +33,43 @@ def list_assets_controller(req):
     if not user or not any(f.id == family_id for f in user.families):
         return jsonify({"error": "Acesso à familia negado"}), 403
     
-    assets = Asset.query.filter_by(family_id=family_id).all()
+    as_of = req.args.get("as_of")
+    if as_of:
+        try:
+            as_of = datetime.strptime(as_of, "%Y-%m-%d").date()
+        except ValueError:
+            return jsonify({"error": "as_of deve estar no formato YYYY-MM-DD"}), 400
+        return jsonify(_holdings_as_of(family_id, as_of)), 200
+    
+    # Carrega posições, contagem de transações e última cotação em lote
+    assets = AssetLoader.load_family_assets(family_id)
     return jsonify(assets_schema.dump(assets)), 200
 
+def _holdings_as_of(family_id, as_of):
+    """Posições e valores da família no fechamento de as_of"""
+    holdings = []
+    for asset, snapshot, quote in AssetLoader.load_family_holdings_as_of(family_id, as_of):
+        data = asset_identity_schema.dump(asset)
+        cost_basis = round(snapshot.cost_basis, 2)
+        market_price = quote.price if quote is not None else None
+        market_value = round(snapshot.quantity * market_price, 2) if market_price is not None else None
+        data.update({
+            "as_of": as_of.isoformat(),
+            "current_quantity": round(snapshot.quantity, 6),
+            "current_value": cost_basis,
+            "average_cost": round(snapshot.average_cost, 2),
+            "total_invested": round(snapshot.total_invested, 2),
+            "total_divested": round(snapshot.total_divested, 2),
+            "realized_gain_loss": round(snapshot.realized_gain_loss, 2),
+            "market_price": market_price,
+            "price_date": quote.timestamp.isoformat() if quote is not None else None,
+            "market_value": market_value,
+            "unrealized_gain_loss": round(market_value - cost_basis, 2)
+                if market_value is not None and snapshot.quantity > 0 else 0.0
+        })
+        holdings.append(data)
+    return holdings
+
 def get_asset_controller(asset_id):
     family_id = request.args.get("family_id")
     if not family_id:
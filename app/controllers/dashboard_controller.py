@@ -21,11 +21,11 @@ def dashboard_controller(req):
     user = db.session.get(User, user_id)
     if not user or not any(f.id == family_id for f in user.families):
         return jsonify({"error": "Acesso à família negado"}), 403
-    # Agregação de dados baseada no novo sistema de patrimônio
-    ativos = Asset.query.filter_by(family_id=family_id).all()
+    # Agregados calculados em uma única consulta GROUP BY sobre asset_positions
+    agregados = family.get_aggregates()
     
     # Patrimônio investido (soma dos valores atuais dos ativos)
-    patrimonio_investido = family.total_invested
+    patrimonio_investido = agregados["total_invested"]
     
     # Patrimônio não investido (saldo disponível)
     patrimonio_nao_investido = family.cash_balance
@@ -33,14 +33,15 @@ def dashboard_controller(req):
     # Patrimônio total
     patrimonio_total = family.total_patrimony
     
-    num_ativos = len(ativos)
+    num_ativos = agregados["asset_count"]
     
     # Distribuição por classe baseada no valor atual dos ativos
     distribuicao_classes = []
-    for asset_type, value in family.asset_allocation.items():
+    for asset_type, value in agregados["allocation"].items():
         distribuicao_classes.append({"classe": asset_type, "valor": value})
     
-    # Top 5 ativos por valor atual
+    # Top 5 ativos por valor atual (posições materializadas, sem varrer transações)
+    ativos = Asset.query.filter_by(family_id=family_id).all()
     top_ativos = sorted(ativos, key=lambda x: x.current_value, reverse=True)[:5]
     top_ativos = [
         {
@@ -4,6 +4,7 @@ from flask_jwt_extended import get_jwt_identity
 from app.models.family import Family
 from app.models.user import User
 from app.config.extensions import db
+from app.services.risk_snapshot_service import RiskSnapshotService
 from marshmallow import Schema, fields, ValidationError
 
 
@@ -104,12 +105,17 @@ def get_family_balance_controller(family_id):
         if not user or not any(f.id == family_id for f in user.families):
             return jsonify({"error": "Acesso negado"}), 403
         
+        # Uma única consulta agregada atende todos os campos abaixo
+        aggregates = family.get_aggregates()
+        total_invested = aggregates["total_invested"]
+        total_patrimony = round(total_invested + family.cash_balance, 2)
+        
         return jsonify({
             "cash_balance": family.cash_balance,
-            "total_invested": family.total_invested,
-            "total_patrimony": family.total_patrimony,
-            "percentual_investido": round((family.total_invested / family.total_patrimony * 100) if family.total_patrimony > 0 else 0, 2),
-            "asset_allocation": family.asset_allocation
+            "total_invested": total_invested,
+            "total_patrimony": total_patrimony,
+            "percentual_investido": round((total_invested / total_patrimony * 100) if total_patrimony > 0 else 0, 2),
+            "asset_allocation": aggregates["allocation"]
         }), 200
         
     except Exception as e:
@@ -167,8 +173,46 @@ def get_family_risk_summary_controller(family_id):
             "liquidez_aggregada": round(100 - high_risk_pct, 1),
             "exposicao_cambial": round(high_risk_pct * 0.3, 1),
             "risco_fiscal_regulatorio": round(medium_risk_pct * 0.4, 1),
-            "classificacao_final": classificacao_final
+            "classificacao_final": classificacao_final,
+            # Latest full risk analysis, once the snapshot worker has run
+            "snapshot": _snapshot_point(family_id)
         }), 200
         
     except Exception as e:
-        return jsonify({"error": "Erro interno do servidor"}), 500
\ No newline at end of file
+        return jsonify({"error": "Erro interno do servidor"}), 500
+
+
+def _snapshot_point(family_id):
+    """Headline figures of the family's latest risk snapshot (None before the first)"""
+    snapshot = RiskSnapshotService.latest(family_id)
+    if snapshot is None:
+        return None
+    return {**snapshot.to_point(), "stale": RiskSnapshotService.is_dirty(family_id)}
+
+
+def trigger_family_risk_controller(family_id):
+    """Recompute the family's risk snapshot now"""
+    try:
+        user_id = get_jwt_identity()
+        user = db.session.get(User, user_id)
+        if not user:
+            return jsonify({"error": "Usuário não encontrado"}), 401
+        
+        family = db.session.get(Family, family_id)
+        if not family:
+            return jsonify({"error": "Família não encontrada"}), 404
+            
+        if family not in user.families:
+            return jsonify({"error": "Acesso negado"}), 403
+        
+        snapshot = RiskSnapshotService().compute(family_id)
+        
+        return jsonify({
+            "message": "Score recalculado",
+            "family_id": family_id,
+            "snapshot": snapshot.to_point() if snapshot is not None else None
+        }), 200
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": "Erro interno do servidor"}), 500
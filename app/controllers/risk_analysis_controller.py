@@ -1,12 +1,18 @@
 """Risk Analysis Controller - Análise de risco em tempo real"""
-from flask import jsonify, request
+from flask import Response, jsonify, request
 from app.services.market_data_service import MarketDataService
+from app.services.valuation_service import ValuationService
+from app.services.price_stream import format_event, price_stream, valuation_payload
+from app.services.risk_snapshot_service import RiskSnapshotService
+from app.services.stress_test_service import StressScenario, StressTestService
+from app.config.config import Config
 from app.models.asset import Asset
 from app.config.extensions import db
 from app.decorators.family_access import require_family
 from flask_jwt_extended import get_jwt_identity
 from app.models.user import User
 import logging
+import numpy as np
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
@@ -31,18 +37,105 @@ def get_portfolio_risk_analysis_controller(req):
         if not user or not any(f.id == family_id for f in user.families):
             return jsonify({"error": "Acesso à familia negado"}), 403
         
-        # Obter análise de risco
-        risk_analysis = market_data_service.get_portfolio_risk_analysis(family_id)
+        # Último snapshot persistido (o primeiro é calculado na hora)
+        snapshot = RiskSnapshotService(market_data_service).get_or_compute(family_id)
         
-        if not risk_analysis:
+        if snapshot is None or not snapshot.analysis:
             return jsonify({"error": "Não foi possível analisar o risco da carteira"}), 500
         
-        return jsonify(risk_analysis), 200
+        return jsonify(snapshot_payload(snapshot)), 200
         
     except Exception as e:
         logger.error(f"Erro na análise de risco: {e}")
         return jsonify({"error": "Erro interno do servidor"}), 500
 
+def snapshot_payload(snapshot):
+    """Análise do snapshot com o instante do cálculo e se já há alterações pendentes"""
+    return {
+        **snapshot.analysis,
+        'snapshot_at': snapshot.computed_at.isoformat(),
+        'stale': RiskSnapshotService.is_dirty(snapshot.family_id)
+    }
+
+def get_portfolio_risk_history_controller(req):
+    """Série histórica do risco da carteira (um ponto por snapshot)"""
+    try:
+        family_id = req.args.get("family_id")
+        if not family_id:
+            return jsonify({"error": "family_id é obrigatório"}), 400
+        
+        try:
+            family_id = int(family_id)
+            days = int(req.args.get("days", 30))
+        except (ValueError, TypeError):
+            return jsonify({"error": "family_id e days devem ser números válidos"}), 400
+        
+        if days <= 0:
+            return jsonify({"error": "days deve ser positivo"}), 400
+        
+        # Verificar acesso à família
+        user_id = get_jwt_identity()
+        user = db.session.get(User, user_id)
+        if not user or not any(f.id == family_id for f in user.families):
+            return jsonify({"error": "Acesso à familia negado"}), 403
+        
+        return jsonify({
+            'family_id': family_id,
+            'days': days,
+            'points': RiskSnapshotService.history(family_id, days)
+        }), 200
+        
+    except Exception as e:
+        logger.error(f"Erro na série histórica de risco: {e}")
+        return jsonify({"error": "Erro interno do servidor"}), 500
+
+def run_stress_test_controller(req):
+    """Aplica cenários de estresse às carteiras de várias famílias de uma vez"""
+    try:
+        data = req.get_json(silent=True) or {}
+        
+        scenarios = data.get("scenarios")
+        if not isinstance(scenarios, list) or not scenarios:
+            return jsonify({"error": "scenarios deve ser uma lista não vazia"}), 400
+        if len(scenarios) > Config.STRESS_MAX_SCENARIOS:
+            return jsonify({"error": f"Máximo de {Config.STRESS_MAX_SCENARIOS} cenários por requisição"}), 400
+        
+        try:
+            scenarios = [StressScenario.from_dict(scenario, i) for i, scenario in enumerate(scenarios)]
+            max_loss_pct = data.get("max_loss_pct")
+            if max_loss_pct is not None:
+                max_loss_pct = float(max_loss_pct)
+            family_ids = data.get("family_ids")
+            if family_ids is not None:
+                family_ids = {int(family_id) for family_id in family_ids}
+        except (ValueError, TypeError) as e:
+            return jsonify({"error": str(e)}), 400
+        
+        # Administradores testam a base inteira; demais usuários, só suas famílias
+        user_id = get_jwt_identity()
+        user = db.session.get(User, user_id)
+        if not user:
+            return jsonify({"error": "Usuário não encontrado"}), 401
+        is_admin = any(p.name == "admin" for p in user.permissions)
+        if not is_admin:
+            allowed = {f.id for f in user.families}
+            if family_ids is None:
+                family_ids = allowed
+            elif not family_ids <= allowed:
+                return jsonify({"error": "Acesso à familia negado"}), 403
+        
+        result = StressTestService.run(
+            scenarios,
+            family_ids=family_ids,
+            max_loss_pct=max_loss_pct,
+            only_breaches=bool(data.get("only_breaches", False))
+        )
+        return jsonify(result), 200
+        
+    except Exception as e:
+        logger.error(f"Erro no stress test: {e}")
+        return jsonify({"error": "Erro interno do servidor"}), 500
+
 def get_asset_risk_metrics_controller(asset_id, req):
     """Obtém métricas de risco para um ativo específico"""
     try:
@@ -120,6 +213,47 @@ def update_asset_quotes_controller(req):
         logger.error(f"Erro na atualização de cotações: {e}")
         return jsonify({"error": "Erro interno do servidor"}), 500
 
+def stream_prices_controller(req):
+    """Stream (SSE) de cotações e valuation da família a cada gravação de cotações"""
+    try:
+        family_id = req.args.get("family_id")
+        if not family_id:
+            return jsonify({"error": "family_id é obrigatório"}), 400
+        
+        try:
+            family_id = int(family_id)
+        except (ValueError, TypeError):
+            return jsonify({"error": "family_id deve ser um número válido"}), 400
+        
+        # Verificar acesso à família
+        user_id = get_jwt_identity()
+        user = db.session.get(User, user_id)
+        if not user or not any(f.id == family_id for f in user.families):
+            return jsonify({"error": "Acesso à familia negado"}), 403
+        
+        # Inscrever antes do snapshot para não perder cotações gravadas no meio
+        subscription = price_stream.subscribe(family_id)
+        try:
+            snapshot = valuation_payload(ValuationService.load([family_id]), family_id)
+        except Exception:
+            price_stream.unsubscribe(subscription)
+            raise
+        
+        # O gerador não usa o contexto da aplicação nem a sessão do banco
+        response = Response(
+            price_stream.stream(subscription, initial=[format_event('valuation', snapshot)]),
+            mimetype='text/event-stream'
+        )
+        response.headers['Cache-Control'] = 'no-cache'
+        response.headers['X-Accel-Buffering'] = 'no'
+        # Também cobre o cliente que desconecta antes do primeiro evento
+        response.call_on_close(lambda: price_stream.unsubscribe(subscription))
+        return response
+        
+    except Exception as e:
+        logger.error(f"Erro ao abrir stream de cotações: {e}")
+        return jsonify({"error": "Erro interno do servidor"}), 500
+
 def get_market_overview_controller(req):
     """Obtém visão geral do mercado para análise comparativa"""
     try:
@@ -138,15 +272,15 @@ def get_market_overview_controller(req):
         if not user or not any(f.id == family_id for f in user.families):
             return jsonify({"error": "Acesso à familia negado"}), 403
         
-        # Buscar ativos da família
-        assets = Asset.query.filter_by(family_id=family_id).all()
+        # Carregar a carteira em arrays (valor de mercado, pesos, classes)
+        valuation = ValuationService.load([family_id])
         
-        if not assets:
+        if not len(valuation):
             return jsonify({"error": "Nenhum ativo encontrado"}), 404
         
         # Obter dados de mercado para análise comparativa
         market_overview = {
-            'total_assets': len(assets),
+            'total_assets': len(valuation),
             'asset_types': {},
             'market_performance': {},
             'risk_distribution': {
@@ -167,37 +301,22 @@ def get_market_overview_controller(req):
             }
         }
         
-        # Analisar cada ativo
-        total_value = 0
-        for asset in assets:
-            total_value += asset.current_value or 0
-            
-            # Contar por tipo
-            asset_type = asset.asset_type
-            if asset_type not in market_overview['asset_types']:
-                market_overview['asset_types'][asset_type] = {
-                    'count': 0,
-                    'total_value': 0
-                }
-            market_overview['asset_types'][asset_type]['count'] += 1
-            market_overview['asset_types'][asset_type]['total_value'] += asset.current_value or 0
-        
-        # Calcular percentuais
-        for asset_type in market_overview['asset_types']:
-            market_overview['asset_types'][asset_type]['percentage'] = (
-                market_overview['asset_types'][asset_type]['total_value'] / total_value * 100
-            ) if total_value > 0 else 0
-        
-        # Análise de concentração
+        # Contagem e valor por tipo
+        total_value = valuation.total_value()
+        counts = valuation.type_counts()
+        for asset_type, value in valuation.allocation().items():
+            market_overview['asset_types'][asset_type] = {
+                'count': counts[asset_type],
+                'total_value': value,
+                'percentage': (value / total_value * 100) if total_value > 0 else 0
+            }
+        
+        # Análise de concentração (faixas de 10% e 20% do patrimônio)
         if total_value > 0:
-            for asset in assets:
-                concentration = (asset.current_value or 0) / total_value * 100
-                if concentration <= 10:
-                    market_overview['concentration_analysis']['well_diversified'] += 1
-                elif concentration <= 20:
-                    market_overview['concentration_analysis']['moderately_concentrated'] += 1
-                else:
-                    market_overview['concentration_analysis']['highly_concentrated'] += 1
+            buckets = np.bincount(np.digitize(valuation.weights * 100, [10, 20], right=True), minlength=3)
+            market_overview['concentration_analysis']['well_diversified'] = int(buckets[0])
+            market_overview['concentration_analysis']['moderately_concentrated'] = int(buckets[1])
+            market_overview['concentration_analysis']['highly_concentrated'] = int(buckets[2])
         
         market_overview['total_portfolio_value'] = total_value
         market_overview['analysis_timestamp'] = datetime.now().isoformat()
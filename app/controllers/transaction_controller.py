@@ -1,12 +1,22 @@
 """Transaction controller for handling transaction operations"""
+import base64
+import binascii
+import io
+import json
+from datetime import datetime
+
 from flask import jsonify, request
 from flask_jwt_extended import get_jwt_identity
 from marshmallow import ValidationError
+from sqlalchemy import tuple_
+from sqlalchemy.orm.exc import StaleDataError
 
 from app.models.transaction import Transaction
 from app.models.asset import Asset
 from app.models.user import User
 from app.schema.transaction_schema import TransactionSchema, TransactionSummarySchema
+from app.services.position_service import PositionService
+from app.services.transaction_import_service import TransactionImportService
 from app.config.extensions import db
 
 
@@ -66,6 +76,9 @@ def create_transaction_controller(req):
             # Add to cash when selling
             family.cash_balance += transaction_value
         
+        # Keep the materialized position in the same DB transaction
+        PositionService.record_transaction(asset, transaction)
+        
         db.session.commit()
         
         # Manually serialize to avoid issues with @post_load removal
@@ -86,6 +99,72 @@ def create_transaction_controller(req):
     except ValueError as e:
         db.session.rollback()
         return jsonify({"error": str(e)}), 400
+    except StaleDataError:
+        db.session.rollback()
+        return jsonify({"error": "Position was modified concurrently, please retry"}), 409
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": "Internal server error"}), 500
+
+
+def encode_transaction_cursor(transaction):
+    """Opaque cursor for the position right after ``transaction``"""
+    payload = json.dumps({"created_at": transaction.created_at.isoformat(), "id": transaction.id})
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_transaction_cursor(cursor):
+    """Return the (created_at, id) pair carried by a cursor"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(payload["created_at"]), int(payload["id"])
+    except (binascii.Error, KeyError, TypeError, ValueError, UnicodeDecodeError) as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def bulk_create_transactions_controller(req):
+    """Import many transactions (JSON array or CSV) in one database transaction"""
+    try:
+        user_id = get_jwt_identity()
+        user = db.session.get(User, user_id)
+        if not user:
+            return jsonify({"error": "User not found"}), 404
+        
+        # Accept a CSV upload, a raw CSV body or a JSON array
+        file = req.files.get('file')
+        if file:
+            rows = TransactionImportService.parse_csv(io.TextIOWrapper(file.stream, encoding='utf-8-sig'))
+        elif req.mimetype == 'text/csv':
+            rows = TransactionImportService.parse_csv(io.StringIO(req.get_data(as_text=True)))
+        else:
+            data = req.get_json(silent=True)
+            if isinstance(data, dict):
+                data = data.get('transactions')
+            if not isinstance(data, list):
+                return jsonify({"error": "A JSON array of transactions or a CSV file is required"}), 400
+            rows = data
+        
+        result = TransactionImportService.import_rows(rows, user)
+        if result.errors:
+            db.session.rollback()
+            return jsonify({
+                "error": "No transactions were imported",
+                "imported": 0,
+                "errors": result.errors
+            }), 400
+        
+        db.session.commit()
+        
+        return jsonify({
+            "imported": result.imported,
+            "assets_updated": len(result.asset_ids),
+            "cash_delta": {str(family_id): delta for family_id, delta in result.cash_deltas.items()}
+        }), 201
+        
+    except StaleDataError:
+        db.session.rollback()
+        return jsonify({"error": "Position was modified concurrently, please retry"}), 409
     except Exception as e:
         db.session.rollback()
         return jsonify({"error": "Internal server error"}), 500
@@ -100,6 +179,17 @@ def list_transactions_controller(req):
         transaction_type = req.args.get('transaction_type')
         limit = req.args.get('limit', default=100, type=int)
         offset = req.args.get('offset', default=0, type=int)
+        cursor = req.args.get('cursor')
+        
+        # Keyset mode: position after the (created_at, id) carried by the cursor
+        after = None
+        if cursor is not None and limit < 1:
+            return jsonify({"error": "Limit must be a positive integer"}), 400
+        if cursor:
+            try:
+                after = decode_transaction_cursor(cursor)
+            except ValueError:
+                return jsonify({"error": "Invalid cursor"}), 400
         
         # Verify user access
         user_id = get_jwt_identity()
@@ -132,11 +222,19 @@ def list_transactions_controller(req):
                 return jsonify({"error": "Invalid transaction type"}), 400
             query = query.filter(Transaction.transaction_type == transaction_type)
         
-        # Order by most recent first
-        query = query.order_by(Transaction.created_at.desc())
+        # Order by most recent first (id breaks ties so the order is total)
+        query = query.order_by(Transaction.created_at.desc(), Transaction.id.desc())
         
         # Apply pagination
-        transactions = query.offset(offset).limit(limit).all()
+        if cursor is not None:
+            if after is not None:
+                query = query.filter(tuple_(Transaction.created_at, Transaction.id) < tuple_(*after))
+            # One extra row tells whether there is a next page
+            transactions = query.limit(limit + 1).all()
+            has_more = len(transactions) > limit
+            transactions = transactions[:limit]
+        else:
+            transactions = query.offset(offset).limit(limit).all()
         
         # Manually serialize transactions list
         response_data = []
@@ -154,6 +252,10 @@ def list_transactions_controller(req):
                 "updated_at": t.updated_at.isoformat() if t.updated_at else None
             }
             response_data.append(transaction_data)
+        
+        if cursor is not None:
+            next_cursor = encode_transaction_cursor(transactions[-1]) if has_more else None
+            return jsonify({"items": response_data, "next_cursor": next_cursor}), 200
         return jsonify(response_data), 200
         
     except Exception as e:
@@ -249,6 +351,13 @@ def update_transaction_controller(transaction_id, req):
         if 'quantity' in validated_data or 'unit_price' in validated_data:
             transaction.total_value = round(transaction.quantity * transaction.unit_price, 2)
         
+        # Any field may change which lots are open, so rebuild the position(s)
+        PositionService.rebuild(asset)
+        if transaction.asset_id != asset.id:
+            new_asset = db.session.get(Asset, transaction.asset_id)
+            if new_asset:
+                PositionService.rebuild(new_asset)
+        
         db.session.commit()
         
         # Manually serialize updated transaction
@@ -269,6 +378,9 @@ def update_transaction_controller(transaction_id, req):
     except ValueError as e:
         db.session.rollback()
         return jsonify({"error": str(e)}), 400
+    except StaleDataError:
+        db.session.rollback()
+        return jsonify({"error": "Position was modified concurrently, please retry"}), 409
     except Exception as e:
         db.session.rollback()
         return jsonify({"error": "Internal server error"}), 500
@@ -293,10 +405,14 @@ def delete_transaction_controller(transaction_id):
         
         # Delete transaction
         db.session.delete(transaction)
+        PositionService.rebuild(asset)
         db.session.commit()
         
         return "", 204
         
+    except StaleDataError:
+        db.session.rollback()
+        return jsonify({"error": "Position was modified concurrently, please retry"}), 409
     except Exception as e:
         db.session.rollback()
         return jsonify({"error": "Internal server error"}), 500
@@ -315,32 +431,44 @@ def get_asset_transaction_summary_controller(asset_id):
         if not user or not any(f.id == asset.family_id for f in user.families):
             return jsonify({"error": "Access denied"}), 403
         
-        # Calculate summary data
-        buy_transactions = asset.get_transactions_by_type('buy')
-        sell_transactions = asset.get_transactions_by_type('sell')
-        
-        # Calculate additional metrics
-        current_value = asset.current_quantity * asset.current_price if hasattr(asset, 'current_price') and asset.current_price else 0
-        realized_gain_loss = asset.total_divested - (asset.average_cost * sum(t.quantity for t in sell_transactions)) if sell_transactions else 0
-        unrealized_gain_loss = current_value - (asset.current_quantity * asset.average_cost) if asset.current_quantity > 0 else 0
+        # Single FIFO pass over the ledger: open lots, realized and unrealized results
+        report = asset.lot_report()
+        buy_count = sum(1 for t in asset.transactions if t.transaction_type == 'buy')
+        sell_count = len(asset.transactions) - buy_count
+        
+        latest_price = asset.quote_history[0].price if asset.quote_history else None
+        if latest_price is not None and report.quantity > 0:
+            current_value = round(report.quantity * latest_price, 2)
+        else:
+            current_value = round(report.cost_basis, 2)
+        latest_transaction = asset.get_latest_transaction()
 
         summary = {
             # Novos campos (esperados pelo frontend atual)
-            'current_quantity': asset.current_quantity or 0,
+            'current_quantity': round(report.quantity, 6),
             'current_value': current_value,
-            'average_cost': asset.average_cost or 0,
-            'total_invested': asset.total_invested or 0,
-            'total_divested': asset.total_divested or 0,
-            'realized_gain_loss': realized_gain_loss,
-            'unrealized_gain_loss': unrealized_gain_loss,
+            'average_cost': round(report.average_cost, 2),
+            'total_invested': round(report.total_invested, 2),
+            'total_divested': round(report.total_divested, 2),
+            'realized_gain_loss': round(report.realized_gain_loss, 2),
+            'unrealized_gain_loss': round(report.unrealized_gain_loss(latest_price), 2),
             'transaction_count': len(asset.transactions),
+            'open_lots': [
+                {
+                    'transaction_id': lot.transaction_id,
+                    'acquired_on': lot.acquired_on.isoformat(),
+                    'quantity': lot.quantity,
+                    'unit_price': lot.unit_price
+                }
+                for lot in report.open_lots
+            ],
             
             # Campos antigos (para compatibilidade)
             'total_transactions': len(asset.transactions),
-            'total_buy_transactions': len(buy_transactions),
-            'total_sell_transactions': len(sell_transactions),
-            'net_investment': asset.total_invested - asset.total_divested,
-            'latest_transaction_date': asset.get_latest_transaction().transaction_date if asset.get_latest_transaction() else None
+            'total_buy_transactions': buy_count,
+            'total_sell_transactions': sell_count,
+            'net_investment': report.total_invested - report.total_divested,
+            'latest_transaction_date': latest_transaction.transaction_date if latest_transaction else None
         }
         
         return jsonify(transaction_summary_schema.dump(summary)), 200
@@ -2,10 +2,15 @@ from .user import User
 from .family import Family
 from .permission import Permission
 from .asset import Asset
+from .asset_position import AssetPosition
+from .asset_position_history import AssetPositionHistory
 from .alert import Alert
 from .transaction import Transaction
 from .suitability import SuitabilityProfile
 from .quote_history import QuoteHistory
+from .latest_quote import LatestQuote
+from .quote_daily_bar import QuoteDailyBar
+from .risk_snapshot import RiskSnapshot, RiskDirtyFamily
 from .job_log import JobLog
 
 # Import order matters for SQLAlchemy relationships
@@ -14,9 +19,15 @@ __all__ = [
     'Family', 
     'Permission',
     'Asset',
+    'AssetPosition',
+    'AssetPositionHistory',
     'Alert',
     'Transaction',
     'SuitabilityProfile',
     'QuoteHistory',
+    'LatestQuote',
+    'QuoteDailyBar',
+    'RiskSnapshot',
+    'RiskDirtyFamily',
     'JobLog'
 ]
\ No newline at end of file
@@ -12,4 +12,8 @@ class Alert(db.Model):
     criado_em = db.Column(db.DateTime, default=datetime.utcnow)
 
     family = db.relationship("Family", backref="alerts")
-    asset = db.relationship("Asset", backref="alerts") 
\ No newline at end of file
+    asset = db.relationship("Asset", backref="alerts")
+
+
+# Alertas recentes da família (dashboard e listagem)
+db.Index("ix_alerts_family_id_criado_em", Alert.family_id, Alert.criado_em.desc())
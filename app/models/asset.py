@@ -5,8 +5,14 @@ from sqlalchemy.sql import func
 from sqlalchemy import desc
 from app.services.cache_service import cached, invalidate_cache_pattern
 
+# Marca atributos não pré-carregados pelo AssetLoader
+NOT_PRELOADED = object()
+
 class Asset(db.Model):
     __tablename__ = "assets"
+    __table_args__ = (
+        db.Index("ix_assets_family_id_asset_type", "family_id", "asset_type"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
@@ -31,87 +37,95 @@ class Asset(db.Model):
         cascade="all, delete-orphan",
         order_by="QuoteHistory.timestamp.desc()"
     )
+    position = db.relationship(
+        "AssetPosition",
+        back_populates="asset",
+        uselist=False,
+        lazy="joined",
+        cascade="all, delete-orphan"
+    )
+    current_quote = db.relationship(
+        "LatestQuote",
+        back_populates="asset",
+        uselist=False,
+        cascade="all, delete-orphan"
+    )
+    daily_bars = db.relationship(
+        "QuoteDailyBar",
+        back_populates="asset",
+        cascade="all, delete-orphan",
+        order_by="QuoteDailyBar.bar_date"
+    )
+    position_history = db.relationship(
+        "AssetPositionHistory",
+        back_populates="asset",
+        cascade="all, delete-orphan",
+        order_by="AssetPositionHistory.as_of_date"
+    )
+    
+    # Valores pré-carregados em lote pelo AssetLoader (evita N+1 em listagens)
+    _transaction_count = NOT_PRELOADED
+    _latest_quote = NOT_PRELOADED
+    
+    def lot_report(self):
+        """FIFO lot report (open lots, realized sales) for this asset's ledger"""
+        from app.services.tax_lot_service import TaxLotService
+        return TaxLotService.process(self.transactions)
     
     @property
     def current_quantity(self):
-        """Calculate current quantity based on buy/sell transactions"""
+        """Current quantity held, read from the materialized position"""
+        if self.position is not None:
+            return round(self.position.quantity, 6)
+        
         if not self.transactions:
             return 0.0
         
-        total_quantity = 0.0
-        for transaction in self.transactions:
-            if transaction.transaction_type == "buy":
-                total_quantity += transaction.quantity
-            elif transaction.transaction_type == "sell":
-                total_quantity -= transaction.quantity
-        
-        return round(total_quantity, 6)
+        return round(self.lot_report().quantity, 6)
     
     @property
     def current_value(self):
-        """Calculate current value based on current quantity and average cost"""
-        return round(self.current_quantity * self.average_cost, 2)
-    
-    @property
-    def average_cost(self):
-        """Calculate weighted average cost of current holdings"""
-        if not self.transactions:
-            return 0.0
+        """Cost basis of the open lots (same value summed by Family.get_aggregates)"""
+        if self.position is not None:
+            return round(self.position.cost_basis, 2)
         
-        total_cost = 0.0
-        total_quantity = 0.0
-        
-        # Calculate FIFO average cost
-        remaining_quantity = self.current_quantity
-        if remaining_quantity <= 0:
+        if not self.transactions:
             return 0.0
         
-        # Process transactions in chronological order
-        buy_transactions = [
-            t for t in sorted(self.transactions, key=lambda x: x.transaction_date) 
-            if t.transaction_type == "buy"
-        ]
-        
-        quantity_needed = remaining_quantity
-        for transaction in buy_transactions:
-            if quantity_needed <= 0:
-                break
-            
-            quantity_from_this_transaction = min(quantity_needed, transaction.quantity)
-            total_cost += quantity_from_this_transaction * transaction.unit_price
-            total_quantity += quantity_from_this_transaction
-            quantity_needed -= quantity_from_this_transaction
+        return round(self.lot_report().cost_basis, 2)
+    
+    @property
+    def average_cost(self):
+        """FIFO average cost of current holdings"""
+        if self.position is not None:
+            return self.position.average_cost
         
-        if total_quantity == 0:
+        if not self.transactions:
             return 0.0
         
-        return round(total_cost / total_quantity, 2)
+        return round(self.lot_report().average_cost, 2)
     
     @property
     def total_invested(self):
         """Calculate total amount invested (buy transactions)"""
+        if self.position is not None:
+            return round(self.position.total_invested, 2)
+        
         if not self.transactions:
             return 0.0
         
-        total = 0.0
-        for transaction in self.transactions:
-            if transaction.transaction_type == "buy":
-                total += transaction.total_value
-        
-        return round(total, 2)
+        return round(self.lot_report().total_invested, 2)
     
     @property
     def total_divested(self):
         """Calculate total amount received from sells"""
+        if self.position is not None:
+            return round(self.position.total_divested, 2)
+        
         if not self.transactions:
             return 0.0
         
-        total = 0.0
-        for transaction in self.transactions:
-            if transaction.transaction_type == "sell":
-                total += transaction.total_value
-        
-        return round(total, 2)
+        return round(self.lot_report().total_divested, 2)
     
     @property
     def unrealized_gain_loss(self):
@@ -120,8 +134,8 @@ class Asset(db.Model):
             return 0.0
         
         # Try to get current market price from quote history
-        if hasattr(self, 'quote_history') and self.quote_history:
-            latest_quote = self.quote_history[0]  # Most recent quote
+        latest_quote = self.latest_quote
+        if latest_quote is not None:
             current_price = latest_quote.price
             market_value = self.current_quantity * current_price
             return round(market_value - self.current_value, 2)
@@ -130,46 +144,28 @@ class Asset(db.Model):
     
     @property
     def realized_gain_loss(self):
-        """Calculate realized gain/loss from completed sells"""
-        if not self.transactions:
-            return 0.0
-        
-        total_realized = 0.0
-        for transaction in self.transactions:
-            if transaction.transaction_type == "sell":
-                # Calculate cost basis for this sell
-                cost_basis = self._calculate_cost_basis_for_sell(transaction)
-                realized_gain = transaction.total_value - cost_basis
-                total_realized += realized_gain
+        """Realized gain/loss from completed sells (FIFO lots)"""
+        if self.position is not None:
+            return round(self.position.realized_gain_loss, 2)
         
-        return round(total_realized, 2)
-    
-    def _calculate_cost_basis_for_sell(self, sell_transaction):
-        """Calculate cost basis for a specific sell transaction"""
         if not self.transactions:
             return 0.0
         
-        # Get buy transactions before this sell
-        buy_transactions = [
-            t for t in self.transactions 
-            if t.transaction_type == "buy" and t.transaction_date <= sell_transaction.transaction_date
-        ]
-        
-        # Sort by date (FIFO)
-        buy_transactions.sort(key=lambda x: x.transaction_date)
-        
-        quantity_needed = sell_transaction.quantity
-        cost_basis = 0.0
-        
-        for buy_transaction in buy_transactions:
-            if quantity_needed <= 0:
-                break
-            
-            quantity_from_buy = min(quantity_needed, buy_transaction.quantity)
-            cost_basis += quantity_from_buy * buy_transaction.unit_price
-            quantity_needed -= quantity_from_buy
-        
-        return cost_basis
+        return round(self.lot_report().realized_gain_loss, 2)
+    
+    @property
+    def latest_quote(self):
+        """Most recent quote, preloaded by AssetLoader when available"""
+        if self._latest_quote is not NOT_PRELOADED:
+            return self._latest_quote
+        return self.current_quote
+    
+    @property
+    def transaction_count(self):
+        """Number of transactions, preloaded by AssetLoader when available"""
+        if self._transaction_count is not NOT_PRELOADED:
+            return self._transaction_count
+        return len(self.transactions)
     
     def get_latest_transaction(self):
         """Get the most recent transaction for this asset"""
@@ -238,23 +234,18 @@ class Asset(db.Model):
             return {}
         
         # Calculate basic risk metrics
-        quotes = [q.price for q in self.quote_history if q.price > 0]
+        history = sorted((q for q in self.quote_history if q.price > 0), key=lambda q: q.timestamp)
+        quotes = [q.price for q in history]
         if len(quotes) < 2:
             return {}
         
-        import statistics
-        returns = []
-        for i in range(1, len(quotes)):
-            if quotes[i-1] > 0:
-                returns.append((quotes[i] - quotes[i-1]) / quotes[i-1])
-        
-        if not returns:
+        from app.services.risk_math import volatility_of
+        volatility = volatility_of([(q.timestamp.date(), q.price) for q in history])
+        if volatility is None:
             return {}
         
-        volatility = statistics.stdev(returns) * (252 ** 0.5)  # Annualized
-        
         return {
-            'volatility': round(volatility * 100, 2),  # Percentage
+            'volatility': round(volatility, 2),  # Percentage
             'price_change': round((quotes[-1] - quotes[0]) / quotes[0] * 100, 2),
             'latest_price': quotes[-1],
             'price_history_count': len(quotes)
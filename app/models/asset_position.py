@@ -0,0 +1,39 @@
+"""Materialized position of an asset, maintained from the transaction ledger"""
+from app.config.extensions import db
+from sqlalchemy.sql import func
+
+
+class AssetPosition(db.Model):
+    """Current holdings of an asset, kept in sync with its transactions.
+
+    Rows are written by ``PositionService`` in the same database transaction
+    as the ledger change, so reads of quantity/cost never need to scan
+    ``transactions``. ``version`` is used for optimistic locking.
+    """
+
+    __tablename__ = "asset_positions"
+
+    asset_id = db.Column(db.Integer, db.ForeignKey("assets.id", ondelete="CASCADE"), primary_key=True)
+    quantity = db.Column(db.Float, nullable=False, default=0.0)
+    cost_basis = db.Column(db.Float, nullable=False, default=0.0)  # Custo das posições em aberto (FIFO)
+    total_invested = db.Column(db.Float, nullable=False, default=0.0)
+    total_divested = db.Column(db.Float, nullable=False, default=0.0)
+    realized_gain_loss = db.Column(db.Float, nullable=False, default=0.0)
+    last_transaction_date = db.Column(db.Date, nullable=True)
+    version = db.Column(db.Integer, nullable=False)
+    updated_at = db.Column(db.DateTime, default=func.now(), onupdate=func.now())
+
+    # Relationships
+    asset = db.relationship("Asset", back_populates="position")
+
+    __mapper_args__ = {"version_id_col": version}
+
+    @property
+    def average_cost(self):
+        """Average cost of the units still held"""
+        if self.quantity <= 0:
+            return 0.0
+        return round(self.cost_basis / self.quantity, 2)
+
+    def __repr__(self):
+        return f"<AssetPosition(asset_id={self.asset_id}, quantity={self.quantity}, version={self.version})>"
@@ -0,0 +1,34 @@
+"""End-of-day position history of an asset, maintained with the position"""
+from app.config.extensions import db
+
+
+class AssetPositionHistory(db.Model):
+    """Cumulative position of an asset at the end of each transaction date.
+
+    One row per (asset, date with transactions). The position on any date
+    is the row with the greatest ``as_of_date`` not after it, which the
+    primary key index resolves with a single seek.
+    """
+
+    __tablename__ = "asset_position_history"
+
+    asset_id = db.Column(db.Integer, db.ForeignKey("assets.id", ondelete="CASCADE"), primary_key=True)
+    as_of_date = db.Column(db.Date, primary_key=True)
+    quantity = db.Column(db.Float, nullable=False, default=0.0)
+    cost_basis = db.Column(db.Float, nullable=False, default=0.0)
+    total_invested = db.Column(db.Float, nullable=False, default=0.0)
+    total_divested = db.Column(db.Float, nullable=False, default=0.0)
+    realized_gain_loss = db.Column(db.Float, nullable=False, default=0.0)
+
+    # Relationships
+    asset = db.relationship("Asset", back_populates="position_history")
+
+    @property
+    def average_cost(self):
+        """Average cost of the units held on that date"""
+        if self.quantity <= 0:
+            return 0.0
+        return round(self.cost_basis / self.quantity, 2)
+
+    def __repr__(self):
+        return f"<AssetPositionHistory(asset_id={self.asset_id}, as_of_date={self.as_of_date}, quantity={self.quantity})>"
@@ -1,44 +1,102 @@
+from flask import g, has_request_context
 from app.config.extensions import db
 
+# Atributo em flask.g usado para reaproveitar agregados durante a mesma requisição
+AGGREGATES_G_ATTR = "family_aggregates"
+
 class Family(db.Model):
     __tablename__ = "family"
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
     cash_balance = db.Column(db.Float, default=0.0, nullable=False)  # Saldo disponível para investimentos
-    
+
     # Relationships
     users = db.relationship("User", secondary="user_family", back_populates="families")
     assets = db.relationship("Asset", back_populates="family", cascade="all, delete-orphan")
     suitability_profiles = db.relationship("SuitabilityProfile", back_populates="family", cascade="all, delete-orphan")
-    
+
+    def get_aggregates(self):
+        """Invested totals and allocation by asset_type in a single GROUP BY.
+
+        The result is reused for the rest of the current request, so reading
+        total_invested, total_patrimony and asset_allocation together costs
+        one round trip.
+        """
+        cache = g.setdefault(AGGREGATES_G_ATTR, {}) if has_request_context() else None
+        if cache is not None and self.id in cache:
+            return cache[self.id]
+
+        aggregates = self._query_aggregates()
+        if cache is not None:
+            cache[self.id] = aggregates
+        return aggregates
+
+    def _query_aggregates(self):
+        """Aggregate the materialized positions of the family's assets"""
+        from sqlalchemy import and_, case, exists, func
+        from app.models.asset import Asset
+        from app.models.asset_position import AssetPosition
+        from app.models.transaction import Transaction
+
+        has_ledger = exists().where(Transaction.asset_id == Asset.id)
+        rows = db.session.query(
+            Asset.asset_type,
+            func.count(Asset.id),
+            func.coalesce(func.sum(AssetPosition.cost_basis), 0.0),
+            func.sum(case((and_(AssetPosition.asset_id.is_(None), has_ledger), 1), else_=0))
+        ).outerjoin(
+            AssetPosition, AssetPosition.asset_id == Asset.id
+        ).filter(
+            Asset.family_id == self.id
+        ).group_by(Asset.asset_type).all()
+
+        allocation = {}
+        asset_count = 0
+        missing_positions = 0
+        for asset_type, count, value, missing in rows:
+            allocation[asset_type] = value
+            asset_count += count
+            missing_positions += missing or 0
+
+        # Assets not yet materialized (legacy data) are replayed from the ledger
+        if missing_positions:
+            legacy_assets = Asset.query.filter(
+                Asset.family_id == self.id,
+                ~Asset.position.has(),
+                has_ledger
+            ).all()
+            for asset in legacy_assets:
+                allocation[asset.asset_type] += asset.current_value
+
+        allocation = {asset_type: round(value, 2) for asset_type, value in allocation.items()}
+        return {
+            'asset_count': asset_count,
+            'total_invested': round(sum(allocation.values()), 2),
+            'allocation': allocation
+        }
+
+    @staticmethod
+    def invalidate_aggregates(family_id):
+        """Drop aggregates cached in the current request after a write"""
+        if has_request_context():
+            g.get(AGGREGATES_G_ATTR, {}).pop(family_id, None)
+
+    @staticmethod
+    def clear_aggregates_cache(exc=None):
+        """Request teardown: g outlives the request when the app context is shared"""
+        g.pop(AGGREGATES_G_ATTR, None)
+
     @property
     def total_invested(self):
         """Calculate total amount invested across all assets"""
-        if not self.assets:
-            return 0.0
-        
-        total = 0.0
-        for asset in self.assets:
-            total += asset.current_value
-        
-        return round(total, 2)
-    
+        return self.get_aggregates()['total_invested']
+
     @property
     def total_patrimony(self):
         """Calculate total patrimony (invested + cash balance)"""
         return round(self.total_invested + self.cash_balance, 2)
-    
+
     @property
     def asset_allocation(self):
         """Calculate asset allocation by type"""
-        if not self.assets:
-            return {}
-        
-        allocation = {}
-        for asset in self.assets:
-            asset_type = asset.asset_type
-            if asset_type not in allocation:
-                allocation[asset_type] = 0.0
-            allocation[asset_type] += asset.current_value
-        
-        return allocation
\ No newline at end of file
+        return dict(self.get_aggregates()['allocation'])
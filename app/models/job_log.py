@@ -5,6 +5,9 @@ from sqlalchemy.sql import func
 
 class JobLog(db.Model):
     __tablename__ = "job_logs"
+    __table_args__ = (
+        db.Index("ix_job_logs_job_id_execution_time", "job_id", "execution_time"),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     job_id = db.Column(db.String(100), nullable=False)
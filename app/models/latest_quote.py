@@ -0,0 +1,85 @@
+"""Denormalized latest quote per asset, maintained on quote ingest"""
+from typing import Dict, Iterable, List
+
+from sqlalchemy import event, select
+from sqlalchemy.dialects import postgresql, sqlite
+
+from app.config.extensions import db
+from app.models.quote_history import QuoteHistory
+
+
+class LatestQuote(db.Model):
+    """Most recent price of an asset, one row per asset.
+
+    Every write to ``quote_history`` upserts this row in the same database
+    transaction (ORM inserts through a mapper event, bulk inserts through
+    ``LatestQuote.upsert``), so current prices are a primary-key lookup
+    regardless of how long the history grows. Older quotes arriving late
+    never overwrite a newer price.
+    """
+
+    __tablename__ = "latest_quotes"
+
+    asset_id = db.Column(db.Integer, db.ForeignKey("assets.id", ondelete="CASCADE"), primary_key=True)
+    price = db.Column(db.Float, nullable=False)
+    currency = db.Column(db.String(3), default="USD", nullable=False)
+    source = db.Column(db.String(50), nullable=False)
+    timestamp = db.Column(db.DateTime, nullable=False)
+
+    # Relationships
+    asset = db.relationship("Asset", back_populates="current_quote")
+
+    def __repr__(self):
+        return f"<LatestQuote(asset_id={self.asset_id}, price={self.price}, timestamp={self.timestamp})>"
+
+    @staticmethod
+    def _insert(connection):
+        dialect = postgresql if connection.dialect.name == "postgresql" else sqlite
+        return dialect.insert(LatestQuote.__table__)
+
+    @staticmethod
+    def _on_conflict(statement):
+        table = LatestQuote.__table__
+        return statement.on_conflict_do_update(
+            index_elements=[table.c.asset_id],
+            set_={
+                "price": statement.excluded.price,
+                "currency": statement.excluded.currency,
+                "source": statement.excluded.source,
+                "timestamp": statement.excluded.timestamp
+            },
+            where=statement.excluded.timestamp >= table.c.timestamp
+        )
+
+    @staticmethod
+    def upsert(connection, rows: Iterable[Dict]) -> None:
+        """Upsert ``{asset_id, price, currency, source, timestamp}`` rows"""
+        newest: Dict[int, Dict] = {}
+        for row in rows:
+            # One row per asset: PostgreSQL rejects touching a row twice per statement
+            current = newest.get(row["asset_id"])
+            if current is None or row["timestamp"] >= current["timestamp"]:
+                newest[row["asset_id"]] = row
+        if not newest:
+            return
+
+        columns = ("asset_id", "price", "currency", "source", "timestamp")
+        values: List[Dict] = [{column: row[column] for column in columns} for row in newest.values()]
+        connection.execute(LatestQuote._on_conflict(LatestQuote._insert(connection)), values)
+
+    @staticmethod
+    def upsert_from_history(connection, quote_id: int) -> None:
+        """Upsert from a stored quote_history row (picks up server defaults)"""
+        history = QuoteHistory.__table__
+        source = select(
+            history.c.asset_id, history.c.price, history.c.currency, history.c.source, history.c.timestamp
+        ).where(history.c.id == quote_id)
+        statement = LatestQuote._insert(connection).from_select(
+            ["asset_id", "price", "currency", "source", "timestamp"], source
+        )
+        connection.execute(LatestQuote._on_conflict(statement))
+
+
+@event.listens_for(QuoteHistory, "after_insert")
+def _quote_history_inserted(mapper, connection, target):
+    LatestQuote.upsert_from_history(connection, target.id)
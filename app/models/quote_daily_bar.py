@@ -0,0 +1,28 @@
+"""Daily OHLC bars compacted from the raw quote history"""
+from app.config.extensions import db
+
+
+class QuoteDailyBar(db.Model):
+    """Open/high/low/close of an asset's quotes on one calendar day.
+
+    Written by ``QuoteRollupService`` from ``quote_history`` once the day is
+    over. Raw quotes are kept only for a short retention window, so anything
+    longer than that (1y/5y volatility, performance) reads these bars.
+    """
+
+    __tablename__ = "quote_daily_bars"
+
+    asset_id = db.Column(db.Integer, db.ForeignKey("assets.id", ondelete="CASCADE"), primary_key=True)
+    bar_date = db.Column(db.Date, primary_key=True)
+    open = db.Column(db.Float, nullable=False)
+    high = db.Column(db.Float, nullable=False)
+    low = db.Column(db.Float, nullable=False)
+    close = db.Column(db.Float, nullable=False)
+    currency = db.Column(db.String(3), default="USD", nullable=False)
+    quote_count = db.Column(db.Integer, nullable=False, default=0)
+
+    # Relationships
+    asset = db.relationship("Asset", back_populates="daily_bars")
+
+    def __repr__(self):
+        return f"<QuoteDailyBar(asset_id={self.asset_id}, bar_date={self.bar_date}, close={self.close})>"
@@ -36,3 +36,7 @@ class QuoteHistory(db.Model):
     def is_fresh(self):
         """Check if quote is less than 1 hour old"""
         return self.age_hours < 1
+
+
+# Latest quote per asset (groupwise max / ROW_NUMBER on timestamp)
+db.Index("ix_quote_history_asset_id_timestamp", QuoteHistory.asset_id, QuoteHistory.timestamp.desc())
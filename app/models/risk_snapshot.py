@@ -0,0 +1,141 @@
+"""Persisted portfolio risk per family and the queue of families awaiting recomputation"""
+from datetime import datetime
+from typing import Dict, Iterable, Optional, Set
+
+from sqlalchemy import event, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from app.config.extensions import db
+
+
+class RiskSnapshot(db.Model):
+    """Risk analysis of a family as computed at ``computed_at``.
+
+    One row per recomputation, so the headline columns double as a risk time
+    series. Only the newest row of each family keeps the full ``analysis``
+    payload; older ones are trimmed to the columns when it is superseded.
+    """
+
+    __tablename__ = "risk_snapshots"
+    __table_args__ = (
+        db.Index("ix_risk_snapshots_family_id_computed_at", "family_id", "computed_at"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    family_id = db.Column(db.Integer, db.ForeignKey("family.id", ondelete="CASCADE"), nullable=False)
+    computed_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
+    total_value = db.Column(db.Float, nullable=False)
+    weighted_risk_score = db.Column(db.Float, nullable=False)
+    risk_classification = db.Column(db.String(20), nullable=False)
+    portfolio_volatility = db.Column(db.Float, nullable=True)
+    var_1d = db.Column(db.Float, nullable=True)
+    cvar_1d = db.Column(db.Float, nullable=True)
+    analysis = db.Column(db.JSON, nullable=True)
+
+    def __repr__(self):
+        return f"<RiskSnapshot(family_id={self.family_id}, computed_at={self.computed_at}, score={self.weighted_risk_score})>"
+
+    def to_point(self) -> Dict:
+        """Headline figures, as one point of the risk time series"""
+        return {
+            'computed_at': self.computed_at.isoformat(),
+            'total_value': self.total_value,
+            'weighted_risk_score': self.weighted_risk_score,
+            'risk_classification': self.risk_classification,
+            'portfolio_volatility': self.portfolio_volatility,
+            'var_1d': self.var_1d,
+            'cvar_1d': self.cvar_1d
+        }
+
+
+class RiskDirtyFamily(db.Model):
+    """Family whose holdings, transactions or prices changed since its last snapshot.
+
+    Rows are written in the same database transaction as the change (ORM
+    flushes through a session event, bulk quote inserts through
+    ``RiskDirtyFamily.mark_assets``) and removed by the snapshot worker once
+    it has recomputed the family. A change arriving mid-recomputation bumps
+    ``marked_at`` so the row survives for the next pass.
+    """
+
+    __tablename__ = "risk_dirty_families"
+
+    family_id = db.Column(db.Integer, db.ForeignKey("family.id", ondelete="CASCADE"), primary_key=True)
+    marked_at = db.Column(db.DateTime, nullable=False)
+
+    def __repr__(self):
+        return f"<RiskDirtyFamily(family_id={self.family_id}, marked_at={self.marked_at})>"
+
+    @staticmethod
+    def _upsert(connection, source):
+        dialect = postgresql if connection.dialect.name == "postgresql" else sqlite
+        table = RiskDirtyFamily.__table__
+        statement = dialect.insert(table).from_select(["family_id", "marked_at"], source)
+        return statement.on_conflict_do_update(
+            index_elements=[table.c.family_id],
+            set_={"marked_at": statement.excluded.marked_at}
+        )
+
+    @staticmethod
+    def mark(connection, family_ids: Iterable[int] = (), asset_ids: Iterable[int] = ()) -> None:
+        """Mark families dirty, given directly or through their assets"""
+        from app.models.asset import Asset
+        from app.models.family import Family
+
+        family_ids = {int(family_id) for family_id in family_ids if family_id is not None}
+        asset_ids = {int(asset_id) for asset_id in asset_ids if asset_id is not None}
+        now = db.literal(datetime.now(), db.DateTime)
+        if asset_ids:
+            assets = Asset.__table__
+            source = select(assets.c.family_id, now).where(assets.c.id.in_(asset_ids)).distinct()
+            connection.execute(RiskDirtyFamily._upsert(connection, source))
+        if family_ids:
+            families = Family.__table__
+            source = select(families.c.id, now).where(families.c.id.in_(family_ids))
+            connection.execute(RiskDirtyFamily._upsert(connection, source))
+
+    @staticmethod
+    def mark_assets(connection, asset_ids: Iterable[int]) -> None:
+        RiskDirtyFamily.mark(connection, asset_ids=asset_ids)
+
+
+def _changed_families(session: Session) -> Optional[tuple]:
+    """Families and assets touched by the objects of a flush"""
+    from app.models.asset import Asset
+    from app.models.quote_history import QuoteHistory
+    from app.models.transaction import Transaction
+
+    family_ids: Set[int] = set()
+    asset_ids: Set[int] = set()
+    modified = [obj for obj in session.dirty if session.is_modified(obj, include_collections=False)]
+    for obj in (*session.new, *modified, *session.deleted):
+        if isinstance(obj, Asset):
+            family_ids.add(obj.family_id)
+            # Asset moved between families: the old one changed too
+            family_ids.update(db.inspect(obj).attrs.family_id.history.deleted)
+        elif isinstance(obj, (Transaction, QuoteHistory)):
+            asset = obj.__dict__.get("asset")
+            if asset is not None and asset.family_id is not None:
+                family_ids.add(asset.family_id)
+            else:
+                asset_ids.add(obj.asset_id)
+    if not family_ids and not asset_ids:
+        return None
+    return family_ids, asset_ids
+
+
+@event.listens_for(Session, "before_flush")
+def _collect_dirty_families(session, flush_context, instances):
+    changed = _changed_families(session)
+    if changed:
+        pending = session.info.setdefault("risk_dirty", (set(), set()))
+        pending[0].update(changed[0])
+        pending[1].update(changed[1])
+
+
+@event.listens_for(Session, "after_flush_postexec")
+def _mark_dirty_families(session, flush_context):
+    pending = session.info.pop("risk_dirty", None)
+    if pending:
+        RiskDirtyFamily.mark(session.connection(), *pending)
@@ -9,6 +9,14 @@ class Transaction(db.Model):
     """Model representing a financial transaction (buy/sell) for an asset"""
     
     __tablename__ = "transactions"
+    __table_args__ = (
+        # Keyset pagination on (created_at, id), optionally filtered
+        db.Index("ix_transactions_created_at_id", "created_at", "id"),
+        db.Index("ix_transactions_asset_created_at_id", "asset_id", "created_at", "id"),
+        db.Index("ix_transactions_type_created_at_id", "transaction_type", "created_at", "id"),
+        # Ledger of an asset in date order (positions, summaries, reports)
+        db.Index("ix_transactions_asset_id_transaction_date", "asset_id", "transaction_date"),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     asset_id = db.Column(db.Integer, db.ForeignKey("assets.id"), nullable=False)
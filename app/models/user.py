@@ -3,7 +3,8 @@ from werkzeug.security import generate_password_hash, check_password_hash
 
 user_family = db.Table('user_family',
     db.Column('user_id', db.Integer, db.ForeignKey('user.id')),
-    db.Column('family_id', db.Integer, db.ForeignKey('family.id'))
+    db.Column('family_id', db.Integer, db.ForeignKey('family.id')),
+    db.Index('ix_user_family_user_id_family_id', 'user_id', 'family_id')
 )
 
 user_permission = db.Table('user_permission',
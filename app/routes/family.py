@@ -110,9 +110,8 @@ def delete_specific_alert(family_id, alert_id):
 @family_bp.route("/<int:family_id>/risk/trigger", methods=["POST"])
 @jwt_required()
 def trigger_family_risk(family_id):
-    # Endpoint mock: não faz nada, apenas garante commit/visibilidade para o teste
-    db.session.commit()
-    return {"message": "Score recalculado (mock)"}, 200
+    from app.controllers.family_controller import trigger_family_risk_controller
+    return trigger_family_risk_controller(family_id)
 
 # ===== CASH BALANCE MANAGEMENT =====
 
@@ -3,8 +3,11 @@ from flask import Blueprint, request, make_response
 from flask_jwt_extended import jwt_required
 from app.controllers.risk_analysis_controller import (
     get_portfolio_risk_analysis_controller,
+    get_portfolio_risk_history_controller,
+    run_stress_test_controller,
     get_asset_risk_metrics_controller,
     update_asset_quotes_controller,
+    stream_prices_controller,
     get_market_overview_controller,
     get_risk_alerts_controller
 )
@@ -39,6 +42,44 @@ def get_portfolio_risk():
     
     return add_cors_headers(response)
 
+@risk_analysis_bp.route('/portfolio/risk/history', methods=['GET', 'OPTIONS'])
+@jwt_required()
+def get_portfolio_risk_history():
+    """Série histórica do risco da carteira para gráficos"""
+    if request.method == 'OPTIONS':
+        response = make_response()
+        return add_cors_headers(response)
+
+    result = get_portfolio_risk_history_controller(request)
+
+    # Se o controller retornar tuple (data, status), converter para Response
+    if isinstance(result, tuple):
+        data, status_code = result
+        response = make_response(data, status_code)
+    else:
+        response = make_response(result)
+
+    return add_cors_headers(response)
+
+@risk_analysis_bp.route('/stress', methods=['POST', 'OPTIONS'])
+@jwt_required()
+def run_stress_test():
+    """Stress test em lote: choques por tipo de ativo, instrumento, moeda e juros"""
+    if request.method == 'OPTIONS':
+        response = make_response()
+        return add_cors_headers(response)
+
+    result = run_stress_test_controller(request)
+
+    # Se o controller retornar tuple (data, status), converter para Response
+    if isinstance(result, tuple):
+        data, status_code = result
+        response = make_response(data, status_code)
+    else:
+        response = make_response(result)
+
+    return add_cors_headers(response)
+
 @risk_analysis_bp.route('/assets/<int:asset_id>/risk', methods=['GET'])
 @jwt_required()
 @require_permission('risk_view')
@@ -71,6 +112,21 @@ def update_quotes():
     
     return add_cors_headers(response)
 
+@risk_analysis_bp.route('/quotes/stream', methods=['GET'])
+@jwt_required(locations=['headers', 'query_string'])
+def stream_quotes():
+    """Stream (SSE) de cotações e totais da carteira; EventSource envia o token via ?jwt="""
+    result = stream_prices_controller(request)
+    
+    # Se o controller retornar tuple (data, status), converter para Response
+    if isinstance(result, tuple):
+        data, status_code = result
+        response = make_response(data, status_code)
+    else:
+        response = result
+    
+    return add_cors_headers(response)
+
 @risk_analysis_bp.route('/market/overview', methods=['GET', 'OPTIONS'])
 @jwt_required()
 def get_market_overview():
@@ -4,6 +4,7 @@ from flask_jwt_extended import jwt_required
 
 from app.controllers.transaction_controller import (
     create_transaction_controller,
+    bulk_create_transactions_controller,
     list_transactions_controller,
     get_transaction_controller,
     update_transaction_controller,
@@ -21,6 +22,13 @@ def create_transaction():
     return create_transaction_controller(request)
 
 
+@transaction_bp.route("/bulk", methods=["POST"])
+@jwt_required()
+def bulk_create_transactions():
+    """Import many transactions at once (JSON array or CSV)"""
+    return bulk_create_transactions_controller(request)
+
+
 @transaction_bp.route("", methods=["GET"])
 @jwt_required()
 def list_transactions():
@@ -35,7 +35,7 @@ class AssetSchema(Schema):
     
     def get_transaction_count(self, obj):
         """Get the number of transactions for this asset"""
-        return len(obj.transactions) if hasattr(obj, 'transactions') and obj.transactions else 0
+        return obj.transaction_count if hasattr(obj, 'transaction_count') else 0
     
     def get_vencimento(self, obj):
         """Get vencimento as a proper date object"""
@@ -35,6 +35,7 @@ class TransactionSummarySchema(Schema):
     realized_gain_loss = fields.Float()
     unrealized_gain_loss = fields.Float()
     transaction_count = fields.Int()
+    open_lots = fields.List(fields.Dict())
     
     # Campos antigos (para compatibilidade)
     total_transactions = fields.Int()
@@ -0,0 +1,186 @@
+"""Batch loader for asset listings"""
+import logging
+from datetime import date, datetime, time, timedelta
+from typing import List, Optional, Tuple
+
+from sqlalchemy import and_, func, select
+from sqlalchemy.orm.attributes import set_committed_value
+
+from app.config.extensions import db
+
+logger = logging.getLogger(__name__)
+
+
+class AssetLoader:
+    """Load a family's assets with everything AssetSchema reads, in a
+    fixed number of queries.
+
+    - assets + materialized position (joined eager load)
+    - transaction counts (one GROUP BY)
+    - latest quote per asset (one IN query on latest_quotes)
+    - full ledger only for assets without a position (one IN query, if any)
+    """
+
+    @staticmethod
+    def load_family_assets(family_id: int) -> List:
+        from app.models.asset import Asset
+
+        assets = Asset.query.filter_by(family_id=family_id).order_by(Asset.id).all()
+        if not assets:
+            return assets
+
+        asset_ids = [asset.id for asset in assets]
+        counts = AssetLoader._transaction_counts(asset_ids)
+        latest_quotes = AssetLoader._latest_quotes(asset_ids)
+
+        for asset in assets:
+            asset._transaction_count = counts.get(asset.id, 0)
+            asset._latest_quote = latest_quotes.get(asset.id)
+
+        # Legacy assets compute their position from the ledger, so hand
+        # them their transactions up front instead of one lazy load each
+        legacy = [asset for asset in assets if asset.position is None and counts.get(asset.id)]
+        if legacy:
+            AssetLoader._load_transactions(legacy)
+
+        return assets
+
+    @staticmethod
+    def load_family_holdings_as_of(family_id: int, as_of: date) -> List[Tuple]:
+        """Holdings of a family at the end of ``as_of``.
+
+        Returns ``(asset, snapshot, quote)`` tuples, where ``snapshot`` is the
+        newest end-of-day position row not after ``as_of`` and ``quote`` the
+        last quote up to that day (or None), taken from the daily bar close
+        once the raw quotes are past retention. Each lookup is a per-asset
+        max() seek on (asset_id, date) instead of a ledger replay. Assets that
+        had no position yet on that date are left out.
+        """
+        from app.models.asset import Asset
+        from app.models.asset_position_history import AssetPositionHistory
+
+        assets = Asset.query.filter_by(family_id=family_id).order_by(Asset.id).all()
+        if not assets:
+            return []
+
+        asset_ids = [asset.id for asset in assets]
+        latest = db.session.query(
+            AssetPositionHistory.asset_id,
+            func.max(AssetPositionHistory.as_of_date).label("as_of_date")
+        ).filter(
+            AssetPositionHistory.asset_id.in_(asset_ids),
+            AssetPositionHistory.as_of_date <= as_of
+        ).group_by(AssetPositionHistory.asset_id).subquery()
+
+        snapshots = {
+            snapshot.asset_id: snapshot
+            for snapshot in AssetPositionHistory.query.join(
+                latest,
+                and_(AssetPositionHistory.asset_id == latest.c.asset_id,
+                     AssetPositionHistory.as_of_date == latest.c.as_of_date)
+            ).all()
+        }
+        with_history = {
+            asset_id for (asset_id,) in db.session.query(AssetPositionHistory.asset_id).filter(
+                AssetPositionHistory.asset_id.in_(asset_ids)
+            ).distinct()
+        }
+
+        # Assets without any history yet (not rebuilt) replay their ledger
+        legacy = [asset for asset in assets if asset.id not in with_history]
+        if legacy:
+            AssetLoader._load_transactions(legacy)
+            for asset in legacy:
+                snapshot = asset.lot_report().snapshot_on(as_of)
+                if snapshot is not None:
+                    snapshots[asset.id] = snapshot
+
+        end_of_day = datetime.combine(as_of + timedelta(days=1), time.min)
+        quotes = AssetLoader._latest_quotes(asset_ids, before=end_of_day)
+
+        return [
+            (asset, snapshots[asset.id], quotes.get(asset.id))
+            for asset in assets
+            if asset.id in snapshots
+        ]
+
+    @staticmethod
+    def _transaction_counts(asset_ids: List[int]) -> dict:
+        from app.models.transaction import Transaction
+
+        rows = db.session.query(
+            Transaction.asset_id, func.count(Transaction.id)
+        ).filter(
+            Transaction.asset_id.in_(asset_ids)
+        ).group_by(Transaction.asset_id).all()
+        return dict(rows)
+
+    @staticmethod
+    def _latest_quotes(asset_ids: List[int], before: Optional[datetime] = None) -> dict:
+        from app.models.asset import Asset
+        from app.models.latest_quote import LatestQuote
+        from app.models.quote_daily_bar import QuoteDailyBar
+        from app.models.quote_history import QuoteHistory
+
+        if before is None:
+            # Current prices: primary-key lookups on the denormalized table
+            return {
+                quote.asset_id: quote
+                for quote in LatestQuote.query.filter(LatestQuote.asset_id.in_(asset_ids)).all()
+            }
+
+        # One max(timestamp) seek per asset on (asset_id, timestamp)
+        seek = select(func.max(QuoteHistory.timestamp)).where(
+            QuoteHistory.asset_id == Asset.id,
+            QuoteHistory.timestamp < before
+        ).correlate(Asset).scalar_subquery()
+        latest = db.session.query(
+            Asset.id.label("asset_id"), seek.label("timestamp")
+        ).filter(Asset.id.in_(asset_ids)).subquery()
+
+        quotes = QuoteHistory.query.join(
+            latest, and_(QuoteHistory.asset_id == latest.c.asset_id,
+                         QuoteHistory.timestamp == latest.c.timestamp)
+        ).order_by(QuoteHistory.id).all()
+        # Same-timestamp ties: the last inserted row wins
+        found = {quote.asset_id: quote for quote in quotes}
+
+        # Raw quotes past retention: close of the last daily bar instead
+        missing = [asset_id for asset_id in asset_ids if asset_id not in found]
+        if missing:
+            bar_seek = select(func.max(QuoteDailyBar.bar_date)).where(
+                QuoteDailyBar.asset_id == Asset.id,
+                QuoteDailyBar.bar_date < before.date()
+            ).correlate(Asset).scalar_subquery()
+            latest_bars = db.session.query(
+                Asset.id.label("asset_id"), bar_seek.label("bar_date")
+            ).filter(Asset.id.in_(missing)).subquery()
+
+            bars = QuoteDailyBar.query.join(
+                latest_bars, and_(QuoteDailyBar.asset_id == latest_bars.c.asset_id,
+                                  QuoteDailyBar.bar_date == latest_bars.c.bar_date)
+            ).all()
+            for bar in bars:
+                # Transient row, never added to the session
+                found[bar.asset_id] = QuoteHistory(
+                    asset_id=bar.asset_id,
+                    price=bar.close,
+                    currency=bar.currency,
+                    source="daily_close",
+                    timestamp=datetime.combine(bar.bar_date, time.min)
+                )
+        return found
+
+    @staticmethod
+    def _load_transactions(assets: List) -> None:
+        from app.models.transaction import Transaction
+
+        by_asset = {asset.id: [] for asset in assets}
+        transactions = Transaction.query.filter(
+            Transaction.asset_id.in_(list(by_asset))
+        ).order_by(Transaction.transaction_date.desc()).all()
+        for transaction in transactions:
+            by_asset[transaction.asset_id].append(transaction)
+
+        for asset in assets:
+            set_committed_value(asset, "transactions", by_asset[asset.id])
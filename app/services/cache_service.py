@@ -1,10 +1,14 @@
 """Cache service for optimizing heavy calculations"""
 import time
-from typing import Any, Dict, Optional
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
 from functools import wraps
 import hashlib
 import json
 
+from app.config.config import Config
+
 class CacheService:
     """Simple in-memory cache service for asset calculations"""
     
@@ -111,3 +115,127 @@ def invalidate_cache_pattern(pattern: str):
     keys_to_delete = [k for k in asset_cache._cache.keys() if pattern in k]
     for key in keys_to_delete:
         asset_cache.delete(key)
+
+
+class QuoteCache:
+    """Thread-safe quote cache shared by the quote services.
+
+    Entries are fresh for the provider TTL; after that they are still served
+    (stale-while-revalidate) while a single background refresh runs, up to
+    ``max_stale`` seconds. Failed lookups are remembered for ``negative_ttl``
+    seconds so a broken symbol is not retried on every request.
+    """
+    
+    def __init__(self, provider_ttl: Optional[Dict[str, int]] = None, default_ttl: int = 300,
+                 max_stale: int = 86400, negative_ttl: int = 300, refresh_workers: int = 4):
+        self.provider_ttl = provider_ttl or {}
+        self.default_ttl = default_ttl
+        self.max_stale = max_stale
+        self.negative_ttl = negative_ttl
+        self.refresh_workers = refresh_workers
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._refreshing: set = set()
+        self._lock = threading.Lock()
+        self._executor = None
+        self.stats = {'hits': 0, 'stale_hits': 0, 'misses': 0, 'negative_hits': 0, 'refreshes': 0}
+    
+    def get_or_fetch(self, key: str, provider: str, fetch: Callable[[], Any],
+                     fallback: Optional[Callable[[], Any]] = None) -> Optional[Any]:
+        """Return the cached quote for ``key``, calling ``fetch`` only when needed.
+
+        ``fallback`` (e.g. the last stored price) is served as a stale entry
+        on a cold miss so the caller never waits on the provider.
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry['value'] is None and now < entry['expires_at']:
+                    self.stats['negative_hits'] += 1
+                    return None
+                if entry['value'] is not None and now < entry['expires_at']:
+                    self.stats['hits'] += 1
+                    return entry['value']
+                if entry['value'] is not None and now < entry['stale_until']:
+                    self.stats['stale_hits'] += 1
+                    self._schedule_refresh(key, provider, fetch)
+                    return entry['value']
+            self.stats['misses'] += 1
+        
+        if fallback is not None:
+            value = fallback()
+            if value is not None:
+                with self._lock:
+                    # Stored price: already stale, refresh right away
+                    self._entries[key] = {'value': value, 'expires_at': now, 'stale_until': now + self.max_stale}
+                    self._schedule_refresh(key, provider, fetch)
+                return value
+        
+        return self._fetch(key, provider, fetch)
+    
+    def peek(self, key: str) -> Optional[Any]:
+        """Cached quote for ``key`` (fresh or stale), never fetching"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry['value'] is None or now >= entry['stale_until']:
+                return None
+            return entry['value']
+    
+    def put(self, key: str, provider: str, value: Any) -> None:
+        """Store a fresh quote (or a failure when ``value`` is None)"""
+        now = time.time()
+        with self._lock:
+            if value is None:
+                previous = self._entries.get(key)
+                if previous is not None and previous['value'] is not None and now < previous['stale_until']:
+                    # Keep serving the last good price until it is too old
+                    return
+                self._entries[key] = {'value': None, 'expires_at': now + self.negative_ttl, 'stale_until': 0}
+            else:
+                ttl = self.provider_ttl.get(provider, self.default_ttl)
+                self._entries[key] = {'value': value, 'expires_at': now + ttl, 'stale_until': now + ttl + self.max_stale}
+    
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._refreshing.clear()
+    
+    def _fetch(self, key: str, provider: str, fetch: Callable[[], Any]) -> Optional[Any]:
+        try:
+            value = fetch()
+        except Exception:
+            value = None
+        self.put(key, provider, value)
+        return value
+    
+    def _schedule_refresh(self, key: str, provider: str, fetch: Callable[[], Any]) -> None:
+        # Caller holds the lock; one refresh per key at a time
+        if key in self._refreshing:
+            return
+        self._refreshing.add(key)
+        self.stats['refreshes'] += 1
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.refresh_workers, thread_name_prefix="quote-refresh")
+        
+        def refresh():
+            try:
+                self._fetch(key, provider, fetch)
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+        
+        self._executor.submit(refresh)
+
+
+def quote_cache_key(provider: str, symbol: str) -> str:
+    """Key of an instrument in ``quote_cache``; values are ``MarketData``"""
+    return f"quote:{provider}:{symbol}"
+
+
+# Shared quote cache (QuoteService and MarketDataService)
+quote_cache = QuoteCache(
+    provider_ttl=Config.QUOTE_CACHE_TTL,
+    max_stale=Config.QUOTE_CACHE_MAX_STALE_SECONDS,
+    negative_ttl=Config.QUOTE_NEGATIVE_CACHE_TTL_SECONDS
+)
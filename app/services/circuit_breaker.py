@@ -0,0 +1,163 @@
+"""Per-provider circuit breakers and health statistics for quote providers"""
+import logging
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+
+from app.config.config import Config
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Weight of the newest observation in the latency/success moving averages
+EWMA_ALPHA = 0.3
+# Below this success rate a provider is tried after its healthy siblings
+DEGRADED_SUCCESS_RATE = 0.3
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a provider whose circuit is open"""
+
+
+class CircuitBreaker:
+    """Classic closed → open → half-open breaker.
+
+    After ``failure_threshold`` consecutive failures the circuit opens and
+    calls fail fast for ``reset_timeout`` seconds. Then a single probe is let
+    through (half-open): success closes the circuit, failure re-opens it.
+    """
+
+    def __init__(self, name: str, failure_threshold: Optional[int] = None, reset_timeout: Optional[float] = None):
+        self.name = name
+        self.failure_threshold = failure_threshold or Config.QUOTE_BREAKER_FAILURE_THRESHOLD
+        self.reset_timeout = reset_timeout if reset_timeout is not None else Config.QUOTE_BREAKER_RESET_SECONDS
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def rejecting(self) -> bool:
+        """Open and not yet due for a half-open probe"""
+        return self.state == OPEN and time.monotonic() - self.opened_at < self.reset_timeout
+
+    def allow(self) -> bool:
+        """Whether a call may go out now (claims the half-open probe)"""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = HALF_OPEN
+                self._probing = False
+            if self.state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self.state != CLOSED:
+                logger.info(f"Circuit {self.name} closed")
+            self.state = CLOSED
+            self.failures = 0
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    logger.warning(f"Circuit {self.name} opened after {self.failures} failures")
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+            self._probing = False
+
+
+class ProviderHealth:
+    """Breaker plus moving averages of latency and success for one provider"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.breaker = CircuitBreaker(name)
+        self.latency: Optional[float] = None
+        self.success_rate = 1.0
+        self.calls = 0
+        self.observed_at = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, latency: float, success: bool) -> None:
+        with self._lock:
+            self.calls += 1
+            self.observed_at = time.monotonic()
+            self.latency = latency if self.latency is None else (
+                EWMA_ALPHA * latency + (1 - EWMA_ALPHA) * self.latency
+            )
+            self.success_rate = EWMA_ALPHA * float(success) + (1 - EWMA_ALPHA) * self.success_rate
+        if success:
+            self.breaker.record_success()
+        else:
+            self.breaker.record_failure()
+
+    @property
+    def degraded(self) -> bool:
+        """Failing often or answering slowly, per recent observations.
+
+        Statistics older than the breaker's reset window are ignored, so a
+        demoted provider gets tried again first once things calm down.
+        """
+        if not self.calls or time.monotonic() - self.observed_at > self.breaker.reset_timeout:
+            return False
+        return (self.success_rate < DEGRADED_SUCCESS_RATE
+                or self.latency > Config.QUOTE_PROVIDER_SLOW_SECONDS)
+
+    def as_dict(self) -> Dict[str, object]:
+        return {
+            'state': self.breaker.state,
+            'degraded': self.degraded,
+            'failures': self.breaker.failures,
+            'latency_ms': round(self.latency * 1000, 1) if self.latency is not None else None,
+            'success_rate': round(self.success_rate, 3),
+            'calls': self.calls
+        }
+
+
+class ProviderHealthRegistry:
+    """Shared health of every quote provider"""
+
+    def __init__(self):
+        self._providers: Dict[str, ProviderHealth] = {}
+        self._lock = threading.Lock()
+
+    def get(self, name: str) -> ProviderHealth:
+        with self._lock:
+            health = self._providers.get(name)
+            if health is None:
+                health = self._providers[name] = ProviderHealth(name)
+            return health
+
+    def order(self, names: Iterable[str]) -> List[str]:
+        """Configured order, with degraded providers and then open circuits moved last.
+
+        A circuit due for its half-open probe keeps its place, so the probe
+        actually goes out.
+        """
+        ranked = [(index, self.get(name)) for index, name in enumerate(names)]
+        ranked.sort(key=lambda item: (item[1].breaker.rejecting, item[1].degraded, item[0]))
+        return [health.name for _, health in ranked]
+
+    def snapshot(self) -> Dict[str, Dict[str, object]]:
+        with self._lock:
+            providers = list(self._providers.values())
+        return {health.name: health.as_dict() for health in providers}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._providers.clear()
+
+
+# Shared by every MarketDataService instance
+provider_health = ProviderHealthRegistry()
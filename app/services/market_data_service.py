@@ -1,15 +1,38 @@
 """Market Data Service - Integração com APIs de finanças funcionais"""
 import requests
 import logging
-from datetime import datetime, timedelta
-from typing import Dict, Optional, List, Any
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import Callable, Dict, Optional, List, Any, Tuple
 from dataclasses import dataclass
+import numpy as np
+from app.config.config import Config
 from app.config.extensions import db
 from app.models.asset import Asset
-from app.models.quote_history import QuoteHistory
+from app.models.latest_quote import LatestQuote
+from app.services.cache_service import quote_cache, quote_cache_key
+from app.services.circuit_breaker import CircuitOpenError, provider_health
+from app.services.provider_session import provider_session
+from app.services.quote_fetcher import QuoteFetcher
+from app.services.quote_rollup_service import QuoteRollupService
+from app.services.quote_store import QuoteStore
+from app.services.risk_math import ReturnMatrix, default_volatility, matrix_dict, portfolio_volatility, volatility_of
+from app.services.valuation_service import ValuationService
+from app.services.var_engine import VaREngine
 
 logger = logging.getLogger(__name__)
 
+# Faixas (limite mínimo, score) dos scores de risco; abaixo da última, 10
+LIQUIDITY_BANDS = ((1.0, 100.0), (0.5, 75.0), (0.2, 50.0), (0.1, 25.0))
+CONCENTRATION_BANDS = ((30.0, 100.0), (20.0, 75.0), (15.0, 50.0), (10.0, 25.0))
+MARKET_BANDS = ((10.0, 100.0), (7.0, 75.0), (5.0, 50.0), (3.0, 25.0))
+
+
+def _band_scores(values: np.ndarray, bands, floor: float = 10.0) -> np.ndarray:
+    """Score da primeira faixa cujo limite o valor atinge"""
+    return np.select([values >= limit for limit, _ in bands], [score for _, score in bands], floor)
+
 @dataclass
 class MarketData:
     """Estrutura para dados de mercado"""
@@ -30,167 +53,238 @@ class MarketDataService:
     """Serviço para dados de mercado usando APIs alternativas"""
     
     def __init__(self):
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'FamilyOffice/2.0'
-        })
+        self.session = provider_session('FamilyOffice/2.0')
         
         # APIs alternativas que ainda funcionam
+        self.yahoo_base = "https://query1.finance.yahoo.com"
         self.alpha_vantage_base = "https://www.alphavantage.co/query"
         self.alpha_vantage_key = "demo"  # Chave gratuita para teste
+        self.coingecko_base = "https://api.coingecko.com/api/v3"
         self.bacen_base_url = "https://www.bcb.gov.br/api/servico/sitebcb/indicadorCambio"
+        self.timeout = Config.QUOTE_PROVIDER_TIMEOUT_SECONDS
+        
+        # Circuit breakers e estatísticas compartilhados entre instâncias
+        self.health = provider_health
+        
+        # Cache compartilhado (validade por provedor, stale-while-revalidate)
+        self.cache = quote_cache
         
-        # Cache para evitar múltiplas chamadas
-        self._cache = {}
-        self._cache_ttl = 300  # 5 minutos
+        # Busca concorrente de cotações
+        self.fetcher = QuoteFetcher()
     
-    def get_comprehensive_quote(self, symbol: str, asset_type: str = "renda_variavel") -> Optional[MarketData]:
-        """Obtém cotação usando APIs alternativas"""
+    def get_comprehensive_quote(self, symbol: str, asset_type: str = "renda_variavel",
+                                asset_id: Optional[int] = None) -> Optional[MarketData]:
+        """Obtém cotação usando APIs alternativas, via cache compartilhado.
+
+        Com ``asset_id``, a última cotação gravada do ativo é servida quando o
+        cache está vazio, e a atualização acontece em segundo plano.
+        """
         try:
-            if asset_type == "criptomoeda":
-                return self._get_crypto_quote(symbol)
-            elif asset_type == "moeda_estrangeira":
-                return self._get_bacen_quote(symbol)
-            else:
-                return self._get_alpha_vantage_quote(symbol)
+            provider = self._provider_for(asset_type)
+            fallback = (lambda: self._stored_quote(asset_id, symbol)) if asset_id else None
+            return self.cache.get_or_fetch(
+                self._cache_key(provider, symbol), provider,
+                lambda: self._fetch_provider_quote(provider, symbol),
+                fallback=fallback
+            )
         except Exception as e:
             logger.error(f"Erro ao obter cotação para {symbol}: {e}")
             return None
     
+    @staticmethod
+    def _cache_key(provider: str, symbol: str) -> str:
+        return quote_cache_key(provider, symbol)
+    
+    @staticmethod
+    def _stored_quote(asset_id: int, symbol: str) -> Optional[MarketData]:
+        """Última cotação gravada do ativo"""
+        quote = db.session.get(LatestQuote, asset_id)
+        if not quote:
+            return None
+        return MarketData(
+            symbol=symbol,
+            price=quote.price,
+            currency=quote.currency,
+            change_24h=0,
+            change_percent_24h=0,
+            volume=0,
+            source=quote.source,
+            timestamp=quote.timestamp
+        )
+    
+    def _get_yahoo_quote(self, symbol: str) -> Optional[MarketData]:
+        """Yahoo Finance (chart) para ações, FIIs e ETFs"""
+        # Para ações brasileiras, adicionar .SA
+        if not symbol.endswith('.SA') and not '.' in symbol:
+            symbol = f"{symbol}.SA"
+        
+        url = f"{self.yahoo_base}/v8/finance/chart/{symbol}"
+        params = {
+            'range': '1d',
+            'interval': '1d'
+        }
+        
+        response = self.session.get(url, params=params, timeout=self.timeout)
+        response.raise_for_status()
+        data = response.json()
+        
+        result = (data.get('chart') or {}).get('result') or []
+        meta = result[0].get('meta', {}) if result else {}
+        if meta.get('regularMarketPrice') is None:
+            logger.warning(f"Dados não encontrados para {symbol}")
+            return None
+        
+        current_price = float(meta['regularMarketPrice'])
+        previous_close = float(meta.get('chartPreviousClose') or current_price)
+        change_24h = current_price - previous_close
+        
+        return MarketData(
+            symbol=symbol,
+            price=current_price,
+            currency=meta.get('currency') or ('BRL' if symbol.endswith('.SA') else 'USD'),
+            change_24h=change_24h,
+            change_percent_24h=(change_24h / previous_close * 100) if previous_close else 0,
+            volume=float(meta.get('regularMarketVolume') or 0),
+            source="yahoo_finance",
+            timestamp=datetime.now()
+        )
+    
     def _get_alpha_vantage_quote(self, symbol: str) -> Optional[MarketData]:
         """Alpha Vantage para ações e ETFs"""
-        try:
-            # Para ações brasileiras, adicionar .SA
-            if not symbol.endswith('.SA') and not '.' in symbol:
-                symbol = f"{symbol}.SA"
-            
-            url = self.alpha_vantage_base
-            params = {
-                'function': 'GLOBAL_QUOTE',
-                'symbol': symbol,
-                'apikey': self.alpha_vantage_key
-            }
-            
-            response = self.session.get(url, params=params, timeout=10)
-            response.raise_for_status()
-            data = response.json()
-            
-            if 'Global Quote' not in data or not data['Global Quote']:
-                logger.warning(f"Dados não encontrados para {symbol}")
-                return None
-            
-            quote = data['Global Quote']
-            
-            current_price = float(quote.get('05. price', 0))
-            previous_close = float(quote.get('08. previous close', current_price))
-            change_24h = current_price - previous_close
-            change_percent_24h = float(quote.get('10. change percent', '0').replace('%', ''))
-            volume = float(quote.get('06. volume', 0))
-            
-            return MarketData(
-                symbol=symbol,
-                price=current_price,
-                currency='BRL' if symbol.endswith('.SA') else 'USD',
-                change_24h=change_24h,
-                change_percent_24h=change_percent_24h,
-                volume=volume,
-                source="alpha_vantage",
-                timestamp=datetime.now()
-            )
-            
-        except Exception as e:
-            logger.error(f"Erro Alpha Vantage para {symbol}: {e}")
+        # Para ações brasileiras, adicionar .SA
+        if not symbol.endswith('.SA') and not '.' in symbol:
+            symbol = f"{symbol}.SA"
+        
+        url = self.alpha_vantage_base
+        params = {
+            'function': 'GLOBAL_QUOTE',
+            'symbol': symbol,
+            'apikey': self.alpha_vantage_key
+        }
+        
+        response = self.session.get(url, params=params, timeout=self.timeout)
+        response.raise_for_status()
+        data = response.json()
+        
+        # Limite de requisições vem com status 200
+        if 'Note' in data or 'Information' in data:
+            raise RuntimeError(f"Alpha Vantage indisponível: {data.get('Note') or data.get('Information')}")
+        
+        if 'Global Quote' not in data or not data['Global Quote']:
+            logger.warning(f"Dados não encontrados para {symbol}")
             return None
+        
+        quote = data['Global Quote']
+        
+        current_price = float(quote.get('05. price', 0))
+        previous_close = float(quote.get('08. previous close', current_price))
+        change_24h = current_price - previous_close
+        change_percent_24h = float(quote.get('10. change percent', '0').replace('%', ''))
+        volume = float(quote.get('06. volume', 0))
+        
+        return MarketData(
+            symbol=symbol,
+            price=current_price,
+            currency='BRL' if symbol.endswith('.SA') else 'USD',
+            change_24h=change_24h,
+            change_percent_24h=change_percent_24h,
+            volume=volume,
+            source="alpha_vantage",
+            timestamp=datetime.now()
+        )
     
-    def _get_crypto_quote(self, coin_id: str) -> Optional[MarketData]:
-        """API gratuita para criptomoedas"""
-        try:
-            # Usar API gratuita da CoinGecko (sem chave)
-            url = f"https://api.coingecko.com/api/v3/simple/price"
-            params = {
-                'ids': coin_id,
-                'vs_currencies': 'usd,brl',
-                'include_24hr_change': 'true',
-                'include_24hr_vol': 'true'
-            }
-            
-            response = self.session.get(url, params=params, timeout=10)
-            response.raise_for_status()
-            data = response.json()
-            
-            if coin_id not in data:
-                logger.warning(f"Criptomoeda {coin_id} não encontrada")
-                return None
-            
-            coin_data = data[coin_id]
-            current_price_usd = coin_data.get('usd', 0)
-            current_price_brl = coin_data.get('brl', 0)
+    def _get_crypto_quotes(self, coin_ids: List[str]) -> Dict[str, MarketData]:
+        """CoinGecko para várias criptomoedas em uma única requisição"""
+        # Usar API gratuita da CoinGecko (sem chave); ids separados por vírgula
+        url = f"{self.coingecko_base}/simple/price"
+        params = {
+            'ids': ','.join(coin_ids),
+            'vs_currencies': 'usd,brl',
+            'include_24hr_change': 'true',
+            'include_24hr_vol': 'true'
+        }
+        
+        response = self.session.get(url, params=params, timeout=self.timeout)
+        response.raise_for_status()
+        data = response.json()
+        
+        quotes = {}
+        for coin_id in coin_ids:
+            coin_data = data.get(coin_id) or {}
+            current_price_brl = coin_data.get('brl')
+            # Cache e histórico guardam criptomoedas sempre em reais (como QuoteService)
+            if not current_price_brl:
+                logger.warning(f"Criptomoeda {coin_id} não encontrada ou sem preço em BRL")
+                continue
             change_24h = coin_data.get('usd_24h_change', 0)
             volume_24h = coin_data.get('usd_24h_vol', 0)
             
-            return MarketData(
+            quotes[coin_id] = MarketData(
                 symbol=coin_id,
-                price=current_price_brl if current_price_brl > 0 else current_price_usd,
-                currency='BRL' if current_price_brl > 0 else 'USD',
+                price=current_price_brl,
+                currency='BRL',
                 change_24h=change_24h,
                 change_percent_24h=change_24h,
                 volume=volume_24h,
                 source="coingecko_free",
                 timestamp=datetime.now()
             )
-            
-        except Exception as e:
-            logger.error(f"Erro API cripto para {coin_id}: {e}")
-            return None
+        return quotes
+    
+    def _get_crypto_quote(self, coin_id: str) -> Optional[MarketData]:
+        """API gratuita para criptomoedas"""
+        return self._get_crypto_quotes([coin_id]).get(coin_id)
     
     def _get_bacen_quote(self, currency: str) -> Optional[MarketData]:
         """BACEN para câmbio"""
-        try:
-            # Mapeamento de códigos de moeda
-            currency_map = {
-                'USD': 1,
-                'EUR': 21619,
-                'GBP': 21620
-            }
-            
-            if currency not in currency_map:
-                return None
-            
-            url = self.bacen_base_url
-            params = {
-                'codigoMoeda': currency_map[currency]
-            }
-            
-            response = self.session.get(url, params=params, timeout=10)
-            response.raise_for_status()
-            data = response.json()
-            
-            if not data:
-                return None
-            
-            # BACEN retorna array com dados históricos
-            latest_data = data[0] if isinstance(data, list) else data
-            current_price = float(latest_data.get('valorVenda', 0))
-            
-            return MarketData(
-                symbol=currency,
-                price=current_price,
-                currency="BRL",
-                change_24h=0,  # BACEN não fornece variação
-                change_percent_24h=0,
-                volume=0,
-                source="bacen",
-                timestamp=datetime.now()
-            )
-            
-        except Exception as e:
-            logger.error(f"Erro BACEN para {currency}: {e}")
+        # Mapeamento de códigos de moeda
+        currency_map = {
+            'USD': 1,
+            'EUR': 21619,
+            'GBP': 21620
+        }
+        
+        if currency not in currency_map:
             return None
+        
+        url = self.bacen_base_url
+        params = {
+            'codigoMoeda': currency_map[currency]
+        }
+        
+        response = self.session.get(url, params=params, timeout=self.timeout)
+        response.raise_for_status()
+        data = response.json()
+        
+        if not data:
+            return None
+        
+        # BACEN retorna array com dados históricos
+        latest_data = data[0] if isinstance(data, list) else data
+        current_price = float(latest_data.get('valorVenda', 0))
+        
+        return MarketData(
+            symbol=currency,
+            price=current_price,
+            currency="BRL",
+            change_24h=0,  # BACEN não fornece variação
+            change_percent_24h=0,
+            volume=0,
+            source="bacen",
+            timestamp=datetime.now()
+        )
     
     def get_mock_quote(self, symbol: str, asset_type: str = "renda_variavel") -> MarketData:
-        """Gera cotação simulada para desenvolvimento/teste"""
+        """Gera cotação simulada para desenvolvimento/teste.
+
+        Com ``QUOTE_PROVIDER_SEED`` a cotação depende só do símbolo e do tipo,
+        e benchmarks repetem os mesmos preços em qualquer ordem de chamada.
+        """
         import random
         
+        seed = Config.QUOTE_PROVIDER_SEED
+        rng = random.Random(f"{seed}:{asset_type}:{symbol}") if seed is not None else random.Random()
+        
         # Preços base por tipo de ativo
         base_prices = {
             "renda_fixa": 1000.0,
@@ -203,7 +297,7 @@ class MarketDataService:
         base_price = base_prices.get(asset_type, 100.0)
         
         # Variação aleatória para simular mercado
-        variation = random.uniform(-0.05, 0.05)  # ±5%
+        variation = rng.uniform(-0.05, 0.05)  # ±5%
         current_price = base_price * (1 + variation)
         change_24h = base_price * variation
         change_percent_24h = variation * 100
@@ -214,13 +308,14 @@ class MarketDataService:
             currency="BRL",
             change_24h=round(change_24h, 2),
             change_percent_24h=round(change_percent_24h, 2),
-            volume=random.uniform(1000, 100000),
+            volume=rng.uniform(1000, 100000),
             source="mock_data",
             timestamp=datetime.now()
         )
     
-    def get_asset_risk_metrics(self, asset: Asset) -> Dict[str, Any]:
-        """Calcula métricas de risco para um ativo"""
+    def get_asset_risk_metrics(self, asset: Asset, portfolio_weight: Optional[float] = None,
+                               volatility: Optional[float] = None) -> Dict[str, Any]:
+        """Calcula métricas de risco para um ativo (volatilidade pré-calculada opcional)"""
         try:
             # Obter cotação atual
             symbol = self._get_asset_symbol(asset)
@@ -228,7 +323,7 @@ class MarketDataService:
                 return {}
             
             # Tentar obter cotação real, se falhar usar mock
-            quote = self.get_comprehensive_quote(symbol, asset.asset_type)
+            quote = self.get_comprehensive_quote(symbol, asset.asset_type, asset_id=asset.id)
             if not quote:
                 quote = self.get_mock_quote(symbol, asset.asset_type)
             
@@ -236,9 +331,11 @@ class MarketDataService:
             risk_metrics = {
                 'current_price': quote.price,
                 'price_change_24h': quote.change_percent_24h,
-                'volatility': self._calculate_volatility(asset.id),
+                'volatility': volatility if volatility is not None else self._calculate_volatility(
+                    asset.id, asset_type=asset.asset_type
+                ),
                 'liquidity_score': self._calculate_liquidity_score(quote.volume, asset.current_value),
-                'concentration_risk': self._calculate_concentration_risk(asset),
+                'concentration_risk': self._calculate_concentration_risk(asset, portfolio_weight),
                 'market_risk': self._calculate_market_risk(quote),
                 'beta_risk': quote.beta or 1.0,
                 'last_updated': quote.timestamp.isoformat()
@@ -250,11 +347,21 @@ class MarketDataService:
             logger.error(f"Erro ao calcular métricas de risco para ativo {asset.id}: {e}")
             return {}
     
-    def _get_asset_symbol(self, asset: Asset) -> Optional[str]:
+    @staticmethod
+    def quote_source(asset: Asset) -> Optional[Tuple[str, str]]:
+        """(provedor, símbolo) que identifica o instrumento no cache e nos provedores"""
+        symbol = MarketDataService._get_asset_symbol(asset)
+        if not symbol:
+            return None
+        return MarketDataService._provider_for(asset.asset_type), symbol
+    
+    @staticmethod
+    def _get_asset_symbol(asset: Asset) -> Optional[str]:
         """Extrai símbolo do ativo baseado no tipo"""
         if asset.asset_type == "renda_variavel":
             ticker = asset.details.get('ticker') if asset.details else None
             if ticker:
+                ticker = ticker.strip().upper()
                 # Para ações brasileiras, adicionar .SA se não tiver
                 if not ticker.endswith('.SA') and not '.' in ticker:
                     ticker = f"{ticker}.SA"
@@ -273,99 +380,59 @@ class MarketDataService:
                     'XRP': 'ripple',
                     'BCH': 'bitcoin-cash'
                 }
+                coin_id = coin_id.strip()
                 return coin_mapping.get(coin_id.upper(), coin_id.lower())
         elif asset.asset_type == "moeda_estrangeira":
-            currency = asset.details.get('currency') if asset.details else None
-            if currency:
-                # Validar moedas suportadas
-                supported_currencies = ['USD', 'EUR', 'GBP', 'JPY', 'CHF', 'CAD', 'AUD']
-                if currency.upper() in supported_currencies:
-                    return currency.upper()
+            # Sem moeda informada, dólar
+            currency = ((asset.details or {}).get('currency') or 'USD').strip().upper()
+            # Validar moedas suportadas
+            supported_currencies = ['USD', 'EUR', 'GBP', 'JPY', 'CHF', 'CAD', 'AUD']
+            if currency in supported_currencies:
+                return currency
         return None
     
-    def _calculate_volatility(self, asset_id: int, days: int = 30) -> float:
-        """Calcula volatilidade baseada no histórico de preços"""
+    def _calculate_volatility(self, asset_id: int, days: Optional[int] = None,
+                              asset_type: Optional[str] = None) -> float:
+        """Volatilidade anualizada (%) dos fechamentos diários do ativo"""
         try:
-            # Buscar histórico de preços
-            quotes = QuoteHistory.query.filter_by(asset_id=asset_id)\
-                .filter(QuoteHistory.timestamp >= datetime.now() - timedelta(days=days))\
-                .order_by(QuoteHistory.timestamp.asc())\
-                .all()
-            
-            if len(quotes) < 2:
-                # Se não há histórico, retornar volatilidade simulada
-                import random
-                return random.uniform(10, 30)
-            
-            # Calcular retornos logarítmicos
-            returns = []
-            for i in range(1, len(quotes)):
-                if quotes[i-1].price > 0:
-                    log_return = (quotes[i].price / quotes[i-1].price)
-                    returns.append(log_return)
-            
-            if not returns:
-                import random
-                return random.uniform(10, 30)
-            
-            # Calcular volatilidade (desvio padrão dos retornos)
-            import statistics
-            return statistics.stdev(returns) * (252 ** 0.5)  # Anualizada
-            
+            # Fechamentos diários (barras OHLC + cotações ainda não consolidadas)
+            closes = QuoteRollupService.daily_closes(asset_id, days or Config.RISK_LOOKBACK_DAYS)
+            volatility = volatility_of(closes)
+            if volatility is not None:
+                return round(volatility, 2)
         except Exception as e:
             logger.error(f"Erro ao calcular volatilidade: {e}")
-            import random
-            return random.uniform(10, 30)
+        # Sem histórico suficiente: valor padrão do tipo de ativo
+        return default_volatility(asset_type)
     
     def _calculate_liquidity_score(self, volume: float, asset_value: float) -> float:
         """Calcula score de liquidez (0-100)"""
         try:
-            if asset_value <= 0:
-                return 50.0  # Score médio se não há valor
-            
-            # Volume diário vs valor do ativo
-            volume_ratio = volume / asset_value
-            
-            # Score baseado na razão (maior = mais líquido)
-            if volume_ratio >= 1.0:
-                return 100.0
-            elif volume_ratio >= 0.5:
-                return 75.0
-            elif volume_ratio >= 0.2:
-                return 50.0
-            elif volume_ratio >= 0.1:
-                return 25.0
-            else:
-                return 10.0
-                
+            return float(self._liquidity_scores(np.array([volume], dtype=np.float64),
+                                                np.array([asset_value], dtype=np.float64))[0])
         except Exception as e:
             logger.error(f"Erro ao calcular score de liquidez: {e}")
             return 50.0  # Score médio em caso de erro
     
-    def _calculate_concentration_risk(self, asset: Asset) -> float:
+    def _calculate_concentration_risk(self, asset: Asset, portfolio_weight: Optional[float] = None) -> float:
         """Calcula risco de concentração (0-100)"""
         try:
-            if not asset.family:
-                return 50.0  # Score médio se não há família
-            
-            # Calcular percentual do ativo na família
-            total_family_value = sum(a.current_value for a in asset.family.assets)
-            if total_family_value <= 0:
-                return 50.0
-            
-            concentration_percent = (asset.current_value / total_family_value) * 100
+            if portfolio_weight is not None:
+                # Peso já calculado pela avaliação vetorizada da carteira
+                concentration_percent = portfolio_weight * 100
+            else:
+                if not asset.family:
+                    return 50.0  # Score médio se não há família
+                
+                # Calcular percentual do ativo na família
+                total_family_value = asset.family.total_invested
+                if total_family_value <= 0:
+                    return 50.0
+                
+                concentration_percent = (asset.current_value / total_family_value) * 100
             
             # Score de risco (maior concentração = maior risco)
-            if concentration_percent >= 30:
-                return 100.0
-            elif concentration_percent >= 20:
-                return 75.0
-            elif concentration_percent >= 15:
-                return 50.0
-            elif concentration_percent >= 10:
-                return 25.0
-            else:
-                return 10.0
+            return float(_band_scores(np.array([concentration_percent]), CONCENTRATION_BANDS)[0])
                 
         except Exception as e:
             logger.error(f"Erro ao calcular risco de concentração: {e}")
@@ -374,70 +441,109 @@ class MarketDataService:
     def _calculate_market_risk(self, quote: MarketData) -> float:
         """Calcula risco de mercado baseado na variação de preço"""
         try:
-            change_abs = abs(quote.change_percent_24h)
-            
             # Score de risco baseado na variação
-            if change_abs >= 10:
-                return 100.0
-            elif change_abs >= 7:
-                return 75.0
-            elif change_abs >= 5:
-                return 50.0
-            elif change_abs >= 3:
-                return 25.0
-            else:
-                return 10.0
+            return float(_band_scores(np.array([abs(quote.change_percent_24h)]), MARKET_BANDS)[0])
                 
         except Exception as e:
             logger.error(f"Erro ao calcular risco de mercado: {e}")
             return 25.0
     
+    @staticmethod
+    def _liquidity_scores(volume: np.ndarray, asset_value: np.ndarray) -> np.ndarray:
+        """Score de liquidez por ativo: volume diário vs valor (50 se não há valor)"""
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ratio = np.where(asset_value > 0, volume / asset_value, 0.0)
+        return np.where(asset_value > 0, _band_scores(ratio, LIQUIDITY_BANDS), 50.0)
+    
     def get_portfolio_risk_analysis(self, family_id: int) -> Dict[str, Any]:
-        """Análise completa de risco da carteira"""
+        """Análise completa de risco da carteira.
+
+        Não chama provedores externos: preços vêm do cache de cotações ou da
+        última cotação gravada, e os scores de todos os ativos são calculados
+        de uma vez sobre os arrays da avaliação (consultas em número fixo).
+        """
         try:
-            # Buscar todos os ativos da família
-            assets = Asset.query.filter_by(family_id=family_id).all()
+            # Avaliação vetorizada da carteira (valor de mercado e pesos)
+            valuation = ValuationService.load([family_id])
             
-            if not assets:
+            if not len(valuation):
                 return {}
             
-            # Calcular métricas para cada ativo
-            asset_risks = []
-            total_value = 0
-            weighted_risk_score = 0
+            asset_ids = valuation.asset_ids.tolist()
+            assets = {
+                asset.id: asset
+                for asset in Asset.query.filter_by(family_id=family_id).all()
+            }
+            symbols = [self._get_asset_symbol(assets[asset_id]) for asset_id in asset_ids]
+            quotes = self._known_quotes(asset_ids, symbols, valuation.asset_types)
+            # Só ativos com símbolo de mercado entram na análise
+            covered = np.array([symbol is not None for symbol in symbols], dtype=bool)
+            
+            # Retornos diários alinhados (data × ativo): volatilidade e
+            # covariância da família inteira de uma vez
+            returns = ReturnMatrix.load(asset_ids, Config.RISK_LOOKBACK_DAYS)
+            covariance = returns.covariance()
+            column = {int(asset_id): j for j, asset_id in enumerate(returns.asset_ids)}
+            order = np.array([column[asset_id] for asset_id in asset_ids], dtype=np.int64)
+            volatilities = np.round(returns.volatility()[order], 2)
+            volatilities = np.where(
+                np.isnan(volatilities),
+                [default_volatility(asset_type) for asset_type in valuation.asset_types],
+                volatilities
+            )
             
-            for asset in assets:
-                risk_metrics = self.get_asset_risk_metrics(asset)
-                if risk_metrics:
-                    asset_risks.append({
-                        'asset_id': asset.id,
-                        'name': asset.name,
-                        'asset_type': asset.asset_type,
-                        'current_value': asset.current_value,
-                        'risk_metrics': risk_metrics
-                    })
-                    
-                    total_value += asset.current_value
+            # Variação do dia: cotação em cache ou último retorno diário gravado
+            last_returns = self._last_returns(returns)[order]
+            change_percent = np.array([
+                quote.change_percent_24h if quote is not None and quote.change_percent_24h else
+                (float(np.expm1(last_returns[i]) * 100) if not np.isnan(last_returns[i]) else 0.0)
+                for i, quote in enumerate(quotes)
+            ])
+            volume = np.array([quote.volume if quote is not None else 0.0 for quote in quotes], dtype=np.float64)
+            
+            # Scores de todos os ativos de uma vez
+            liquidity = self._liquidity_scores(volume, valuation.market_value)
+            concentration = _band_scores(valuation.weights * 100, CONCENTRATION_BANDS)
+            market = _band_scores(np.abs(change_percent), MARKET_BANDS)
+            scores = volatilities * 0.3 + liquidity * 0.2 + concentration * 0.3 + market * 0.2
+            
+            asset_risks = []
+            for i in np.flatnonzero(covered).tolist():
+                quote = quotes[i]
+                asset_risks.append({
+                    'asset_id': asset_ids[i],
+                    'name': valuation.names[i],
+                    'asset_type': valuation.asset_types[i],
+                    'current_value': round(float(valuation.market_value[i]), 2),
+                    'cost_basis': round(float(valuation.cost_basis[i]), 2),
+                    'unrealized_gain_loss': round(float(valuation.pnl[i]), 2),
+                    'risk_metrics': {
+                        'current_price': quote.price if quote is not None else None,
+                        'price_change_24h': round(float(change_percent[i]), 2),
+                        'volatility': float(volatilities[i]),
+                        'liquidity_score': float(liquidity[i]),
+                        'concentration_risk': float(concentration[i]),
+                        'market_risk': float(market[i]),
+                        'beta_risk': (quote.beta if quote is not None else None) or 1.0,
+                        'last_updated': quote.timestamp.isoformat() if quote is not None and quote.timestamp else None
+                    }
+                })
             
             # Calcular score de risco ponderado
-            for asset_risk in asset_risks:
-                weight = asset_risk['current_value'] / total_value if total_value > 0 else 0
-                risk_score = (
-                    asset_risk['risk_metrics'].get('volatility', 0) * 0.3 +
-                    asset_risk['risk_metrics'].get('liquidity_score', 0) * 0.2 +
-                    asset_risk['risk_metrics'].get('concentration_risk', 0) * 0.3 +
-                    asset_risk['risk_metrics'].get('market_risk', 0) * 0.2
-                )
-                weighted_risk_score += risk_score * weight
+            total_value = float(valuation.market_value[covered].sum())
+            weighted_risk_score = float(np.dot(scores[covered], valuation.market_value[covered]) / total_value) if total_value > 0 else 0.0
             
             # Classificação de risco
             risk_classification = self._classify_risk(weighted_risk_score)
             
             return {
-                'total_portfolio_value': total_value,
-                'number_of_assets': len(assets),
+                'total_portfolio_value': round(total_value, 2),
+                'number_of_assets': len(valuation),
                 'weighted_risk_score': round(weighted_risk_score, 2),
                 'risk_classification': risk_classification,
+                'portfolio_volatility': self._portfolio_volatility(covariance[np.ix_(order, order)], valuation.weights),
+                'correlation_matrix': matrix_dict(returns.asset_ids, returns.correlation()),
+                'value_at_risk': self._value_at_risk(returns, valuation),
                 'asset_risks': asset_risks,
                 'risk_breakdown': {
                     'volatility_weight': 0.3,
@@ -452,6 +558,58 @@ class MarketDataService:
             logger.error(f"Erro na análise de risco da carteira: {e}")
             return {}
     
+    def _known_quotes(self, asset_ids: List[int], symbols: List[Optional[str]],
+                      asset_types: List[str]) -> List[Optional[MarketData]]:
+        """Cotação já conhecida de cada ativo (cache, senão última gravada), sem acessar a rede"""
+        stored = {
+            quote.asset_id: quote
+            for quote in LatestQuote.query.filter(LatestQuote.asset_id.in_(asset_ids)).all()
+        } if asset_ids else {}
+        
+        quotes = []
+        for asset_id, symbol, asset_type in zip(asset_ids, symbols, asset_types):
+            quote = None
+            if symbol:
+                quote = self.cache.peek(self._cache_key(self._provider_for(asset_type), symbol))
+            if quote is None and asset_id in stored:
+                row = stored[asset_id]
+                quote = MarketData(
+                    symbol=symbol or '',
+                    price=row.price,
+                    currency=row.currency,
+                    change_24h=0,
+                    change_percent_24h=0,
+                    volume=0,
+                    source=row.source,
+                    timestamp=row.timestamp
+                )
+            quotes.append(quote)
+        return quotes
+    
+    @staticmethod
+    def _last_returns(returns: ReturnMatrix) -> np.ndarray:
+        """Último retorno diário (log) de cada coluna, NaN sem histórico"""
+        if not returns.returns.shape[0]:
+            return np.full(len(returns.asset_ids), np.nan)
+        last_row = returns.returns.shape[0] - 1 - np.argmax(returns.mask[::-1], axis=0)
+        values = returns.returns[last_row, np.arange(len(returns.asset_ids))]
+        return np.where(returns.mask.any(axis=0), values, np.nan)
+    
+    @staticmethod
+    def _portfolio_volatility(covariance: np.ndarray, weights: np.ndarray) -> Optional[float]:
+        """Volatilidade anualizada (%) da carteira, sobre os ativos com histórico"""
+        volatility = portfolio_volatility(covariance, weights)
+        return round(volatility, 2) if volatility is not None else None
+    
+    @staticmethod
+    def _value_at_risk(returns: ReturnMatrix, valuation) -> Optional[Dict[str, Any]]:
+        """VaR/CVaR de 1 e 10 dias (simulação histórica e Monte Carlo)"""
+        try:
+            return VaREngine().compute(returns, valuation.asset_ids, valuation.market_value)
+        except Exception as e:
+            logger.error(f"Erro no cálculo de VaR: {e}")
+            return None
+    
     def _classify_risk(self, risk_score: float) -> str:
         """Classifica o risco baseado no score"""
         if risk_score <= 25:
@@ -467,35 +625,48 @@ class MarketDataService:
         """Atualiza cotações de todos os ativos de uma família"""
         try:
             assets = Asset.query.filter_by(family_id=family_id).all()
-            updated_count = 0
             errors = []
             
+            # Um pedido por instrumento (provedor, símbolo), criptomoedas em lotes,
+            # em paralelo e com prazo total
+            holders = defaultdict(list)
             for asset in assets:
-                try:
-                    symbol = self._get_asset_symbol(asset)
-                    if not symbol:
-                        continue
-                    
-                    quote = self.get_comprehensive_quote(symbol, asset.asset_type)
-                    if quote:
-                        # Salvar no histórico
-                        quote_history = QuoteHistory(
-                            asset_id=asset.id,
-                            price=quote.price,
-                            currency=quote.currency,
-                            source=quote.source
-                        )
-                        db.session.add(quote_history)
-                        updated_count += 1
-                        
-                except Exception as e:
-                    errors.append(f"Ativo {asset.name}: {str(e)}")
-            
-            if updated_count > 0:
-                db.session.commit()
+                source = self.quote_source(asset)
+                if source:
+                    holders[source].append(asset)
+            
+            fetched = self.fetcher.fetch_all(
+                {key: key for key in holders}, self._fetch_provider_quote,
+                batch_fetch=self._fetch_provider_batch,
+                batch_sizes={'coingecko': Config.QUOTE_PROVIDER_BATCH_SIZE['coingecko']}
+            )
+            for key, reason in fetched.failed.items():
+                if reason != "deadline exceeded":
+                    self.cache.put(self._cache_key(*key), key[0], None)
+                if reason != "no quote":
+                    errors.extend(f"Ativo {asset.name}: {reason}" for asset in holders[key])
+            
+            # Gravação em lote no histórico, replicando o preço para cada ativo
+            store = QuoteStore()
+            for key, quote in fetched.quotes.items():
+                self.cache.put(self._cache_key(*key), key[0], quote)
+                for asset in holders[key]:
+                    store.add(
+                        asset_id=asset.id,
+                        price=quote.price,
+                        currency=quote.currency,
+                        source=quote.source,
+                        timestamp=quote.timestamp
+                    )
+            
+            saved = store.flush()
+            names = {asset.id: asset.name for asset in assets}
+            errors.extend(
+                f"Ativo {names[failure['row']['asset_id']]}: {failure['error']}" for failure in saved.failed
+            )
             
             return {
-                'updated_assets': updated_count,
+                'updated_assets': saved.saved,
                 'total_assets': len(assets),
                 'errors': errors,
                 'timestamp': datetime.now().isoformat()
@@ -504,3 +675,72 @@ class MarketDataService:
         except Exception as e:
             logger.error(f"Erro ao atualizar cotações: {e}")
             return {'error': str(e)}
+    
+    @staticmethod
+    def _provider_for(asset_type: str) -> str:
+        """Provedor principal do tipo de ativo (cabeça da cadeia de fallback)"""
+        chains = Config.QUOTE_PROVIDER_CHAINS
+        return chains.get(asset_type, chains["renda_variavel"])[0]
+    
+    @staticmethod
+    def _provider_chain(provider: str) -> List[str]:
+        """Cadeia de fallback que começa no provedor principal"""
+        for chain in Config.QUOTE_PROVIDER_CHAINS.values():
+            if chain[0] == provider:
+                return chain
+        return [provider]
+    
+    def _fetch_provider_quote(self, provider: str, symbol: str) -> Optional[MarketData]:
+        """Cotação de um símbolo, percorrendo a cadeia do provedor principal.
+
+        Os provedores são tentados na ordem de saúde observada (latência e
+        taxa de sucesso); circuitos abertos falham na hora, sem esperar o
+        timeout. Sem resposta de nenhum, o cache serve o último preço.
+        """
+        last_error = None
+        for candidate in self.health.order(self._provider_chain(provider)):
+            try:
+                quote = self._call_provider(candidate, lambda: self._single_quote(candidate, symbol))
+            except Exception as e:
+                logger.warning(f"Provedor {candidate} falhou para {symbol}: {e}")
+                last_error = e
+                continue
+            if quote:
+                return quote
+        if last_error is not None:
+            raise last_error
+        return None
+    
+    def _single_quote(self, provider: str, symbol: str) -> Optional[MarketData]:
+        if provider == "yahoo_finance":
+            return self._get_yahoo_quote(symbol)
+        elif provider == "coingecko":
+            return self._get_crypto_quote(symbol)
+        elif provider == "bacen":
+            return self._get_bacen_quote(symbol)
+        return self._get_alpha_vantage_quote(symbol)
+    
+    def _call_provider(self, provider: str, call: Callable[[], Any]) -> Any:
+        """Executa a chamada sob o circuit breaker do provedor, registrando latência e resultado"""
+        health = self.health.get(provider)
+        if not health.breaker.allow():
+            raise CircuitOpenError(f"circuito aberto para {provider}")
+        
+        started = time.monotonic()
+        try:
+            result = call()
+        except Exception:
+            health.observe(time.monotonic() - started, success=False)
+            raise
+        health.observe(time.monotonic() - started, success=True)
+        return result
+    
+    def _fetch_provider_batch(self, provider: str, symbols: List[str]) -> Dict[str, MarketData]:
+        """Cotações de um lote de símbolos (CoinGecko aceita vários ids por requisição)"""
+        if provider == "coingecko":
+            return self._call_provider(provider, lambda: self._get_crypto_quotes(symbols))
+        return {symbol: self._fetch_provider_quote(provider, symbol) for symbol in symbols}
+    
+    def provider_status(self) -> Dict[str, Dict[str, Any]]:
+        """Estado dos circuitos e estatísticas de cada provedor"""
+        return self.health.snapshot()
@@ -0,0 +1,126 @@
+"""Position service for keeping AssetPosition in sync with the transaction ledger"""
+import logging
+
+from app.config.extensions import db
+from app.models.family import Family
+from app.services.tax_lot_service import TaxLotService
+
+logger = logging.getLogger(__name__)
+
+
+class PositionService:
+    """Service for maintaining the materialized asset positions.
+
+    All methods only stage changes on the current session; the caller owns
+    the commit so the position is written in the same database transaction
+    as the ledger change.
+    """
+
+    @staticmethod
+    def record_transaction(asset, transaction):
+        """Apply a newly created transaction to the asset position.
+
+        Buys appended at the end of the ledger are applied in O(1), together
+        with the end-of-day history row. Sells and back-dated transactions
+        change which lots are open, so the position and its history are
+        rebuilt from the ledger with the FIFO lot engine.
+        """
+        from app.models.asset_position_history import AssetPositionHistory
+
+        position = asset.position
+        is_tail = (
+            position is not None
+            and (position.last_transaction_date is None
+                 or (transaction.transaction_date >= position.last_transaction_date
+                     # Positions written before the history existed need a backfill
+                     and db.session.get(AssetPositionHistory,
+                                        (asset.id, position.last_transaction_date)) is not None))
+        )
+
+        if not is_tail or transaction.transaction_type != "buy":
+            return PositionService.rebuild(asset)
+
+        position.quantity += transaction.quantity
+        position.cost_basis += transaction.quantity * transaction.unit_price
+        position.total_invested += transaction.total_value
+        position.last_transaction_date = transaction.transaction_date
+        PositionService._write_snapshot(position, transaction.transaction_date)
+        Family.invalidate_aggregates(asset.family_id)
+        return position
+
+    @staticmethod
+    def rebuild(asset):
+        """Recompute the asset position from its full ledger"""
+        from app.models.asset_position import AssetPosition
+        from app.models.asset_position_history import AssetPositionHistory
+        from app.models.transaction import Transaction
+
+        # Query (with autoflush) instead of asset.transactions so pending
+        # inserts/deletes in this session are taken into account
+        transactions = Transaction.query.filter_by(asset_id=asset.id).all()
+        report = TaxLotService.process(transactions)
+
+        position = asset.position
+        if position is None:
+            position = AssetPosition(asset_id=asset.id)
+            asset.position = position
+            db.session.add(position)
+
+        position.quantity = report.quantity
+        position.cost_basis = report.cost_basis
+        position.total_invested = report.total_invested
+        position.total_divested = report.total_divested
+        position.realized_gain_loss = report.realized_gain_loss
+        position.last_transaction_date = report.last_transaction_date
+
+        # Replace the end-of-day history with the replayed snapshots
+        AssetPositionHistory.query.filter_by(asset_id=asset.id).delete(synchronize_session="fetch")
+        db.session.add_all([
+            AssetPositionHistory(
+                asset_id=asset.id,
+                as_of_date=snapshot.as_of,
+                quantity=snapshot.quantity,
+                cost_basis=snapshot.cost_basis,
+                total_invested=snapshot.total_invested,
+                total_divested=snapshot.total_divested,
+                realized_gain_loss=snapshot.realized_gain_loss
+            )
+            for snapshot in report.snapshots
+        ])
+
+        Family.invalidate_aggregates(asset.family_id)
+        return position
+
+    @staticmethod
+    def _write_snapshot(position, as_of):
+        """Upsert the end-of-day history row from the current position"""
+        from app.models.asset_position_history import AssetPositionHistory
+
+        snapshot = db.session.get(AssetPositionHistory, (position.asset_id, as_of))
+        if snapshot is None:
+            snapshot = AssetPositionHistory(asset_id=position.asset_id, as_of_date=as_of)
+            db.session.add(snapshot)
+
+        snapshot.quantity = position.quantity
+        snapshot.cost_basis = position.cost_basis
+        snapshot.total_invested = position.total_invested
+        snapshot.total_divested = position.total_divested
+        snapshot.realized_gain_loss = position.realized_gain_loss
+        return snapshot
+
+    @staticmethod
+    def rebuild_all(family_id=None) -> int:
+        """Rebuild positions for every asset (or a family's assets)"""
+        from app.models.asset import Asset
+
+        query = Asset.query
+        if family_id:
+            query = query.filter_by(family_id=family_id)
+
+        count = 0
+        for asset in query.all():
+            PositionService.rebuild(asset)
+            count += 1
+
+        logger.info(f"Rebuilt {count} asset positions")
+        return count
@@ -0,0 +1,193 @@
+"""Columnar on-disk price history (NumPy .npy) with a memory-mapped reader"""
+import logging
+import os
+import re
+import shutil
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from app.config.config import Config
+from app.config.extensions import db
+
+logger = logging.getLogger(__name__)
+
+COLUMNS = ("date", "open", "high", "low", "close")
+# Bars streamed per round trip while exporting
+EXPORT_YIELD_PER = 5000
+
+_MONTH_DIR = re.compile(r"^\d{4}-\d{2}$")
+
+
+def _month_start(day: date) -> date:
+    return day.replace(day=1)
+
+
+class PriceHistoryStore:
+    """Daily bars exported to ``<root>/asset_id=<id>/<YYYY-MM>/<column>.npy``.
+
+    Each partition holds one month of one asset, one file per column
+    (``date`` as ``datetime64[D]``, OHLC as ``float64``), sorted by date.
+    ``read`` memory-maps only the partitions overlapping the requested
+    range, so scans over years of prices touch neither the ORM nor the
+    database. Partitions are written to a temporary directory and swapped
+    in, and the export runs from a single scheduled job. Months before
+    ``final_since`` are no longer rewritten; ``QuoteRollupService`` reads
+    them from here and only the recent tail from the database.
+    """
+
+    def __init__(self, root: Optional[str] = None):
+        self.root = root or Config.PRICE_HISTORY_DIR
+
+    def export(self, since: Optional[date] = None) -> Dict[str, int]:
+        """Write the partitions of every month from ``since``.
+
+        By default the previous and current months are rewritten; the first
+        export (empty store) backfills every bar.
+        """
+        from app.models.quote_daily_bar import QuoteDailyBar
+
+        if since is None and self._exported():
+            since = self.final_since()
+
+        rows = db.session.query(
+            QuoteDailyBar.asset_id, QuoteDailyBar.bar_date, QuoteDailyBar.open,
+            QuoteDailyBar.high, QuoteDailyBar.low, QuoteDailyBar.close
+        )
+        if since is not None:
+            since = _month_start(since)
+            rows = rows.filter(QuoteDailyBar.bar_date >= since)
+        rows = rows.order_by(
+            QuoteDailyBar.asset_id, QuoteDailyBar.bar_date
+        ).execution_options(yield_per=EXPORT_YIELD_PER)
+
+        partitions = 0
+        bars = 0
+        current_key = None
+        buffer: List[tuple] = []
+        for row in rows:
+            key = (row[0], _month_start(row[1]))
+            if key != current_key and buffer:
+                self._write_partition(*current_key, buffer)
+                partitions += 1
+                bars += len(buffer)
+                buffer = []
+            current_key = key
+            buffer.append(row[1:])
+        if buffer:
+            self._write_partition(*current_key, buffer)
+            partitions += 1
+            bars += len(buffer)
+
+        logger.info(f"Exported {bars} daily bars into {partitions} partitions since {since or 'the first bar'}")
+        return {'partitions': partitions, 'bars': bars}
+
+    @staticmethod
+    def final_since(today: Optional[date] = None) -> date:
+        """Start of the oldest month the export still rewrites (the previous
+        month may still receive late bars); earlier partitions are final"""
+        return _month_start(_month_start(today or date.today()) - timedelta(days=1))
+
+    def covers(self, asset_id: int, end: date) -> bool:
+        """Whether the exported months of an asset run without gaps up to ``end``.
+
+        The store holds each asset from its first bar (the first export
+        backfills), so only the recent end and gaps need checking.
+        """
+        months = self.months(asset_id)
+        if not months or months[-1] < f"{end:%Y-%m}":
+            return False
+        first_year, first_month = map(int, months[0].split("-"))
+        last_year, last_month = map(int, months[-1].split("-"))
+        return len(months) == (last_year - first_year) * 12 + last_month - first_month + 1
+
+    def prune(self, before: date) -> int:
+        """Delete the partitions of months that end before ``before``"""
+        if not os.path.isdir(self.root):
+            return 0
+        cutoff = f"{before:%Y-%m}"
+        removed = 0
+        for name in os.listdir(self.root):
+            if not name.startswith("asset_id="):
+                continue
+            directory = os.path.join(self.root, name)
+            for month in os.listdir(directory):
+                if _MONTH_DIR.match(month) and month < cutoff:
+                    shutil.rmtree(os.path.join(directory, month), ignore_errors=True)
+                    removed += 1
+        if removed:
+            logger.info(f"Pruned {removed} price history partitions before {cutoff}")
+        return removed
+
+    def months(self, asset_id: int) -> List[str]:
+        """Exported months (``YYYY-MM``) of an asset, in order"""
+        directory = self._asset_dir(asset_id)
+        if not os.path.isdir(directory):
+            return []
+        return sorted(name for name in os.listdir(directory) if _MONTH_DIR.match(name))
+
+    def read(self, asset_id: int, start: Optional[date] = None, end: Optional[date] = None,
+             columns: Iterable[str] = ("date", "close")) -> Dict[str, np.ndarray]:
+        """Columns of the bars between ``start`` and ``end`` (inclusive).
+
+        A range inside one partition returns read-only memory-mapped views;
+        ranges spanning months are concatenated from the mapped slices.
+        """
+        columns = tuple(columns)
+        unknown = set(columns) - set(COLUMNS)
+        if unknown:
+            raise ValueError(f"Unknown columns: {sorted(unknown)}")
+
+        first = f"{start:%Y-%m}" if start else None
+        last = f"{end:%Y-%m}" if end else None
+        parts: Dict[str, List[np.ndarray]] = {column: [] for column in columns}
+        for month in self.months(asset_id):
+            if (first and month < first) or (last and month > last):
+                continue
+            path = os.path.join(self._asset_dir(asset_id), month)
+            dates = np.load(os.path.join(path, "date.npy"), mmap_mode="r")
+            lo = np.searchsorted(dates, np.datetime64(start, "D")) if start else 0
+            hi = np.searchsorted(dates, np.datetime64(end, "D"), side="right") if end else len(dates)
+            if lo >= hi:
+                continue
+            for column in columns:
+                values = dates if column == "date" else np.load(os.path.join(path, f"{column}.npy"), mmap_mode="r")
+                parts[column].append(values[lo:hi])
+
+        result = {}
+        for column in columns:
+            chunks = parts[column]
+            if not chunks:
+                result[column] = np.empty(0, dtype="datetime64[D]" if column == "date" else np.float64)
+            elif len(chunks) == 1:
+                result[column] = chunks[0]
+            else:
+                result[column] = np.concatenate(chunks)
+        return result
+
+    def _exported(self) -> bool:
+        return os.path.isdir(self.root) and any(name.startswith("asset_id=") for name in os.listdir(self.root))
+
+    def _asset_dir(self, asset_id: int) -> str:
+        return os.path.join(self.root, f"asset_id={asset_id}")
+
+    def _write_partition(self, asset_id: int, month: date, rows: List[Tuple]) -> None:
+        directory = self._asset_dir(asset_id)
+        target = os.path.join(directory, f"{month:%Y-%m}")
+        staging = f"{target}.tmp"
+        os.makedirs(directory, exist_ok=True)
+        shutil.rmtree(staging, ignore_errors=True)
+        os.makedirs(staging)
+
+        np.save(os.path.join(staging, "date.npy"), np.array([row[0] for row in rows], dtype="datetime64[D]"))
+        for index, column in enumerate(COLUMNS[1:], start=1):
+            np.save(os.path.join(staging, f"{column}.npy"), np.array([row[index] for row in rows], dtype=np.float64))
+
+        # Swap the finished partition in
+        previous = f"{target}.old"
+        shutil.rmtree(previous, ignore_errors=True)
+        if os.path.isdir(target):
+            os.replace(target, previous)
+        os.replace(staging, target)
+        shutil.rmtree(previous, ignore_errors=True)
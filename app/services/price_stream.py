@@ -0,0 +1,293 @@
+"""Publish/subscribe of price ticks and revalued totals per family (SSE)"""
+import itertools
+import json
+import logging
+import queue
+import select
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Set
+
+from flask import current_app, has_app_context
+from sqlalchemy import text
+
+from app.config.config import Config
+from app.config.extensions import db
+
+logger = logging.getLogger(__name__)
+
+# NOTIFY payloads must stay under PostgreSQL's 8000 byte limit
+NOTIFY_PAYLOAD_LIMIT = 7000
+# Wait before reconnecting a listener whose connection failed
+LISTEN_RETRY_SECONDS = 5.0
+
+
+def format_event(event: str, data, event_id: Optional[int] = None) -> str:
+    """One Server-Sent Events message"""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, default=str)}")
+    return "\n".join(lines) + "\n\n"
+
+
+def valuation_payload(valuation, family_id: int) -> Dict[str, object]:
+    """Revalued totals of one family from a PortfolioValuation"""
+    return {
+        'family_id': family_id,
+        'total_value': valuation.total_value(family_id),
+        'total_cost': valuation.total_cost(family_id),
+        'total_pnl': valuation.total_pnl(family_id),
+        'allocation': valuation.allocation(family_id),
+        'timestamp': datetime.now().isoformat()
+    }
+
+
+class Subscription:
+    """Bounded event queue of one client; the oldest events go first when full"""
+
+    def __init__(self, family_id: int, maxsize: int):
+        self.family_id = family_id
+        self._queue: queue.Queue = queue.Queue(maxsize=maxsize)
+
+    def put(self, message: str) -> None:
+        while True:
+            try:
+                self._queue.put_nowait(message)
+                return
+            except queue.Full:
+                try:
+                    self._queue.get_nowait()
+                except queue.Empty:
+                    pass
+
+    def get(self, timeout: float) -> Optional[str]:
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class PriceStreamBroker:
+    """Fan out quote writes to the SSE subscribers of each family.
+
+    ``publish_quotes`` runs right after the ingest pipeline commits. For
+    every subscribed family holding one of the quoted assets it revalues the
+    family (one ``ValuationService.load``) and queues a ``prices`` event with
+    the new ticks and a ``valuation`` event with the totals. Slow clients
+    never block ingest: their queues drop old events.
+
+    Subscribers live in the process serving their stream. On PostgreSQL the
+    writer only sends the quoted asset ids on ``PRICE_STREAM_CHANNEL``
+    (``pg_notify``, delivered on commit) and every process with subscribers
+    runs a ``LISTEN`` thread that reads the stored prices and fans them out,
+    so quotes written by the scheduler or another worker reach all clients.
+    Other databases (development, tests) deliver in-process.
+
+    Each open stream holds a server thread: deploy with a threaded worker
+    class (gunicorn ``--worker-class gthread``), not sync workers.
+    """
+
+    def __init__(self, queue_size: Optional[int] = None):
+        self.queue_size = queue_size or Config.PRICE_STREAM_QUEUE_SIZE
+        self._subscribers: Dict[int, Set[Subscription]] = defaultdict(set)
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._listener: Optional[threading.Thread] = None
+
+    def subscribe(self, family_id: int) -> Subscription:
+        subscription = Subscription(family_id, self.queue_size)
+        with self._lock:
+            self._subscribers[family_id].add(subscription)
+        if self._cross_process():
+            self._ensure_listener()
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.family_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.family_id]
+
+    def subscribed_families(self) -> Set[int]:
+        with self._lock:
+            return set(self._subscribers)
+
+    def publish(self, family_id: int, event: str, data) -> None:
+        with self._lock:
+            subscribers = list(self._subscribers.get(family_id, ()))
+        if not subscribers:
+            return
+        message = format_event(event, data, next(self._ids))
+        for subscription in subscribers:
+            subscription.put(message)
+
+    def publish_quotes(self, rows: Iterable[Dict]) -> None:
+        """Push ticks and revalued totals for freshly stored quote rows"""
+        rows = list(rows)
+        if self._cross_process():
+            self._notify({row['asset_id'] for row in rows})
+        else:
+            self._publish_rows(rows)
+
+    def publish_stored(self, asset_ids: Iterable[int]) -> None:
+        """Push the stored latest quotes of ``asset_ids`` (listener side)"""
+        families = self.subscribed_families()
+        if not families:
+            return
+        try:
+            from app.models.asset import Asset
+            from app.models.latest_quote import LatestQuote
+
+            quotes = db.session.query(LatestQuote).join(Asset, Asset.id == LatestQuote.asset_id).filter(
+                LatestQuote.asset_id.in_(set(asset_ids)),
+                Asset.family_id.in_(families)
+            ).all()
+            self._publish_rows([
+                {
+                    'asset_id': quote.asset_id,
+                    'price': quote.price,
+                    'currency': quote.currency,
+                    'source': quote.source,
+                    'timestamp': quote.timestamp
+                }
+                for quote in quotes
+            ])
+        except Exception as e:
+            logger.error(f"Error publishing stored price updates: {e}")
+
+    def _publish_rows(self, rows: List[Dict]) -> None:
+        families = self.subscribed_families()
+        if not families or not rows:
+            return
+        try:
+            from app.models.asset import Asset
+            from app.services.valuation_service import ValuationService
+
+            owners = dict(
+                db.session.query(Asset.id, Asset.family_id).filter(
+                    Asset.id.in_({row['asset_id'] for row in rows}),
+                    Asset.family_id.in_(families)
+                ).all()
+            )
+            ticks: Dict[int, List[Dict]] = defaultdict(list)
+            for row in rows:
+                family_id = owners.get(row['asset_id'])
+                if family_id is not None:
+                    ticks[family_id].append({
+                        'asset_id': row['asset_id'],
+                        'price': row['price'],
+                        'currency': row['currency'],
+                        'source': row['source'],
+                        'timestamp': row['timestamp']
+                    })
+            if not ticks:
+                return
+
+            valuation = ValuationService.load(list(ticks))
+            for family_id, family_ticks in ticks.items():
+                self.publish(family_id, 'prices', {'family_id': family_id, 'quotes': family_ticks})
+                self.publish(family_id, 'valuation', valuation_payload(valuation, family_id))
+        except Exception as e:
+            logger.error(f"Error publishing price updates: {e}")
+
+    @staticmethod
+    def _cross_process() -> bool:
+        return has_app_context() and db.engine.dialect.name == "postgresql"
+
+    @staticmethod
+    def notify_payloads(asset_ids: Iterable[int]) -> List[str]:
+        """Comma-separated asset ids split to fit NOTIFY payloads"""
+        payloads, current = [], ""
+        for asset_id in sorted(asset_ids):
+            item = str(asset_id)
+            if current and len(current) + len(item) + 1 > NOTIFY_PAYLOAD_LIMIT:
+                payloads.append(current)
+                current = ""
+            current = f"{current},{item}" if current else item
+        if current:
+            payloads.append(current)
+        return payloads
+
+    def _notify(self, asset_ids: Set[int]) -> None:
+        try:
+            for payload in self.notify_payloads(asset_ids):
+                db.session.execute(
+                    text("SELECT pg_notify(:channel, :payload)"),
+                    {'channel': Config.PRICE_STREAM_CHANNEL, 'payload': payload}
+                )
+            db.session.commit()
+        except Exception as e:
+            logger.error(f"Error notifying price updates: {e}")
+            db.session.rollback()
+
+    def _ensure_listener(self) -> None:
+        with self._lock:
+            if self._listener is not None and self._listener.is_alive():
+                return
+            app = current_app._get_current_object()
+            self._listener = threading.Thread(
+                target=self._listen, args=(app,), name="price-stream-listen", daemon=True
+            )
+            self._listener.start()
+
+    def _listen(self, app) -> None:
+        """LISTEN loop on a dedicated connection; reconnects after failures"""
+        while True:
+            connection = None
+            try:
+                with app.app_context():
+                    connection = db.engine.raw_connection()
+                # Taken out of the pool: it stays in autocommit, listening
+                connection.detach()
+                driver = connection.driver_connection
+                driver.autocommit = True
+                with driver.cursor() as cursor:
+                    cursor.execute(f"LISTEN {Config.PRICE_STREAM_CHANNEL}")
+
+                while True:
+                    if not select.select([driver], [], [], Config.PRICE_STREAM_HEARTBEAT_SECONDS)[0]:
+                        continue
+                    driver.poll()
+                    asset_ids = set()
+                    while driver.notifies:
+                        payload = driver.notifies.pop(0).payload
+                        asset_ids.update(int(item) for item in payload.split(",") if item)
+                    if asset_ids:
+                        with app.app_context():
+                            try:
+                                self.publish_stored(asset_ids)
+                            finally:
+                                db.session.remove()
+            except Exception as e:
+                logger.error(f"Price stream listener failed, reconnecting: {e}")
+                time.sleep(LISTEN_RETRY_SECONDS)
+            finally:
+                if connection is not None:
+                    try:
+                        connection.close()
+                    except Exception:
+                        pass
+
+    def stream(self, subscription: Subscription, initial: Iterable[str] = (),
+               heartbeat: Optional[float] = None) -> Iterator[str]:
+        """SSE body for a subscription; unsubscribes when the client goes away"""
+        heartbeat = heartbeat or Config.PRICE_STREAM_HEARTBEAT_SECONDS
+        try:
+            yield f"retry: {Config.PRICE_STREAM_RETRY_MS}\n\n"
+            yield from initial
+            while True:
+                message = subscription.get(timeout=heartbeat)
+                # Comment lines keep proxies from closing an idle stream
+                yield message if message is not None else ": keep-alive\n\n"
+        finally:
+            self.unsubscribe(subscription)
+
+
+# Shared by the ingest pipeline and the stream endpoint
+price_stream = PriceStreamBroker()
@@ -0,0 +1,155 @@
+"""HTTP sessions for market data providers: live, recording or replaying fixtures"""
+import hashlib
+import json
+import logging
+import os
+import random
+import threading
+import time
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+import requests
+
+from app.config.config import Config
+
+logger = logging.getLogger(__name__)
+
+LIVE = "live"
+RECORD = "record"
+REPLAY = "replay"
+
+# Never written to fixtures nor part of the request key
+SECRET_PARAMS = {"apikey", "api_key", "token", "key"}
+
+
+class ReplayMissError(requests.ConnectionError):
+    """No recorded response for a request in replay mode"""
+
+
+def _request_key(method: str, url: str, params) -> Tuple[str, Dict[str, str]]:
+    """Stable fixture key: method, URL without query and sorted non-secret params"""
+    parts = urlsplit(url)
+    clean = {
+        str(name): str(value)
+        for name, value in sorted(dict(params or {}).items())
+        if str(name).lower() not in SECRET_PARAMS
+    }
+    raw = json.dumps([method.upper(), f"{parts.netloc}{parts.path}", clean], sort_keys=True)
+    return hashlib.sha1(raw.encode()).hexdigest(), clean
+
+
+def _fixture_path(root: str, url: str, key: str) -> str:
+    return os.path.join(root, urlsplit(url).netloc or "local", f"{key}.json")
+
+
+class RecordingSession(requests.Session):
+    """Live session that also writes every response to a fixture file"""
+
+    def __init__(self, root: str):
+        super().__init__()
+        self.root = root
+
+    def request(self, method, url, params=None, **kwargs):
+        response = super().request(method, url, params=params, **kwargs)
+        key, clean = _request_key(method, url, params)
+        path = _fixture_path(self.root, url, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fixture = {
+            'method': method.upper(),
+            'url': url,
+            'params': clean,
+            'status': response.status_code,
+            'content_type': response.headers.get('Content-Type', 'application/json'),
+            'body': response.text
+        }
+        staging = f"{path}.tmp"
+        with open(staging, "w", encoding="utf-8") as handle:
+            json.dump(fixture, handle, ensure_ascii=False, indent=1)
+        os.replace(staging, path)
+        return response
+
+
+class ReplaySession(requests.Session):
+    """Serves recorded responses without touching the network.
+
+    ``latency_ms`` (plus up to ``jitter_ms``) is slept before each answer and
+    ``error_rate`` of the requests fail with a connection error. With a
+    ``seed`` the injected faults depend only on the request and how many
+    times it was made, not on thread scheduling, so concurrent runs replay
+    identically.
+    """
+
+    def __init__(self, root: str, latency_ms: float = 0.0, jitter_ms: float = 0.0,
+                 error_rate: float = 0.0, seed: Optional[int] = None):
+        super().__init__()
+        self.root = root
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.seed = seed
+        self._fixtures: Dict[str, Optional[dict]] = {}
+        self._calls: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def request(self, method, url, params=None, **kwargs):
+        key, _ = _request_key(method, url, params)
+        with self._lock:
+            call = self._calls.get(key, 0)
+            self._calls[key] = call + 1
+        rng = random.Random(f"{self.seed}:{key}:{call}") if self.seed is not None else random.Random()
+
+        delay = self.latency_ms + rng.uniform(0, self.jitter_ms)
+        if delay:
+            time.sleep(delay / 1000)
+        if self.error_rate and rng.random() < self.error_rate:
+            raise requests.ConnectionError(f"Injected failure for {method.upper()} {url}")
+
+        fixture = self._load(url, key)
+        if fixture is None:
+            raise ReplayMissError(f"No recorded response for {method.upper()} {url} {params or ''}")
+        return self._response(fixture, url)
+
+    def _load(self, url: str, key: str) -> Optional[dict]:
+        with self._lock:
+            if key in self._fixtures:
+                return self._fixtures[key]
+        path = _fixture_path(self.root, url, key)
+        fixture = None
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as handle:
+                fixture = json.load(handle)
+        with self._lock:
+            self._fixtures[key] = fixture
+        return fixture
+
+    @staticmethod
+    def _response(fixture: dict, url: str) -> requests.Response:
+        response = requests.Response()
+        response.status_code = fixture['status']
+        response.headers['Content-Type'] = fixture.get('content_type', 'application/json')
+        response._content = fixture['body'].encode("utf-8")
+        response.encoding = "utf-8"
+        response.url = url
+        return response
+
+
+def provider_session(user_agent: str) -> requests.Session:
+    """Session for provider calls in the configured ``QUOTE_PROVIDER_MODE``"""
+    mode = Config.QUOTE_PROVIDER_MODE
+    if mode == RECORD:
+        session = RecordingSession(Config.QUOTE_FIXTURES_DIR)
+    elif mode == REPLAY:
+        session = ReplaySession(
+            Config.QUOTE_FIXTURES_DIR,
+            latency_ms=Config.QUOTE_REPLAY_LATENCY_MS,
+            jitter_ms=Config.QUOTE_REPLAY_JITTER_MS,
+            error_rate=Config.QUOTE_REPLAY_ERROR_RATE,
+            seed=Config.QUOTE_PROVIDER_SEED
+        )
+    else:
+        if mode != LIVE:
+            logger.warning(f"Unknown QUOTE_PROVIDER_MODE {mode!r}, using live providers")
+        session = requests.Session()
+    session.headers.update({'User-Agent': user_agent})
+    return session
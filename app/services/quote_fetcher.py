@@ -0,0 +1,142 @@
+"""Concurrent quote fetching with per-provider limits and an overall deadline"""
+import logging
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+from app.config.config import Config
+
+logger = logging.getLogger(__name__)
+
+# Limit for providers missing from QUOTE_PROVIDER_CONCURRENCY
+DEFAULT_PROVIDER_CONCURRENCY = 2
+
+
+@dataclass
+class FetchResult:
+    """Quotes fetched by key, plus the reason for every key without one"""
+    quotes: Dict[Hashable, Any] = field(default_factory=dict)
+    failed: Dict[Hashable, str] = field(default_factory=dict)
+    elapsed: float = 0.0
+    requests: int = 0
+
+    @property
+    def timed_out(self) -> int:
+        return sum(1 for reason in self.failed.values() if reason == "deadline exceeded")
+
+
+class QuoteFetcher:
+    """Run provider calls on a bounded thread pool.
+
+    Each provider has its own semaphore so a slow or rate-limited API cannot
+    take every worker, and the whole run stops at ``deadline`` seconds:
+    calls still pending are dropped and reported as failed. The fetch
+    callable must not touch the database; callers persist the results on
+    their own thread once ``fetch_all`` returns.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, deadline: Optional[float] = None,
+                 provider_limits: Optional[Dict[str, int]] = None):
+        self.max_workers = max_workers or Config.QUOTE_FETCH_MAX_WORKERS
+        self.deadline = deadline if deadline is not None else Config.QUOTE_FETCH_DEADLINE_SECONDS
+        self.provider_limits = provider_limits or Config.QUOTE_PROVIDER_CONCURRENCY
+
+    def fetch_all(self, jobs: Dict[Hashable, Tuple[str, str]],
+                  fetch: Callable[[str, str], Optional[Any]],
+                  batch_fetch: Optional[Callable[[str, List[str]], Dict[str, Any]]] = None,
+                  batch_sizes: Optional[Dict[str, int]] = None) -> FetchResult:
+        """Fetch ``{key: (provider, symbol)}`` concurrently.
+
+        Providers listed in ``batch_sizes`` are called through ``batch_fetch``
+        with chunks of up to that many unique symbols, returning
+        ``{symbol: quote}``; every other provider gets one ``fetch`` call per
+        unique symbol. Keys sharing a (provider, symbol) share the call.
+        """
+        result = FetchResult()
+        if not jobs:
+            return result
+
+        if batch_fetch is None:
+            batch_sizes = None
+        batch_sizes = batch_sizes or {}
+        started = time.monotonic()
+        deadline_at = started + self.deadline
+
+        keys_by_source = defaultdict(list)
+        for key, source in jobs.items():
+            keys_by_source[source].append(key)
+        symbols_by_provider = defaultdict(list)
+        for provider, symbol in keys_by_source:
+            symbols_by_provider[provider].append(symbol)
+
+        # One task per chunk (batched providers) or per symbol
+        tasks = []
+        for provider, symbols in symbols_by_provider.items():
+            size = batch_sizes.get(provider)
+            if size:
+                tasks.extend((provider, symbols[i:i + size], True) for i in range(0, len(symbols), size))
+            else:
+                tasks.extend((provider, [symbol], False) for symbol in symbols)
+
+        semaphores = {
+            provider: threading.BoundedSemaphore(self.provider_limits.get(provider, DEFAULT_PROVIDER_CONCURRENCY))
+            for provider in symbols_by_provider
+        }
+
+        def run(provider, symbols, batched):
+            semaphore = semaphores[provider]
+            # Never wait for a provider slot past the deadline
+            if not semaphore.acquire(timeout=max(deadline_at - time.monotonic(), 0)):
+                raise TimeoutError("deadline exceeded")
+            try:
+                if batched:
+                    return batch_fetch(provider, symbols) or {}
+                return {symbols[0]: fetch(provider, symbols[0])}
+            finally:
+                semaphore.release()
+
+        def fail(provider, symbols, reason):
+            for symbol in symbols:
+                for key in keys_by_source[(provider, symbol)]:
+                    result.failed[key] = reason
+
+        executor = ThreadPoolExecutor(max_workers=min(self.max_workers, len(tasks)), thread_name_prefix="quote-fetch")
+        try:
+            futures = {executor.submit(run, *task): task for task in tasks}
+            done, pending = wait(futures, timeout=max(deadline_at - time.monotonic(), 0))
+
+            for future in done:
+                provider, symbols, _ = futures[future]
+                try:
+                    quotes = future.result()
+                except TimeoutError:
+                    fail(provider, symbols, "deadline exceeded")
+                except Exception as e:
+                    fail(provider, symbols, str(e))
+                else:
+                    for symbol in symbols:
+                        quote = quotes.get(symbol)
+                        if quote:
+                            for key in keys_by_source[(provider, symbol)]:
+                                result.quotes[key] = quote
+                        else:
+                            fail(provider, [symbol], "no quote")
+
+            for future in pending:
+                future.cancel()
+                provider, symbols, _ = futures[future]
+                fail(provider, symbols, "deadline exceeded")
+        finally:
+            # Calls already in flight finish on their own; nothing waits for them
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        result.elapsed = time.monotonic() - started
+        result.requests = len(tasks)
+        logger.info(
+            f"Fetched {len(result.quotes)}/{len(jobs)} quotes with {len(tasks)} requests "
+            f"in {result.elapsed:.2f}s ({result.timed_out} past deadline)"
+        )
+        return result
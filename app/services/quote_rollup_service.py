@@ -0,0 +1,192 @@
+"""Daily OHLC rollup and tiered retention of the quote history"""
+import logging
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import insert, tuple_
+
+from app.config.config import Config
+from app.config.extensions import db
+from app.services.price_history_store import PriceHistoryStore
+
+logger = logging.getLogger(__name__)
+
+# Raw rows streamed per round trip while rolling up
+ROLLUP_YIELD_PER = 5000
+# (asset_id, bar_date) keys per DELETE when replacing bars
+ROLLUP_DELETE_CHUNK_SIZE = 500
+
+
+@dataclass
+class _Bar:
+    open: float
+    high: float
+    low: float
+    close: float
+    currency: str
+    quote_count: int = 1
+
+    def add(self, price: float, currency: str) -> None:
+        self.high = max(self.high, price)
+        self.low = min(self.low, price)
+        self.close = price
+        self.currency = currency
+        self.quote_count += 1
+
+
+class QuoteRollupService:
+    """Compact raw quotes into daily bars and expire each tier.
+
+    Tiers: raw ``quote_history`` rows are kept for
+    ``QUOTE_RAW_RETENTION_DAYS``; ``quote_daily_bars`` for
+    ``QUOTE_BAR_RETENTION_DAYS`` (0 keeps them forever). Rollup is
+    idempotent: bars of every finished day still covered by raw rows are
+    recomputed, so it can run any number of times before retention.
+    """
+
+    @staticmethod
+    def rollup(until: Optional[date] = None) -> Dict[str, int]:
+        """Build bars for every finished day (before ``until``, default today)"""
+        from app.models.quote_daily_bar import QuoteDailyBar
+        from app.models.quote_history import QuoteHistory
+
+        until = until or date.today()
+        rows = db.session.query(
+            QuoteHistory.asset_id, QuoteHistory.timestamp, QuoteHistory.price, QuoteHistory.currency
+        ).filter(
+            QuoteHistory.timestamp < datetime.combine(until, time.min)
+        ).order_by(
+            QuoteHistory.asset_id, QuoteHistory.timestamp, QuoteHistory.id
+        ).execution_options(yield_per=ROLLUP_YIELD_PER)
+
+        bars: Dict[Tuple[int, date], _Bar] = {}
+        raw_count = 0
+        for asset_id, timestamp, price, currency in rows:
+            raw_count += 1
+            key = (asset_id, timestamp.date())
+            bar = bars.get(key)
+            if bar is None:
+                bars[key] = _Bar(open=price, high=price, low=price, close=price, currency=currency)
+            else:
+                bar.add(price, currency)
+
+        if not bars:
+            return {'bars': 0, 'raw_quotes': 0}
+
+        # Replace the bars of the days covered by raw rows
+        keys = list(bars)
+        for start in range(0, len(keys), ROLLUP_DELETE_CHUNK_SIZE):
+            QuoteDailyBar.query.filter(
+                tuple_(QuoteDailyBar.asset_id, QuoteDailyBar.bar_date).in_(keys[start:start + ROLLUP_DELETE_CHUNK_SIZE])
+            ).delete(synchronize_session=False)
+
+        db.session.execute(insert(QuoteDailyBar), [
+            {
+                'asset_id': asset_id,
+                'bar_date': bar_date,
+                'open': bar.open,
+                'high': bar.high,
+                'low': bar.low,
+                'close': bar.close,
+                'currency': bar.currency,
+                'quote_count': bar.quote_count
+            }
+            for (asset_id, bar_date), bar in bars.items()
+        ])
+        db.session.commit()
+
+        logger.info(f"Rolled up {raw_count} quotes into {len(bars)} daily bars")
+        return {'bars': len(bars), 'raw_quotes': raw_count}
+
+    @staticmethod
+    def apply_retention(today: Optional[date] = None) -> Dict[str, int]:
+        """Delete raw quotes and bars past their tier's retention"""
+        from app.models.quote_daily_bar import QuoteDailyBar
+        from app.models.quote_history import QuoteHistory
+
+        today = today or date.today()
+        raw_cutoff = today - timedelta(days=Config.QUOTE_RAW_RETENTION_DAYS)
+        # Raw rows only go once their day has a bar
+        QuoteRollupService.rollup(until=today)
+
+        raw_removed = QuoteHistory.query.filter(
+            QuoteHistory.timestamp < datetime.combine(raw_cutoff, time.min)
+        ).delete(synchronize_session=False)
+
+        bars_removed = 0
+        partitions_removed = 0
+        if Config.QUOTE_BAR_RETENTION_DAYS:
+            bar_cutoff = today - timedelta(days=Config.QUOTE_BAR_RETENTION_DAYS)
+            bars_removed = QuoteDailyBar.query.filter(
+                QuoteDailyBar.bar_date < bar_cutoff
+            ).delete(synchronize_session=False)
+            # Exported months follow the bars out
+            partitions_removed = PriceHistoryStore().prune(bar_cutoff)
+
+        db.session.commit()
+        logger.info(f"Retention removed {raw_removed} raw quotes, {bars_removed} daily bars "
+                    f"and {partitions_removed} price history partitions")
+        return {'raw_quotes_removed': raw_removed, 'daily_bars_removed': bars_removed,
+                'partitions_removed': partitions_removed}
+
+    @staticmethod
+    def daily_closes(asset_id: int, days: int, today: Optional[date] = None) -> List[Tuple[date, float]]:
+        """Closing price per day over the last ``days`` days.
+
+        Bars cover finished days; days not rolled up yet (today, or before
+        the first rollup run) are closed from the raw quotes.
+        """
+        return QuoteRollupService.daily_closes_many([asset_id], days, today).get(asset_id, [])
+
+    @staticmethod
+    def daily_closes_many(asset_ids: Iterable[int], days: int,
+                          today: Optional[date] = None) -> Dict[int, List[Tuple[date, float]]]:
+        """``daily_closes`` for several assets in two queries.
+
+        Final months already exported to the ``PriceHistoryStore`` are read
+        from its memory-mapped files; the database only serves the bars
+        after them.
+        """
+        from app.models.quote_daily_bar import QuoteDailyBar
+        from app.models.quote_history import QuoteHistory
+
+        asset_ids = list(asset_ids)
+        if not asset_ids:
+            return {}
+        today = today or date.today()
+        since = today - timedelta(days=days)
+
+        closes: Dict[int, Dict[date, float]] = {asset_id: {} for asset_id in asset_ids}
+        store = PriceHistoryStore()
+        final_since = store.final_since(today)
+        bar_since = {}
+        for asset_id in asset_ids:
+            bar_since[asset_id] = since
+            if since < final_since and store.covers(asset_id, final_since - timedelta(days=1)):
+                exported = store.read(asset_id, since, final_since - timedelta(days=1))
+                closes[asset_id].update(zip(exported['date'].tolist(), exported['close'].tolist()))
+                bar_since[asset_id] = final_since
+
+        bars = db.session.query(QuoteDailyBar.asset_id, QuoteDailyBar.bar_date, QuoteDailyBar.close).filter(
+            QuoteDailyBar.asset_id.in_(asset_ids),
+            QuoteDailyBar.bar_date >= min(bar_since.values())
+        )
+        for asset_id, bar_date, close in bars:
+            if bar_date >= bar_since[asset_id]:
+                closes[asset_id][bar_date] = close
+
+        # Raw quotes only after each asset's last bar
+        raw_since = {
+            asset_id: max(series) + timedelta(days=1) if series else since
+            for asset_id, series in closes.items()
+        }
+        raw = db.session.query(QuoteHistory.asset_id, QuoteHistory.timestamp, QuoteHistory.price).filter(
+            QuoteHistory.asset_id.in_(asset_ids),
+            QuoteHistory.timestamp >= datetime.combine(min(raw_since.values()), time.min)
+        ).order_by(QuoteHistory.timestamp, QuoteHistory.id)
+        for asset_id, timestamp, price in raw:
+            if timestamp.date() >= raw_since[asset_id]:
+                closes[asset_id][timestamp.date()] = price
+
+        return {asset_id: sorted(series.items()) for asset_id, series in closes.items()}
@@ -1,11 +1,20 @@
 """Quote service for fetching asset prices from external APIs"""
 import requests
 import logging
+from collections import defaultdict
 from datetime import datetime, timedelta
-from typing import Dict, Optional, List
+from typing import Dict, Optional, List, Tuple
+from app.config.config import Config
 from app.config.extensions import db
 from app.models.asset import Asset
+from app.models.latest_quote import LatestQuote
 from app.models.quote_history import QuoteHistory
+from app.services.cache_service import quote_cache, quote_cache_key
+from app.services.market_data_service import MarketData, MarketDataService
+from app.services.provider_session import provider_session
+from app.services.quote_fetcher import QuoteFetcher
+from app.services.quote_rollup_service import QuoteRollupService
+from app.services.quote_store import QuoteStore
 
 logger = logging.getLogger(__name__)
 
@@ -13,10 +22,9 @@ class QuoteService:
     """Service for managing asset quotes and price updates"""
     
     def __init__(self):
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'FamilyOffice/1.0'
-        })
+        self.session = provider_session('FamilyOffice/1.0')
+        self.fetcher = QuoteFetcher()
+        self.cache = quote_cache
     
     def get_yahoo_finance_quote(self, symbol: str) -> Optional[Dict]:
         """Get quote from Yahoo Finance API"""
@@ -49,31 +57,42 @@ class QuoteService:
             logger.error(f"Error fetching Yahoo Finance quote for {symbol}: {e}")
             return None
     
+    def get_coingecko_quotes(self, coin_ids: List[str]) -> Dict[str, Dict]:
+        """Get quotes for several coins in one CoinGecko request (comma-separated ids)"""
+        url = f"https://api.coingecko.com/api/v3/simple/price"
+        params = {
+            'ids': ','.join(coin_ids),
+            'vs_currencies': 'usd,brl',
+            'include_24hr_change': True
+        }
+        
+        response = self.session.get(url, params=params, timeout=10)
+        response.raise_for_status()
+        
+        data = response.json()
+        quotes = {}
+        for coin_id in coin_ids:
+            # Moedas ausentes ou sem USD/BRL ficam de fora sem derrubar o lote
+            prices = data.get(coin_id) or {}
+            if prices.get('usd') is None or prices.get('brl') is None:
+                continue
+            quotes[coin_id] = {
+                'symbol': coin_id,
+                # Stored and cached in reais, like MarketDataService
+                'price': prices['brl'],
+                'currency': 'BRL',
+                'price_usd': prices['usd'],
+                'price_brl': prices['brl'],
+                'change_24h': prices.get('usd_24h_change', 0),
+                'timestamp': datetime.now(),
+                'source': 'coingecko'
+            }
+        return quotes
+    
     def get_coingecko_quote(self, coin_id: str) -> Optional[Dict]:
         """Get cryptocurrency quote from CoinGecko API"""
         try:
-            url = f"https://api.coingecko.com/api/v3/simple/price"
-            params = {
-                'ids': coin_id,
-                'vs_currencies': 'usd,brl',
-                'include_24hr_change': True
-            }
-            
-            response = self.session.get(url, params=params, timeout=10)
-            response.raise_for_status()
-            
-            data = response.json()
-            if coin_id in data and 'usd' in data[coin_id]:
-                return {
-                    'symbol': coin_id,
-                    'price_usd': data[coin_id]['usd'],
-                    'price_brl': data[coin_id]['brl'],
-                    'change_24h': data[coin_id].get('usd_24h_change', 0),
-                    'timestamp': datetime.now(),
-                    'source': 'coingecko'
-                }
-            
-            return None
+            return self.get_coingecko_quotes([coin_id]).get(coin_id)
             
         except Exception as e:
             logger.error(f"Error fetching CoinGecko quote for {coin_id}: {e}")
@@ -106,7 +125,17 @@ class QuoteService:
             return None
     
     def update_asset_quotes(self, family_id: Optional[int] = None) -> Dict[str, int]:
-        """Update quotes for all assets or specific family"""
+        """Update quotes for all assets or specific family.
+
+        Assets are collapsed into unique (provider, symbol) keys so an
+        instrument held by many families is fetched once and its price fanned
+        out. CoinGecko ids are requested in chunks through its multi-symbol
+        endpoint; Yahoo's batch endpoint needs a crumb/cookie handshake, so
+        each Yahoo symbol is its own chart call. Provider calls run
+        concurrently through ``QuoteFetcher`` (bounded pool, per-provider
+        limits, overall deadline); the results are then written in one batch
+        on this thread.
+        """
         try:
             # Query assets to update
             query = Asset.query
@@ -114,80 +143,118 @@ class QuoteService:
                 query = query.filter_by(family_id=family_id)
             
             assets = query.all()
-            updated_count = 0
-            error_count = 0
-            
+            holders = defaultdict(list)
             for asset in assets:
-                try:
-                    quote_data = self._get_quote_for_asset(asset)
-                    if quote_data:
-                        self._save_quote_history(asset, quote_data)
-                        updated_count += 1
-                    else:
-                        error_count += 1
-                        
-                except Exception as e:
-                    logger.error(f"Error updating quote for asset {asset.id}: {e}")
-                    error_count += 1
+                source = self._quote_source_for_asset(asset)
+                if source:
+                    holders[source].append(asset)
+            
+            fetched = self.fetcher.fetch_all(
+                {source: source for source in holders}, self._fetch_quote,
+                batch_fetch=self._fetch_quote_batch, batch_sizes=Config.QUOTE_PROVIDER_BATCH_SIZE
+            )
+            # Warm the cache the risk analysis reads (same keys and MarketData values)
+            for (provider, symbol), quote_data in fetched.quotes.items():
+                self.cache.put(quote_cache_key(provider, symbol), provider, self._market_data(symbol, quote_data))
+            for (provider, symbol), reason in fetched.failed.items():
+                if reason != "deadline exceeded":
+                    self.cache.put(quote_cache_key(provider, symbol), provider, None)
+                logger.error(f"Error updating quote for {provider}:{symbol} "
+                             f"({len(holders[(provider, symbol)])} assets): {reason}")
+            
+            saved = self._save_quote_batch([
+                (asset, quote_data)
+                for source, quote_data in fetched.quotes.items()
+                for asset in holders[source]
+            ])
             
             return {
-                'updated': updated_count,
-                'errors': error_count,
-                'total': len(assets)
+                'updated': saved,
+                'errors': len(assets) - saved,
+                'total': len(assets),
+                'symbols': len(holders),
+                'requests': fetched.requests,
+                'timed_out': fetched.timed_out,
+                'elapsed_seconds': round(fetched.elapsed, 2)
             }
             
         except Exception as e:
             logger.error(f"Error in bulk quote update: {e}")
             return {'updated': 0, 'errors': 1, 'total': 0}
     
-    def _get_quote_for_asset(self, asset: Asset) -> Optional[Dict]:
-        """Get appropriate quote based on asset type"""
-        asset_type = asset.asset_type
-        
-        if asset_type == 'renda_variavel':
-            # Buscar ticker dos detalhes
-            ticker = asset.details.get('ticker') if asset.details else None
-            if ticker:
-                return self.get_yahoo_finance_quote(ticker)
-                
-        elif asset_type == 'criptomoeda':
-            # Buscar coin ID dos detalhes
-            coin_id = asset.details.get('coin_id') if asset.details else None
-            if coin_id:
-                return self.get_coingecko_quote(coin_id)
-                
-        elif asset_type == 'moeda_estrangeira':
-            # Buscar cotação de moeda
-            currency = asset.details.get('currency') if asset.details else 'USD'
-            return self.get_bacen_quote(currency)
-        
+    def _quote_source_for_asset(self, asset: Asset) -> Optional[Tuple[str, str]]:
+        """(provider, symbol) used to quote an asset, based on its type.
+
+        Shared with ``MarketDataService`` so both services fetch and cache
+        an instrument under the same normalised symbol.
+        """
+        return MarketDataService.quote_source(asset)
+    
+    def _fetch_quote(self, provider: str, symbol: str) -> Optional[Dict]:
+        """Call the provider API for a single symbol"""
+        if provider == 'yahoo_finance':
+            return self.get_yahoo_finance_quote(symbol)
+        elif provider == 'coingecko':
+            return self.get_coingecko_quote(symbol)
+        elif provider == 'bacen':
+            return self.get_bacen_quote(symbol)
         return None
     
-    def _save_quote_history(self, asset: Asset, quote_data: Dict):
-        """Save quote to history table"""
-        try:
-            quote = QuoteHistory(
+    def _fetch_quote_batch(self, provider: str, symbols: List[str]) -> Dict[str, Dict]:
+        """Call a multi-symbol provider endpoint for one chunk of symbols"""
+        if provider == 'coingecko':
+            return self.get_coingecko_quotes(symbols)
+        return {symbol: self._fetch_quote(provider, symbol) for symbol in symbols}
+    
+    @staticmethod
+    def _quote_price(quote_data: Dict) -> float:
+        """Price field of a provider payload (stocks, crypto or FX rate)"""
+        for key in ('price', 'price_usd', 'rate'):
+            if quote_data.get(key) is not None:
+                return quote_data[key]
+        return 0
+    
+    @classmethod
+    def _market_data(cls, symbol: str, quote_data: Dict) -> MarketData:
+        """Provider payload as the ``MarketData`` value kept in the quote cache"""
+        return MarketData(
+            symbol=symbol,
+            price=cls._quote_price(quote_data),
+            currency=quote_data.get('currency', 'USD'),
+            change_24h=0,
+            change_percent_24h=quote_data.get('change_24h') or 0,
+            volume=0,
+            source=quote_data['source'],
+            timestamp=quote_data.get('timestamp')
+        )
+    
+    def _save_quote_batch(self, results: List[Tuple[Asset, Dict]]) -> int:
+        """Save fetched quotes to the history table with chunked bulk inserts"""
+        store = QuoteStore()
+        for asset, quote_data in results:
+            store.add(
                 asset_id=asset.id,
-                price=quote_data.get('price', quote_data.get('price_usd', 0)),
+                price=self._quote_price(quote_data),
                 currency=quote_data.get('currency', 'USD'),
                 source=quote_data['source'],
-                timestamp=quote_data['timestamp']
+                timestamp=quote_data.get('timestamp')
             )
-            
-            db.session.add(quote)
-            db.session.commit()
-            
+        
+        try:
+            saved = store.flush()
         except Exception as e:
             logger.error(f"Error saving quote history: {e}")
             db.session.rollback()
+            return 0
+        
+        for failure in saved.failed:
+            logger.error(f"Error saving quote for asset {failure['row']['asset_id']}: {failure['error']}")
+        return saved.saved
     
     def get_asset_current_price(self, asset_id: int) -> Optional[float]:
         """Get current price for an asset"""
         try:
-            latest_quote = QuoteHistory.query.filter_by(
-                asset_id=asset_id
-            ).order_by(QuoteHistory.timestamp.desc()).first()
-            
+            latest_quote = db.session.get(LatestQuote, asset_id)
             return latest_quote.price if latest_quote else None
             
         except Exception as e:
@@ -195,8 +262,22 @@ class QuoteService:
             return None
     
     def get_asset_price_history(self, asset_id: int, days: int = 30) -> List[Dict]:
-        """Get price history for an asset"""
+        """Get price history for an asset.
+
+        Ranges longer than the raw retention are served from the daily bars
+        (one close per day).
+        """
         try:
+            if days > Config.QUOTE_RAW_RETENTION_DAYS:
+                return [
+                    {
+                        'price': close,
+                        'timestamp': datetime.combine(day, datetime.min.time()).isoformat(),
+                        'source': 'daily_close'
+                    }
+                    for day, close in QuoteRollupService.daily_closes(asset_id, days)
+                ]
+            
             since_date = datetime.now() - timedelta(days=days)
             
             quotes = QuoteHistory.query.filter(
@@ -0,0 +1,110 @@
+"""Bulk persistence of fetched quotes into quote_history"""
+import logging
+import math
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy import insert
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.config.config import Config
+from app.config.extensions import db
+from app.models.latest_quote import LatestQuote
+from app.models.quote_history import QuoteHistory
+from app.models.risk_snapshot import RiskDirtyFamily
+from app.services.price_stream import price_stream
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class SaveResult:
+    """Rows written, plus every rejected row with the reason"""
+    saved: int = 0
+    failed: List[dict] = field(default_factory=list)
+
+
+class QuoteStore:
+    """Buffer quote rows and write them with chunked multi-row INSERTs.
+
+    Rows are validated in memory first, then each chunk goes out as one
+    executemany inside a savepoint. A chunk the database rejects is retried
+    row by row so a single bad row is reported instead of aborting the batch.
+    Everything is committed once at the end, then pushed to the price
+    stream subscribers of the affected families.
+    """
+
+    def __init__(self, chunk_size: Optional[int] = None):
+        self.chunk_size = chunk_size or Config.QUOTE_INSERT_CHUNK_SIZE
+        self._rows: List[dict] = []
+        self._failed: List[dict] = []
+
+    def add(self, asset_id: int, price, currency: Optional[str], source: str,
+            timestamp: Optional[datetime] = None) -> None:
+        row = {
+            "asset_id": asset_id,
+            "price": price,
+            "currency": currency or "USD",
+            "source": source,
+            "timestamp": timestamp or datetime.now()
+        }
+        reason = self._validate(row)
+        if reason:
+            self._failed.append({"row": row, "error": reason})
+        else:
+            self._rows.append(row)
+
+    def flush(self) -> SaveResult:
+        """Insert the buffered rows and commit once"""
+        result = SaveResult(failed=self._failed)
+        rows, self._rows, self._failed = self._rows, [], []
+        saved: List[dict] = []
+
+        for start in range(0, len(rows), self.chunk_size):
+            chunk = rows[start:start + self.chunk_size]
+            if self._insert(chunk) is None:
+                saved.extend(chunk)
+                continue
+            # Isolate the offending rows
+            for row in chunk:
+                error = self._insert([row])
+                if error is None:
+                    saved.append(row)
+                else:
+                    result.failed.append({"row": row, "error": error})
+
+        result.saved = len(saved)
+        if saved:
+            db.session.commit()
+            price_stream.publish_quotes(saved)
+        if result.failed:
+            logger.warning(f"Skipped {len(result.failed)} quote rows: {result.failed[0]['error']}")
+        logger.info(f"Saved {result.saved} quotes in chunks of {self.chunk_size}")
+        return result
+
+    @staticmethod
+    def _validate(row: Dict) -> Optional[str]:
+        price = row["price"]
+        if not isinstance(price, (int, float)) or isinstance(price, bool) or not math.isfinite(price) or price <= 0:
+            return f"invalid price {price!r}"
+        if not row["source"]:
+            return "missing source"
+        if len(row["currency"]) > 3:
+            return f"invalid currency {row['currency']!r}"
+        return None
+
+    @staticmethod
+    def _insert(rows: List[dict]) -> Optional[str]:
+        """Insert rows (upserting latest_quotes, queueing risk snapshots) inside a savepoint; return the error message on failure"""
+        savepoint = db.session.begin_nested()
+        try:
+            db.session.execute(insert(QuoteHistory), rows)
+            LatestQuote.upsert(db.session.connection(), rows)
+            RiskDirtyFamily.mark_assets(db.session.connection(), {row["asset_id"] for row in rows})
+            savepoint.commit()
+            return None
+        except SQLAlchemyError as e:
+            savepoint.rollback()
+            return str(getattr(e, "orig", None) or e)
+
@@ -1,6 +1,6 @@
 """Report service for generating PDF reports using WeasyPrint"""
 import logging
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 from typing import Dict, List, Optional
 from weasyprint import HTML, CSS
 from jinja2 import Template
@@ -9,6 +9,7 @@ from app.models.family import Family
 from app.models.asset import Asset
 from app.models.transaction import Transaction
 from app.services.quote_service import QuoteService
+from app.services.tax_lot_service import TaxLotService
 
 logger = logging.getLogger(__name__)
 
@@ -192,8 +193,13 @@ class ReportService:
             # Calculate overall risk score
             risk_scores['overall'] = sum(risk_scores.values()) / len(risk_scores)
             
+            # Latest persisted risk analysis (no recomputation per report)
+            from app.services.risk_snapshot_service import RiskSnapshotService
+            snapshot = RiskSnapshotService.latest(family.id)
+            
             return {
                 'risk_scores': risk_scores,
+                'snapshot': snapshot.to_point() if snapshot is not None else None,
                 'alerts': alerts,
                 'recommendations': self._generate_risk_recommendations(risk_scores)
             }
@@ -241,13 +247,12 @@ class ReportService:
     def _get_fiscal_data(self, family: Family, year: int) -> Dict:
         """Gather fiscal data for tax reporting"""
         try:
-            start_date = datetime(year, 1, 1)
-            end_date = datetime(year, 12, 31)
+            start_date = date(year, 1, 1)
+            end_date = date(year, 12, 31)
             
-            # Get all transactions for the year
+            # Lots opened in earlier years are needed to price the sells of this year
             transactions = Transaction.query.join(Asset).filter(
                 Asset.family_id == family.id,
-                Transaction.transaction_date >= start_date,
                 Transaction.transaction_date <= end_date
             ).all()
             
@@ -261,13 +266,27 @@ class ReportService:
                 'interest': 0
             }
             
+            transactions_by_asset = {}
             for transaction in transactions:
+                transactions_by_asset.setdefault(transaction.asset_id, []).append(transaction)
+                if transaction.transaction_date < start_date:
+                    continue
                 if transaction.transaction_type == 'buy':
                     fiscal_summary['total_buys'] += transaction.total_value
                 elif transaction.transaction_type == 'sell':
                     fiscal_summary['total_sells'] += transaction.total_value
-                    # Calculate realized gain/loss (simplified)
-                    # In production, implement proper FIFO/LIFO calculation
+            
+            # Realized gain/loss per sell from the FIFO lot engine
+            for asset_transactions in transactions_by_asset.values():
+                report = TaxLotService.process(asset_transactions)
+                for sale in report.realized_between(start_date, end_date):
+                    if sale.gain_loss >= 0:
+                        fiscal_summary['realized_gains'] += sale.gain_loss
+                    else:
+                        fiscal_summary['realized_losses'] += sale.gain_loss
+            
+            fiscal_summary['realized_gains'] = round(fiscal_summary['realized_gains'], 2)
+            fiscal_summary['realized_losses'] = round(fiscal_summary['realized_losses'], 2)
             
             return fiscal_summary
             
@@ -545,7 +564,18 @@ class ReportService:
                     <div>Risco de Volatilidade</div>
                 </div>
             </div>
-            
+
+            {% if risk.snapshot %}
+            <div class="section">
+                <h3>Risco de Mercado</h3>
+                <p>Score ponderado: {{ "%.1f"|format(risk.snapshot.weighted_risk_score) }} ({{ risk.snapshot.risk_classification }})</p>
+                {% if risk.snapshot.var_1d is not none %}
+                <p>VaR 1 dia: R$ {{ "%.2f"|format(risk.snapshot.var_1d) }}</p>
+                {% endif %}
+                <p>Calculado em: {{ risk.snapshot.computed_at }}</p>
+            </div>
+            {% endif %}
+
             <div class="section">
                 <h3>Alertas Ativos</h3>
                 {% if risk.alerts %}
@@ -0,0 +1,145 @@
+"""Vectorized return, volatility and covariance math over aligned price history"""
+from dataclasses import dataclass, field
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Trading days per year used to annualize daily statistics
+PERIODS_PER_YEAR = 252
+# Returns an asset needs before its statistics are trusted
+MIN_OBSERVATIONS = 2
+
+# Annualized volatility (%) assumed per asset type when history is too short
+DEFAULT_VOLATILITY = {
+    "renda_fixa": 2.0,
+    "moeda_estrangeira": 12.0,
+    "fundo_imobiliario": 15.0,
+    "renda_variavel": 25.0,
+    "criptomoeda": 60.0
+}
+FALLBACK_VOLATILITY = 20.0
+
+
+def default_volatility(asset_type: Optional[str]) -> float:
+    """Deterministic volatility (%) for an asset without enough history"""
+    return DEFAULT_VOLATILITY.get(asset_type, FALLBACK_VOLATILITY)
+
+
+@dataclass
+class ReturnMatrix:
+    """Daily log returns laid out as a date × instrument matrix.
+
+    Column ``j`` belongs to ``asset_ids[j]``. Each asset's return is taken
+    between its own consecutive observations and stored on the later date,
+    so calendars with gaps (weekends for stocks, holidays) never produce
+    artificial zero returns. Missing cells are NaN; every statistic uses
+    pairwise-complete observations and is NaN below ``MIN_OBSERVATIONS``.
+    """
+    dates: np.ndarray
+    asset_ids: np.ndarray
+    returns: np.ndarray
+    mask: np.ndarray = field(init=False)
+
+    def __post_init__(self):
+        self.mask = ~np.isnan(self.returns)
+
+    @classmethod
+    def from_closes(cls, closes: Dict[int, Sequence[Tuple[date, float]]]) -> "ReturnMatrix":
+        """Build from ``{asset_id: [(date, close), ...]}`` (any order, non-positive prices ignored)"""
+        asset_ids = np.array(sorted(closes), dtype=np.int64)
+        all_dates = sorted({day for series in closes.values() for day, price in series if price and price > 0})
+        dates = np.array(all_dates, dtype="datetime64[D]")
+        if len(dates) < 2:
+            return cls(dates[1:], asset_ids, np.full((0, len(asset_ids)), np.nan))
+
+        prices = np.full((len(dates), len(asset_ids)), np.nan)
+        for column, asset_id in enumerate(asset_ids.tolist()):
+            series = [(day, price) for day, price in closes[asset_id] if price and price > 0]
+            if series:
+                days, values = zip(*series)
+                rows = np.searchsorted(dates, np.array(days, dtype="datetime64[D]"))
+                prices[rows, column] = values
+
+        returns = np.full_like(prices, np.nan)
+        for column in range(prices.shape[1]):
+            observed = np.flatnonzero(~np.isnan(prices[:, column]))
+            if len(observed) > 1:
+                returns[observed[1:], column] = np.diff(np.log(prices[observed, column]))
+        return cls(dates[1:], asset_ids, returns[1:])
+
+    @classmethod
+    def load(cls, asset_ids: Iterable[int], days: int, today: Optional[date] = None) -> "ReturnMatrix":
+        """Daily closes of the assets over the last ``days`` days (exported months, bars, raw tail)"""
+        from app.services.quote_rollup_service import QuoteRollupService
+        return cls.from_closes(QuoteRollupService.daily_closes_many(asset_ids, days, today))
+
+    @property
+    def observations(self) -> np.ndarray:
+        """Number of returns per asset"""
+        return self.mask.sum(axis=0)
+
+    def covariance(self, annualize: bool = True) -> np.ndarray:
+        """Pairwise-complete sample covariance matrix (NaN where a pair has too few overlaps)"""
+        x = np.where(self.mask, self.returns, 0.0)
+        m = self.mask.astype(np.float64)
+        n = m.T @ m
+        sum_xy = x.T @ x
+        # sum of x_i over the dates where j is also observed, and vice versa
+        sum_x = x.T @ m
+        with np.errstate(invalid="ignore", divide="ignore"):
+            cov = (sum_xy - sum_x * sum_x.T / n) / (n - 1)
+        cov[n < MIN_OBSERVATIONS] = np.nan
+        return cov * PERIODS_PER_YEAR if annualize else cov
+
+    def volatility(self) -> np.ndarray:
+        """Annualized volatility per asset, in percent"""
+        variance = np.diagonal(self.covariance()).copy()
+        return np.sqrt(np.clip(variance, 0.0, None)) * 100
+
+    def correlation(self) -> np.ndarray:
+        """Correlation matrix, from each pair's overlapping returns"""
+        x = np.where(self.mask, self.returns, 0.0)
+        m = self.mask.astype(np.float64)
+        n = m.T @ m
+        sum_x = x.T @ m
+        sum_x2 = (x * x).T @ m
+        with np.errstate(invalid="ignore", divide="ignore"):
+            var_i = sum_x2 - sum_x ** 2 / n
+            cov = x.T @ x - sum_x * sum_x.T / n
+            corr = cov / np.sqrt(var_i * var_i.T)
+        corr[~np.isfinite(corr) | (n < MIN_OBSERVATIONS)] = np.nan
+        np.fill_diagonal(corr, np.where(self.observations >= MIN_OBSERVATIONS, 1.0, np.nan))
+        return np.clip(corr, -1.0, 1.0)
+
+
+def volatility_of(closes: Sequence[Tuple[date, float]]) -> Optional[float]:
+    """Annualized volatility (%) of a single price series, None without enough history"""
+    value = ReturnMatrix.from_closes({0: closes}).volatility()
+    return float(value[0]) if len(value) and not np.isnan(value[0]) else None
+
+
+def portfolio_volatility(covariance: np.ndarray, weights: np.ndarray) -> Optional[float]:
+    """Annualized portfolio volatility (%) over the assets with a known covariance.
+
+    Assets whose variance is unknown are left out and the remaining weights
+    renormalized; missing cross terms count as uncorrelated.
+    """
+    known = ~np.isnan(np.diagonal(covariance))
+    if not known.any():
+        return None
+    w = np.asarray(weights, dtype=np.float64)[known]
+    if w.sum() <= 0:
+        return None
+    w = w / w.sum()
+    sigma = np.nan_to_num(covariance[np.ix_(known, known)])
+    return float(np.sqrt(max(w @ sigma @ w, 0.0)) * 100)
+
+
+def matrix_dict(asset_ids: Iterable[int], matrix: np.ndarray, digits: int = 4) -> Dict[str, object]:
+    """JSON-friendly matrix (NaN as None)"""
+    rows: List[List[Optional[float]]] = [
+        [None if np.isnan(value) else round(float(value), digits) for value in row]
+        for row in matrix
+    ]
+    return {'asset_ids': [int(asset_id) for asset_id in asset_ids], 'matrix': rows}
@@ -0,0 +1,134 @@
+"""Persisted risk snapshots, recomputed only for families marked dirty"""
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from app.config.config import Config
+from app.config.extensions import db
+from app.models.risk_snapshot import RiskDirtyFamily, RiskSnapshot
+
+logger = logging.getLogger(__name__)
+
+
+class RiskSnapshotService:
+    """Store the portfolio risk analysis of each family and serve it back.
+
+    Writes to assets, transactions and quotes queue their families in
+    ``risk_dirty_families``; ``refresh_dirty`` (the ``refresh_risk_snapshots``
+    job) recomputes just those families and appends a snapshot for each.
+    Read endpoints serve the newest snapshot with its ``computed_at``, and
+    the snapshot columns form the risk time series.
+    """
+
+    def __init__(self, market_data_service=None):
+        if market_data_service is None:
+            from app.services.market_data_service import MarketDataService
+            market_data_service = MarketDataService()
+        self.market_data_service = market_data_service
+
+    @staticmethod
+    def latest(family_id: int) -> Optional[RiskSnapshot]:
+        return RiskSnapshot.query.filter_by(family_id=family_id).order_by(
+            RiskSnapshot.computed_at.desc(), RiskSnapshot.id.desc()
+        ).first()
+
+    @staticmethod
+    def is_dirty(family_id: int) -> bool:
+        return db.session.get(RiskDirtyFamily, family_id) is not None
+
+    @staticmethod
+    def history(family_id: int, days: int) -> List[Dict]:
+        """Headline figures of every snapshot in the last ``days`` days, oldest first"""
+        since = datetime.now() - timedelta(days=days)
+        rows = db.session.query(
+            RiskSnapshot.computed_at, RiskSnapshot.total_value, RiskSnapshot.weighted_risk_score,
+            RiskSnapshot.risk_classification, RiskSnapshot.portfolio_volatility,
+            RiskSnapshot.var_1d, RiskSnapshot.cvar_1d
+        ).filter(
+            RiskSnapshot.family_id == family_id,
+            RiskSnapshot.computed_at >= since
+        ).order_by(RiskSnapshot.computed_at, RiskSnapshot.id).all()
+        return [RiskSnapshot.to_point(row) for row in rows]
+
+    def get_or_compute(self, family_id: int) -> Optional[RiskSnapshot]:
+        """Newest snapshot, computing the first one on demand"""
+        return self.latest(family_id) or self.compute(family_id)
+
+    def compute(self, family_id: int) -> Optional[RiskSnapshot]:
+        """Recompute and store a family's snapshot, clearing its dirty mark.
+
+        Returns None when the family has nothing to analyse.
+        """
+        dirty = db.session.get(RiskDirtyFamily, family_id)
+        marked_at = dirty.marked_at if dirty is not None else None
+
+        analysis = self.market_data_service.get_portfolio_risk_analysis(family_id)
+        snapshot = None
+        if analysis:
+            snapshot = self._snapshot(family_id, analysis)
+            # Only the newest snapshot keeps the full payload
+            RiskSnapshot.query.filter(
+                RiskSnapshot.family_id == family_id,
+                RiskSnapshot.analysis.isnot(None)
+            ).update({RiskSnapshot.analysis: None}, synchronize_session=False)
+            db.session.add(snapshot)
+
+        if marked_at is not None:
+            # A change that arrived while computing keeps the family queued
+            RiskDirtyFamily.query.filter(
+                RiskDirtyFamily.family_id == family_id,
+                RiskDirtyFamily.marked_at <= marked_at
+            ).delete(synchronize_session=False)
+        db.session.commit()
+        return snapshot
+
+    def refresh_dirty(self, limit: Optional[int] = None) -> Dict[str, int]:
+        """Recompute every family queued as dirty (oldest mark first)"""
+        limit = limit or Config.RISK_SNAPSHOT_BATCH_SIZE
+        family_ids = [
+            family_id for (family_id,) in db.session.query(RiskDirtyFamily.family_id).order_by(
+                RiskDirtyFamily.marked_at
+            ).limit(limit).all()
+        ]
+
+        refreshed = errors = 0
+        for family_id in family_ids:
+            try:
+                self.compute(family_id)
+                refreshed += 1
+            except Exception as e:
+                logger.error(f"Error refreshing risk snapshot of family {family_id}: {e}")
+                db.session.rollback()
+                errors += 1
+
+        return {'families': refreshed, 'errors': errors, 'pending': RiskDirtyFamily.query.count()}
+
+    @staticmethod
+    def apply_retention(today: Optional[datetime] = None) -> int:
+        """Delete snapshots older than ``RISK_SNAPSHOT_RETENTION_DAYS`` (0 keeps them forever)"""
+        if not Config.RISK_SNAPSHOT_RETENTION_DAYS:
+            return 0
+        cutoff = (today or datetime.now()) - timedelta(days=Config.RISK_SNAPSHOT_RETENTION_DAYS)
+        # The newest snapshot of a family is kept however old it is
+        newest = db.session.query(db.func.max(RiskSnapshot.id)).group_by(RiskSnapshot.family_id)
+        removed = RiskSnapshot.query.filter(
+            RiskSnapshot.computed_at < cutoff,
+            RiskSnapshot.id.notin_(newest)
+        ).delete(synchronize_session=False)
+        db.session.commit()
+        return removed
+
+    @staticmethod
+    def _snapshot(family_id: int, analysis: Dict) -> RiskSnapshot:
+        one_day = ((analysis.get('value_at_risk') or {}).get('monte_carlo') or {}).get('1d') or {}
+        return RiskSnapshot(
+            family_id=family_id,
+            computed_at=datetime.now(),
+            total_value=analysis['total_portfolio_value'],
+            weighted_risk_score=analysis['weighted_risk_score'],
+            risk_classification=analysis['risk_classification'],
+            portfolio_volatility=analysis.get('portfolio_volatility'),
+            var_1d=one_day.get('var'),
+            cvar_1d=one_day.get('cvar'),
+            analysis=analysis
+        )
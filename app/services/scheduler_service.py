@@ -5,6 +5,7 @@ from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.cron import CronTrigger
 from apscheduler.triggers.interval import IntervalTrigger
 from app.services.quote_service import QuoteService
+from app.config.config import Config
 from app.config.extensions import db
 
 logger = logging.getLogger(__name__)
@@ -38,6 +39,24 @@ class SchedulerService:
                 replace_existing=True
             )
             
+            # Consolidação das cotações em barras diárias OHLC - diária às 0h30
+            self.scheduler.add_job(
+                func=self._rollup_quotes,
+                trigger=CronTrigger(hour=0, minute=30),
+                id='rollup_quotes_daily',
+                name='Roll up quote history into daily bars',
+                replace_existing=True
+            )
+            
+            # Exportação do histórico de preços para arquivos colunares - diária à 1h
+            self.scheduler.add_job(
+                func=self._export_price_history,
+                trigger=CronTrigger(hour=1, minute=0),
+                id='export_price_history_daily',
+                name='Export daily bars to columnar files',
+                replace_existing=True
+            )
+            
             # Limpeza de dados antigos - semanal aos domingos às 2h
             self.scheduler.add_job(
                 func=self._cleanup_old_data,
@@ -47,6 +66,26 @@ class SchedulerService:
                 replace_existing=True
             )
             
+            # Reavaliação de todas as carteiras - diária às 22h
+            self.scheduler.add_job(
+                func=self._revalue_portfolios,
+                trigger=CronTrigger(hour=22, minute=0),
+                id='revalue_portfolios_daily',
+                name='Revalue all family portfolios daily',
+                replace_existing=True
+            )
+            
+            # Snapshots de risco das famílias alteradas - a cada minuto
+            self.scheduler.add_job(
+                func=self._refresh_risk_snapshots,
+                trigger=IntervalTrigger(seconds=Config.RISK_SNAPSHOT_INTERVAL_SECONDS),
+                id='refresh_risk_snapshots',
+                name='Recompute risk snapshots of changed families',
+                max_instances=1,
+                coalesce=True,
+                replace_existing=True
+            )
+            
             # Backup de dados - diário às 23h
             self.scheduler.add_job(
                 func=self._backup_data,
@@ -157,11 +196,11 @@ class SchedulerService:
             from datetime import timedelta
             cutoff_date = datetime.now() - timedelta(days=90)
             
-            # Limpar histórico de cotações antigo
-            from app.models.quote_history import QuoteHistory
-            old_quotes = QuoteHistory.query.filter(
-                QuoteHistory.timestamp < cutoff_date
-            ).delete()
+            # Histórico de cotações: consolidar em barras diárias e aplicar a
+            # retenção de cada nível (cotações brutas e barras)
+            from app.services.quote_rollup_service import QuoteRollupService
+            retention = QuoteRollupService.apply_retention()
+            old_quotes = retention['raw_quotes_removed']
             
             # Limpar alertas resolvidos antigos
             from app.models.alert import Alert
@@ -170,18 +209,91 @@ class SchedulerService:
                 Alert.resolved_at < cutoff_date
             ).delete()
             
+            # Série histórica de snapshots de risco
+            from app.services.risk_snapshot_service import RiskSnapshotService
+            old_snapshots = RiskSnapshotService.apply_retention()
+            
             logger.info(f"Data cleanup completed: {old_quotes} old quotes, {old_alerts} old alerts removed")
             
             # Salvar log da execução
             self._log_job_execution('cleanup_weekly', {
                 'old_quotes_removed': old_quotes,
-                'old_alerts_removed': old_alerts
+                'old_daily_bars_removed': retention['daily_bars_removed'],
+                'old_alerts_removed': old_alerts,
+                'old_risk_snapshots_removed': old_snapshots
             })
             
         except Exception as e:
             logger.error(f"Error in scheduled data cleanup: {e}")
             self._log_job_execution('cleanup_weekly', {'error': str(e)})
     
+    def _rollup_quotes(self):
+        """Compact finished days of quote history into daily OHLC bars"""
+        try:
+            logger.info("Starting scheduled quote rollup")
+            
+            from app.services.quote_rollup_service import QuoteRollupService
+            result = QuoteRollupService.rollup()
+            
+            logger.info(f"Quote rollup completed: {result['bars']} bars from {result['raw_quotes']} quotes")
+            
+            # Salvar log da execução
+            self._log_job_execution('rollup_quotes_daily', result)
+            
+        except Exception as e:
+            logger.error(f"Error in scheduled quote rollup: {e}")
+            db.session.rollback()
+            self._log_job_execution('rollup_quotes_daily', {'error': str(e)})
+    
+    def _export_price_history(self):
+        """Export recent daily bars to the columnar price history files"""
+        try:
+            logger.info("Starting scheduled price history export")
+            
+            from app.services.price_history_store import PriceHistoryStore
+            result = PriceHistoryStore().export()
+            
+            logger.info(f"Price history export completed: {result['bars']} bars, {result['partitions']} partitions")
+            
+            # Salvar log da execução
+            self._log_job_execution('export_price_history_daily', result)
+            
+        except Exception as e:
+            logger.error(f"Error in scheduled price history export: {e}")
+            self._log_job_execution('export_price_history_daily', {'error': str(e)})
+    
+    def _revalue_portfolios(self):
+        """Revalue every family portfolio in one vectorized pass"""
+        try:
+            logger.info("Starting scheduled portfolio revaluation")
+            
+            from app.services.valuation_service import ValuationService
+            result = ValuationService.revalue_all_families()
+            
+            logger.info(f"Portfolio revaluation completed: {result['families']} families, {result['assets']} assets")
+            
+            # Salvar log da execução
+            self._log_job_execution('revalue_portfolios_daily', result)
+            
+        except Exception as e:
+            logger.error(f"Error in scheduled portfolio revaluation: {e}")
+            self._log_job_execution('revalue_portfolios_daily', {'error': str(e)})
+    
+    def _refresh_risk_snapshots(self):
+        """Recompute the risk snapshot of every family marked dirty"""
+        try:
+            from app.services.risk_snapshot_service import RiskSnapshotService
+            result = RiskSnapshotService().refresh_dirty()
+            
+            # Sem famílias alteradas não há o que registrar
+            if result['families'] or result['errors']:
+                logger.info(f"Risk snapshots refreshed: {result['families']} families, {result['errors']} errors")
+                self._log_job_execution('refresh_risk_snapshots', result)
+            
+        except Exception as e:
+            logger.error(f"Error in scheduled risk snapshot refresh: {e}")
+            self._log_job_execution('refresh_risk_snapshots', {'error': str(e)})
+    
     def _backup_data(self):
         """Create daily data backup"""
         try:
@@ -0,0 +1,220 @@
+"""Scenario stress tests applied to the vectorized holdings of many families at once"""
+import logging
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from app.config.config import Config
+from app.config.extensions import db
+from app.services.valuation_service import BASE_CURRENCY, PortfolioValuation, ValuationService
+
+logger = logging.getLogger(__name__)
+
+DAYS_PER_YEAR = 365.25
+
+
+@dataclass
+class StressScenario:
+    """Shock vector of one what-if scenario.
+
+    Moves are in percent. ``asset_type`` and ``instrument`` (ticker, coin id
+    or currency code) shock prices, the instrument shock taking precedence;
+    ``currency`` shocks the BRL price of a currency (``BRL`` itself moves
+    the real against every foreign currency); ``rate_bp`` shifts interest
+    rates in basis points, priced through the duration of fixed income.
+    """
+    name: str
+    asset_type: Dict[str, float] = field(default_factory=dict)
+    instrument: Dict[str, float] = field(default_factory=dict)
+    currency: Dict[str, float] = field(default_factory=dict)
+    rate_bp: float = 0.0
+
+    @classmethod
+    def from_dict(cls, data: Dict, index: int = 0) -> "StressScenario":
+        if not isinstance(data, dict):
+            raise ValueError("Cada cenário deve ser um objeto")
+
+        def moves(key: str, upper: bool) -> Dict[str, float]:
+            values = data.get(key) or {}
+            if not isinstance(values, dict):
+                raise ValueError(f"'{key}' deve mapear nomes para choques em %")
+            parsed = {}
+            for name, move in values.items():
+                if isinstance(move, bool) or not isinstance(move, (int, float)) or move <= -100:
+                    raise ValueError(f"Choque inválido em '{key}.{name}': {move!r}")
+                parsed[name.strip().upper() if upper else name.strip()] = float(move)
+            return parsed
+
+        rate_bp = data.get("rate_bp", 0)
+        if isinstance(rate_bp, bool) or not isinstance(rate_bp, (int, float)):
+            raise ValueError(f"rate_bp inválido: {rate_bp!r}")
+        return cls(
+            name=str(data.get("name") or f"cenario_{index + 1}"),
+            asset_type=moves("asset_type", upper=False),
+            instrument=moves("instrument", upper=True),
+            currency=moves("currency", upper=True),
+            rate_bp=float(rate_bp)
+        )
+
+
+@dataclass
+class _Exposures:
+    """Per-asset labels the shocks are matched against (aligned with the valuation)"""
+    instruments: np.ndarray
+    currencies: np.ndarray
+    duration: np.ndarray
+
+    @classmethod
+    def of(cls, valuation: PortfolioValuation, today: Optional[date] = None) -> "_Exposures":
+        today = today or date.today()
+        details = valuation.details or [{}] * len(valuation)
+        currencies = valuation.currencies or [BASE_CURRENCY] * len(valuation)
+        instruments = [
+            _instrument_key(asset_type, asset_details)
+            for asset_type, asset_details in zip(valuation.asset_types, details)
+        ]
+        duration = np.array([
+            _duration(asset_type, asset_details, today)
+            for asset_type, asset_details in zip(valuation.asset_types, details)
+        ], dtype=np.float64)
+        return cls(
+            instruments=np.array(instruments, dtype=object),
+            currencies=np.array(currencies, dtype=object),
+            duration=duration
+        )
+
+
+def _instrument_key(asset_type: str, details: Dict) -> Optional[str]:
+    """Identifier an instrument shock can name: ticker, coin id or currency code"""
+    key = details.get("ticker") or details.get("coin_id") or (
+        details.get("currency") if asset_type == "moeda_estrangeira" else None
+    )
+    if not key:
+        return None
+    key = str(key).strip().upper()
+    return key[:-3] if key.endswith(".SA") else key
+
+
+def _duration(asset_type: str, details: Dict, today: date) -> float:
+    """Rate sensitivity in years: time to maturity for fixed-rate and inflation-linked bonds.
+
+    Floating-rate bonds (CDI, SELIC) reprice with the rate and are left at zero.
+    """
+    if asset_type != "renda_fixa":
+        return 0.0
+    if (details.get("indexador") or "").upper() in Config.STRESS_FLOATING_INDICES:
+        return 0.0
+    maturity = details.get("vencimento")
+    try:
+        if isinstance(maturity, str):
+            maturity = datetime.strptime(maturity[:10], "%Y-%m-%d").date()
+    except ValueError:
+        return 0.0
+    if not isinstance(maturity, date):
+        return 0.0
+    return max((maturity - today).days, 0) / DAYS_PER_YEAR
+
+
+class StressTestService:
+    """Revalue every loaded family under a batch of shock scenarios.
+
+    Holdings are loaded once through ``ValuationService`` (a fixed number of
+    queries for any number of families). Each scenario becomes one vector of
+    per-asset returns; its P&L per family is a single weighted ``bincount``
+    over the market values. A family breaches when its loss exceeds its
+    limit: the request's ``max_loss_pct``, else the limit of its suitability
+    profile's risk tolerance, else ``STRESS_DEFAULT_LOSS_LIMIT``.
+    """
+
+    @staticmethod
+    def run(scenarios: Iterable[StressScenario], family_ids: Optional[Iterable[int]] = None,
+            max_loss_pct: Optional[float] = None, only_breaches: bool = False) -> Dict[str, object]:
+        scenarios = list(scenarios)
+        valuation = ValuationService.load(family_ids)
+        exposures = _Exposures.of(valuation)
+
+        family_keys = valuation.family_keys
+        totals = valuation.family_totals_array()
+        limits = StressTestService.loss_limits(family_keys.tolist(), max_loss_pct)
+
+        results = []
+        for scenario in scenarios:
+            returns = StressTestService.returns(scenario, valuation, exposures)
+            pnl = np.bincount(
+                valuation.family_index, weights=returns * valuation.market_value, minlength=len(family_keys)
+            )
+            pnl_pct = np.divide(pnl * 100, totals, out=np.zeros_like(pnl), where=totals > 0)
+            breached = -pnl_pct > limits
+
+            families = [
+                {
+                    'family_id': int(family_id),
+                    'value': round(float(totals[j]), 2),
+                    'pnl': round(float(pnl[j]), 2),
+                    'pnl_pct': round(float(pnl_pct[j]), 2),
+                    'loss_limit_pct': float(limits[j]),
+                    'breach': bool(breached[j])
+                }
+                for j, family_id in enumerate(family_keys)
+                if breached[j] or not only_breaches
+            ]
+            results.append({
+                'name': scenario.name,
+                'total_pnl': round(float(pnl.sum()), 2),
+                'breaches': [int(family_id) for family_id in family_keys[breached]],
+                'families': families
+            })
+
+        logger.info(f"Stress tested {len(family_keys)} families ({len(valuation)} assets) under {len(scenarios)} scenarios")
+        return {
+            'families': len(family_keys),
+            'assets': len(valuation),
+            'total_value': valuation.total_value(),
+            'scenarios': results
+        }
+
+    @staticmethod
+    def returns(scenario: StressScenario, valuation: PortfolioValuation, exposures: _Exposures) -> np.ndarray:
+        """Shocked return of every asset (fraction of its market value)"""
+        price = np.zeros(len(valuation), dtype=np.float64)
+        for asset_type, move in scenario.asset_type.items():
+            if asset_type in valuation.type_labels:
+                price[valuation.type_codes == valuation.type_labels.index(asset_type)] = move / 100
+        for instrument, move in scenario.instrument.items():
+            price[exposures.instruments == instrument] = move / 100
+        # Parallel rate shift: price change ≈ -duration × Δy
+        price -= exposures.duration * scenario.rate_bp / 10_000
+
+        foreign = exposures.currencies != BASE_CURRENCY
+        fx = np.ones(len(valuation), dtype=np.float64)
+        for currency, move in scenario.currency.items():
+            if currency != BASE_CURRENCY:
+                fx[exposures.currencies == currency] *= 1 + move / 100
+        if BASE_CURRENCY in scenario.currency:
+            # A weaker real raises the BRL value of every foreign exposure
+            fx[foreign] /= 1 + scenario.currency[BASE_CURRENCY] / 100
+
+        return (1 + price) * fx - 1
+
+    @staticmethod
+    def loss_limits(family_ids: List[int], max_loss_pct: Optional[float] = None) -> np.ndarray:
+        """Maximum loss (% of value) each family tolerates, aligned with ``family_ids``"""
+        if max_loss_pct is not None:
+            return np.full(len(family_ids), float(max_loss_pct))
+
+        from app.models.suitability import SuitabilityProfile
+
+        tolerance: Dict[int, str] = {}
+        if family_ids:
+            rows = db.session.query(SuitabilityProfile.family_id, SuitabilityProfile.risk_tolerance).filter(
+                SuitabilityProfile.family_id.in_(family_ids),
+                SuitabilityProfile.is_active.is_(True)
+            ).order_by(SuitabilityProfile.updated_at).all()
+            # Most recently updated active profile wins
+            tolerance = {family_id: risk_tolerance for family_id, risk_tolerance in rows}
+        return np.array([
+            Config.STRESS_LOSS_LIMITS.get(tolerance.get(family_id), Config.STRESS_DEFAULT_LOSS_LIMIT)
+            for family_id in family_ids
+        ], dtype=np.float64)
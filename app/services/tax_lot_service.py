@@ -0,0 +1,171 @@
+"""Tax lot engine - single-pass FIFO processing of the transaction ledger"""
+from bisect import bisect_right
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import date
+from typing import Iterable, List, Optional
+
+# Quantities below this are treated as fully consumed (float noise)
+QUANTITY_EPSILON = 1e-9
+
+
+@dataclass
+class TaxLot:
+    """Open lot created by a buy transaction"""
+    transaction_id: Optional[int]
+    acquired_on: date
+    quantity: float
+    unit_price: float
+
+    @property
+    def cost_basis(self) -> float:
+        return self.quantity * self.unit_price
+
+
+@dataclass
+class RealizedSale:
+    """Realized result of a sell transaction matched against open lots"""
+    transaction_id: Optional[int]
+    sold_on: date
+    quantity: float
+    proceeds: float
+    cost_basis: float
+    unmatched_quantity: float = 0.0  # Quantity sold without any open lot
+
+    @property
+    def gain_loss(self) -> float:
+        return self.proceeds - self.cost_basis
+
+
+@dataclass
+class PositionSnapshot:
+    """End-of-day position after the last transaction of ``as_of``"""
+    as_of: date
+    quantity: float
+    cost_basis: float
+    total_invested: float
+    total_divested: float
+    realized_gain_loss: float
+
+    @property
+    def average_cost(self) -> float:
+        if self.quantity <= 0:
+            return 0.0
+        return self.cost_basis / self.quantity
+
+
+@dataclass
+class LotReport:
+    """Result of walking an asset's ledger once in chronological order"""
+    quantity: float = 0.0
+    cost_basis: float = 0.0
+    total_invested: float = 0.0
+    total_divested: float = 0.0
+    last_transaction_date: Optional[date] = None
+    open_lots: List[TaxLot] = field(default_factory=list)
+    realized_sales: List[RealizedSale] = field(default_factory=list)
+    snapshots: List[PositionSnapshot] = field(default_factory=list)
+
+    @property
+    def average_cost(self) -> float:
+        if self.quantity <= 0:
+            return 0.0
+        return self.cost_basis / self.quantity
+
+    @property
+    def realized_gain_loss(self) -> float:
+        return sum(sale.gain_loss for sale in self.realized_sales)
+
+    def unrealized_gain_loss(self, market_price: Optional[float]) -> float:
+        """Unrealized result of the open lots at the given market price"""
+        if market_price is None or self.quantity <= 0:
+            return 0.0
+        return self.quantity * market_price - self.cost_basis
+
+    def realized_between(self, start: date, end: date) -> List[RealizedSale]:
+        """Realized sales whose date falls in [start, end]"""
+        return [sale for sale in self.realized_sales if start <= sale.sold_on <= end]
+
+    def snapshot_on(self, as_of: date) -> Optional[PositionSnapshot]:
+        """Position at the end of ``as_of`` (binary search over the snapshots)"""
+        index = bisect_right([snapshot.as_of for snapshot in self.snapshots], as_of)
+        return self.snapshots[index - 1] if index else None
+
+
+class TaxLotService:
+    """FIFO tax lot engine shared by positions, schemas, summaries and reports"""
+
+    @staticmethod
+    def process(transactions: Iterable) -> LotReport:
+        """Walk the ledger once keeping a FIFO queue of open lots.
+
+        Each sell consumes the oldest open lots, so lots already used by
+        earlier sells are never matched twice. Runs in O(n log n) for the
+        initial sort plus O(n) for the walk.
+        """
+        ordered = sorted(transactions, key=lambda t: (t.transaction_date, t.id or 0))
+
+        report = LotReport()
+        lots = deque()
+        realized_gain_loss = 0.0
+
+        for index, transaction in enumerate(ordered):
+            if transaction.transaction_type == "buy":
+                lots.append(TaxLot(
+                    transaction_id=transaction.id,
+                    acquired_on=transaction.transaction_date,
+                    quantity=transaction.quantity,
+                    unit_price=transaction.unit_price
+                ))
+                report.quantity += transaction.quantity
+                report.cost_basis += transaction.quantity * transaction.unit_price
+                report.total_invested += transaction.total_value
+
+            elif transaction.transaction_type == "sell":
+                report.quantity -= transaction.quantity
+                report.total_divested += transaction.total_value
+
+                quantity_needed = transaction.quantity
+                sale_cost = 0.0
+                while quantity_needed > QUANTITY_EPSILON and lots:
+                    lot = lots[0]
+                    quantity_from_lot = min(quantity_needed, lot.quantity)
+                    sale_cost += quantity_from_lot * lot.unit_price
+                    lot.quantity -= quantity_from_lot
+                    quantity_needed -= quantity_from_lot
+                    if lot.quantity <= QUANTITY_EPSILON:
+                        lots.popleft()
+
+                report.cost_basis -= sale_cost
+                realized_gain_loss += transaction.total_value - sale_cost
+                report.realized_sales.append(RealizedSale(
+                    transaction_id=transaction.id,
+                    sold_on=transaction.transaction_date,
+                    quantity=transaction.quantity,
+                    proceeds=transaction.total_value,
+                    cost_basis=sale_cost,
+                    unmatched_quantity=max(quantity_needed, 0.0)
+                ))
+
+            report.last_transaction_date = transaction.transaction_date
+
+            # One snapshot per day, taken after its last transaction
+            is_last_of_day = (
+                index + 1 == len(ordered)
+                or ordered[index + 1].transaction_date != transaction.transaction_date
+            )
+            if is_last_of_day:
+                report.snapshots.append(PositionSnapshot(
+                    as_of=transaction.transaction_date,
+                    quantity=report.quantity,
+                    cost_basis=report.cost_basis if report.quantity > 0 and lots else 0.0,
+                    total_invested=report.total_invested,
+                    total_divested=report.total_divested,
+                    realized_gain_loss=realized_gain_loss
+                ))
+
+        report.open_lots = list(lots)
+        if report.quantity <= 0 or not lots:
+            report.cost_basis = 0.0
+
+        return report
@@ -0,0 +1,149 @@
+"""Bulk transaction import - in-memory validation and chunked inserts"""
+import csv
+import logging
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Iterator, List
+
+from marshmallow import ValidationError
+from sqlalchemy import insert
+
+from app.config.extensions import db
+from app.services.position_service import PositionService
+from app.services.tax_lot_service import QUANTITY_EPSILON
+
+logger = logging.getLogger(__name__)
+
+# Rows per INSERT statement (executemany) inside the import transaction
+BULK_INSERT_CHUNK_SIZE = 1000
+
+CSV_COLUMNS = ("asset_id", "transaction_type", "quantity", "unit_price", "transaction_date", "description")
+
+
+@dataclass
+class ImportResult:
+    """Outcome of a bulk import; nothing is written when ``errors`` is set"""
+    imported: int = 0
+    errors: List[dict] = field(default_factory=list)
+    cash_deltas: Dict[int, float] = field(default_factory=dict)
+    asset_ids: List[int] = field(default_factory=list)
+
+
+class TransactionImportService:
+    """Service for importing many transactions in a single database transaction.
+
+    Rows are validated in memory (schema, asset access, running quantity per
+    asset and running cash per family, in chronological order), so the
+    database sees one SELECT per table, chunked INSERTs, one cash update per
+    family and one position rebuild per asset. The caller owns the commit.
+    """
+
+    @staticmethod
+    def parse_csv(lines: Iterable[str]) -> Iterator[dict]:
+        """Yield CSV rows as dicts, dropping empty cells so defaults apply"""
+        for row in csv.DictReader(lines):
+            yield {
+                key.strip(): value.strip()
+                for key, value in row.items()
+                if key and key.strip() in CSV_COLUMNS and value is not None and value.strip() != ""
+            }
+
+    @staticmethod
+    def import_rows(rows: Iterable[dict], user) -> ImportResult:
+        """Validate every row and, if all are valid, stage the inserts"""
+        from app.models.asset import Asset
+        from app.models.family import Family
+        from app.schema.transaction_schema import TransactionSchema
+
+        schema = TransactionSchema()
+        result = ImportResult()
+
+        # 1. Schema validation per row
+        loaded = []
+        for number, row in enumerate(rows, start=1):
+            if not isinstance(row, dict):
+                result.errors.append({"row": number, "errors": {"_schema": ["Row must be an object"]}})
+                continue
+            try:
+                loaded.append((number, schema.load(row)))
+            except ValidationError as err:
+                result.errors.append({"row": number, "errors": err.messages})
+
+        if not loaded and not result.errors:
+            result.errors.append({"row": 0, "errors": {"_schema": ["No transactions to import"]}})
+            return result
+
+        # 2. Assets and families in one query each
+        asset_ids = {data["asset_id"] for _, data in loaded}
+        assets = {asset.id: asset for asset in Asset.query.filter(Asset.id.in_(asset_ids)).all()} if asset_ids else {}
+        family_ids = {asset.family_id for asset in assets.values()}
+        families = {family.id: family for family in Family.query.filter(Family.id.in_(family_ids)).all()} if family_ids else {}
+        user_family_ids = {f.id for f in user.families}
+
+        # 3. Running quantity/cash in ledger order
+        quantities = {asset_id: asset.current_quantity for asset_id, asset in assets.items()}
+        cash = {family_id: family.cash_balance for family_id, family in families.items()}
+
+        valid = []
+        for number, data in sorted(loaded, key=lambda item: (item[1]["transaction_date"], item[0])):
+            asset = assets.get(data["asset_id"])
+            if asset is None:
+                result.errors.append({"row": number, "errors": {"asset_id": ["Asset not found"]}})
+                continue
+            if asset.family_id not in user_family_ids:
+                result.errors.append({"row": number, "errors": {"asset_id": ["Access denied to this asset"]}})
+                continue
+
+            total_value = round(data["quantity"] * data["unit_price"], 2)
+            if data["transaction_type"] == "sell":
+                if data["quantity"] > quantities[asset.id] + QUANTITY_EPSILON:
+                    result.errors.append({"row": number, "errors": {"quantity": ["Cannot sell more than current quantity"]}})
+                    continue
+                quantities[asset.id] -= data["quantity"]
+                cash[asset.family_id] += total_value
+            else:
+                if cash[asset.family_id] < total_value:
+                    result.errors.append({"row": number, "errors": {"unit_price": [
+                        f"Saldo insuficiente. Disponível: R$ {cash[asset.family_id]:.2f}, Necessário: R$ {total_value:.2f}"
+                    ]}})
+                    continue
+                quantities[asset.id] += data["quantity"]
+                cash[asset.family_id] -= total_value
+
+            valid.append({
+                "asset_id": asset.id,
+                "transaction_type": data["transaction_type"],
+                "quantity": data["quantity"],
+                "unit_price": data["unit_price"],
+                "total_value": total_value,
+                "transaction_date": data["transaction_date"],
+                "description": data.get("description")
+            })
+
+        if result.errors:
+            result.errors.sort(key=lambda error: error["row"])
+            return result
+
+        # 4. Chunked inserts, one cash update per family, one rebuild per asset
+        TransactionImportService._insert_chunks(valid)
+
+        for family_id, family in families.items():
+            delta = round(cash[family_id] - family.cash_balance, 2)
+            if delta:
+                family.cash_balance = cash[family_id]
+                result.cash_deltas[family_id] = delta
+
+        touched = sorted({row["asset_id"] for row in valid})
+        for asset_id in touched:
+            PositionService.rebuild(assets[asset_id])
+
+        result.imported = len(valid)
+        result.asset_ids = touched
+        logger.info(f"Imported {result.imported} transactions for {len(touched)} assets")
+        return result
+
+    @staticmethod
+    def _insert_chunks(rows: List[dict]) -> None:
+        from app.models.transaction import Transaction
+
+        for start in range(0, len(rows), BULK_INSERT_CHUNK_SIZE):
+            db.session.execute(insert(Transaction), rows[start:start + BULK_INSERT_CHUNK_SIZE])
@@ -0,0 +1,243 @@
+"""Vectorized portfolio valuation over contiguous NumPy arrays"""
+import logging
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+from sqlalchemy import func
+
+from app.config.extensions import db
+
+logger = logging.getLogger(__name__)
+
+BASE_CURRENCY = "BRL"
+
+
+@dataclass
+class PortfolioValuation:
+    """Holdings of one or more families laid out as parallel arrays.
+
+    Row ``i`` of every array describes the same asset. Prices are in the
+    quote currency and ``fx`` converts them to BRL; assets without a usable
+    price (or FX rate) are valued at their open-lot cost basis.
+    ``currencies`` is the currency each asset is exposed to (the quote
+    currency, or the held currency for ``moeda_estrangeira``).
+    """
+    asset_ids: np.ndarray
+    family_ids: np.ndarray
+    names: List[str]
+    asset_types: List[str]
+    quantity: np.ndarray
+    cost_basis: np.ndarray
+    price: np.ndarray
+    fx: np.ndarray
+    currencies: Optional[List[str]] = None
+    details: Optional[List[dict]] = None
+    type_labels: List[str] = field(init=False)
+    type_codes: np.ndarray = field(init=False)
+    family_keys: np.ndarray = field(init=False)
+    family_index: np.ndarray = field(init=False)
+    market_value: np.ndarray = field(init=False)
+    pnl: np.ndarray = field(init=False)
+    weights: np.ndarray = field(init=False)
+
+    def __post_init__(self):
+        self.type_labels, type_codes = np.unique(np.array(self.asset_types, dtype=object), return_inverse=True)
+        self.type_labels = list(self.type_labels)
+        self.type_codes = type_codes.astype(np.int64)
+        self.family_keys, family_index = np.unique(self.family_ids, return_inverse=True)
+        self.family_index = family_index.astype(np.int64)
+
+        local_value = self.quantity * self.price * self.fx
+        self.market_value = np.where(np.isnan(local_value), self.cost_basis, local_value)
+        self.pnl = self.market_value - self.cost_basis
+
+        totals = self.family_totals_array()
+        family_total = totals[self.family_index] if len(totals) else np.zeros(0)
+        self.weights = np.divide(
+            self.market_value, family_total,
+            out=np.zeros_like(self.market_value), where=family_total > 0
+        )
+
+    def __len__(self):
+        return len(self.asset_ids)
+
+    @property
+    def priced(self) -> np.ndarray:
+        """Mask of assets valued from a market price"""
+        return ~np.isnan(self.quantity * self.price * self.fx)
+
+    def family_totals_array(self) -> np.ndarray:
+        """Market value per family, aligned with ``family_keys``"""
+        return np.bincount(self.family_index, weights=self.market_value, minlength=len(self.family_keys))
+
+    def _family_mask(self, family_id: Optional[int]) -> np.ndarray:
+        if family_id is None:
+            return np.ones(len(self), dtype=bool)
+        return self.family_ids == family_id
+
+    def total_value(self, family_id: Optional[int] = None) -> float:
+        """Total market value (of one family, or of everything loaded)"""
+        return round(float(self.market_value[self._family_mask(family_id)].sum()), 2)
+
+    def total_cost(self, family_id: Optional[int] = None) -> float:
+        """Total open-lot cost basis"""
+        return round(float(self.cost_basis[self._family_mask(family_id)].sum()), 2)
+
+    def total_pnl(self, family_id: Optional[int] = None) -> float:
+        """Unrealized P&L at market prices"""
+        return round(float(self.pnl[self._family_mask(family_id)].sum()), 2)
+
+    def allocation(self, family_id: Optional[int] = None) -> Dict[str, float]:
+        """Market value per asset_type"""
+        mask = self._family_mask(family_id)
+        values = np.bincount(self.type_codes[mask], weights=self.market_value[mask], minlength=len(self.type_labels))
+        counts = np.bincount(self.type_codes[mask], minlength=len(self.type_labels))
+        return {
+            label: round(float(value), 2)
+            for label, value, count in zip(self.type_labels, values, counts)
+            if count
+        }
+
+    def type_counts(self, family_id: Optional[int] = None) -> Dict[str, int]:
+        """Number of assets per asset_type"""
+        mask = self._family_mask(family_id)
+        counts = np.bincount(self.type_codes[mask], minlength=len(self.type_labels))
+        return {label: int(count) for label, count in zip(self.type_labels, counts) if count}
+
+    def family_totals(self) -> Dict[int, float]:
+        """Market value keyed by family id"""
+        return {
+            int(family_id): round(float(total), 2)
+            for family_id, total in zip(self.family_keys, self.family_totals_array())
+        }
+
+
+class ValuationService:
+    """Service for loading holdings and valuing them in bulk"""
+
+    @staticmethod
+    def load(family_ids: Optional[Iterable[int]] = None) -> PortfolioValuation:
+        """Load holdings, latest prices and FX rates for the given families.
+
+        Uses a fixed number of queries regardless of how many assets are
+        loaded; ``family_ids=None`` loads every family (nightly revaluation).
+        """
+        from app.models.asset import Asset
+        from app.models.asset_position import AssetPosition
+
+        query = db.session.query(
+            Asset.id,
+            Asset.family_id,
+            Asset.name,
+            Asset.asset_type,
+            Asset.details,
+            AssetPosition.asset_id,
+            func.coalesce(AssetPosition.quantity, 0.0),
+            func.coalesce(AssetPosition.cost_basis, 0.0)
+        ).outerjoin(AssetPosition, AssetPosition.asset_id == Asset.id)
+        if family_ids is not None:
+            query = query.filter(Asset.family_id.in_(list(family_ids)))
+        rows = query.order_by(Asset.family_id, Asset.id).all()
+
+        quantity = np.zeros(len(rows), dtype=np.float64)
+        cost_basis = np.zeros(len(rows), dtype=np.float64)
+        legacy = []
+        for i, (asset_id, _, _, _, _, position_id, qty, cost) in enumerate(rows):
+            quantity[i] = qty
+            cost_basis[i] = cost
+            if position_id is None:
+                legacy.append(i)
+
+        # Assets not yet materialized are replayed from their ledger
+        if legacy:
+            legacy_assets = {
+                asset.id: asset for asset in
+                Asset.query.filter(Asset.id.in_([rows[i][0] for i in legacy])).all()
+            }
+            for i in legacy:
+                asset = legacy_assets[rows[i][0]]
+                quantity[i] = asset.current_quantity
+                cost_basis[i] = asset.current_value
+
+        asset_ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+        quotes = ValuationService._latest_quotes(asset_ids.tolist() if family_ids is not None else None)
+        fx_rates = ValuationService.fx_rates()
+
+        price = np.full(len(rows), np.nan, dtype=np.float64)
+        fx = np.full(len(rows), np.nan, dtype=np.float64)
+        currencies = []
+        for i, (asset_id, _, _, asset_type, details, _, _, _) in enumerate(rows):
+            declared = ((details or {}).get("currency") or BASE_CURRENCY).upper()
+            quote = quotes.get(asset_id)
+            if quote is None:
+                currencies.append(declared)
+                continue
+            quote_price, quote_currency = quote
+            price[i] = quote_price
+            # Foreign currency quotes are already the BRL rate
+            currency = BASE_CURRENCY if asset_type == "moeda_estrangeira" else (quote_currency or BASE_CURRENCY).upper()
+            fx[i] = fx_rates.get(currency, np.nan)
+            currencies.append(declared if asset_type == "moeda_estrangeira" else currency)
+
+        return PortfolioValuation(
+            asset_ids=asset_ids,
+            family_ids=np.fromiter((row[1] for row in rows), dtype=np.int64, count=len(rows)),
+            names=[row[2] for row in rows],
+            asset_types=[row[3] for row in rows],
+            quantity=quantity,
+            cost_basis=cost_basis,
+            price=price,
+            fx=fx,
+            currencies=currencies,
+            details=[row[4] or {} for row in rows]
+        )
+
+    @staticmethod
+    def _latest_quotes(asset_ids: Optional[List[int]] = None) -> Dict[int, tuple]:
+        """Latest (price, currency) per asset from the latest_quotes table"""
+        from app.models.latest_quote import LatestQuote
+
+        query = db.session.query(LatestQuote.asset_id, LatestQuote.price, LatestQuote.currency)
+        if asset_ids is not None:
+            if not asset_ids:
+                return {}
+            query = query.filter(LatestQuote.asset_id.in_(asset_ids))
+        return {asset_id: (price, currency) for asset_id, price, currency in query.all()}
+
+    @staticmethod
+    def fx_rates() -> Dict[str, float]:
+        """BRL rate per currency from the latest foreign currency quotes"""
+        from app.models.asset import Asset
+
+        rates = {BASE_CURRENCY: 1.0}
+        currency_assets = db.session.query(Asset.id, Asset.details).filter(
+            Asset.asset_type == "moeda_estrangeira"
+        ).all()
+        currency_by_asset = {
+            asset_id: details.get("currency").upper()
+            for asset_id, details in currency_assets
+            if details and details.get("currency")
+        }
+        if not currency_by_asset:
+            return rates
+
+        quotes = ValuationService._latest_quotes(list(currency_by_asset))
+        for asset_id, (price, _) in quotes.items():
+            if price and price > 0:
+                rates.setdefault(currency_by_asset[asset_id], price)
+        return rates
+
+    @staticmethod
+    def revalue_all_families() -> Dict[str, object]:
+        """Value every family in a single pass (nightly revaluation)"""
+        valuation = ValuationService.load()
+        totals = valuation.family_totals()
+        logger.info(f"Revalued {len(totals)} families ({len(valuation)} assets)")
+        return {
+            'families': len(totals),
+            'assets': len(valuation),
+            'priced_assets': int(valuation.priced.sum()),
+            'total_market_value': valuation.total_value(),
+            'total_unrealized_pnl': valuation.total_pnl()
+        }
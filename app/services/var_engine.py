@@ -0,0 +1,166 @@
+"""Value at Risk and Expected Shortfall: historical simulation and correlated Monte Carlo"""
+import logging
+import math
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from app.config.config import Config
+from app.services.risk_math import ReturnMatrix
+
+logger = logging.getLogger(__name__)
+
+# Paths simulated per pool task; fixed so results depend only on the seed
+PATHS_PER_TASK = 10_000
+# Daily returns historical simulation needs before it is reported
+MIN_HISTORY = 20
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> Optional[ProcessPoolExecutor]:
+    """Shared worker pool, created on first use (None runs simulations inline)"""
+    global _pool
+    workers = Config.RISK_MC_WORKERS or os.cpu_count() or 1
+    if workers <= 1:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            # Fresh interpreters: forking a threaded web server is unsafe
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def shutdown_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(cancel_futures=True)
+            _pool = None
+
+
+def tail_measures(losses: np.ndarray, confidence: float) -> Dict[str, float]:
+    """VaR (loss quantile) and CVaR (mean loss beyond it)"""
+    var = float(np.quantile(losses, confidence))
+    tail = losses[losses >= var]
+    return {'var': var, 'cvar': float(tail.mean()) if len(tail) else var}
+
+
+def cholesky_factor(covariance: np.ndarray) -> np.ndarray:
+    """Lower factor ``L`` with ``L @ L.T == covariance``.
+
+    Pairwise-estimated covariances are not always positive definite; those
+    fall back to an eigen-decomposition with negative eigenvalues clipped.
+    """
+    try:
+        return np.linalg.cholesky(covariance)
+    except np.linalg.LinAlgError:
+        eigenvalues, eigenvectors = np.linalg.eigh(covariance)
+        return eigenvectors * np.sqrt(np.clip(eigenvalues, 0.0, None))
+
+
+def simulate_losses(factor: np.ndarray, values: np.ndarray, horizons: Sequence[int], paths: int, seed) -> np.ndarray:
+    """Portfolio losses (horizon × path) for ``paths`` correlated normal scenarios.
+
+    One set of daily shocks serves every horizon, scaled by its square root.
+    """
+    rng = np.random.default_rng(seed)
+    shocks = rng.standard_normal((paths, factor.shape[0])) @ factor.T
+    return np.stack([-(np.expm1(shocks * math.sqrt(horizon)) @ values) for horizon in horizons])
+
+
+class VaREngine:
+    """VaR/CVaR of a portfolio from its daily return matrix.
+
+    Historical simulation revalues today's holdings under every observed
+    day of returns (missing returns count as unchanged prices) and scales
+    to longer horizons by the square root of time. Monte Carlo draws
+    zero-mean correlated log returns from the Cholesky factor of the daily
+    covariance, scaled to each horizon. Paths are simulated in fixed-size tasks
+    on a process pool with seeds spawned from one ``SeedSequence``, so a run
+    is reproducible whatever the number of workers.
+    """
+
+    def __init__(self, confidence: Optional[float] = None, horizons: Optional[Sequence[int]] = None,
+                 paths: Optional[int] = None, seed: Optional[int] = None):
+        self.confidence = confidence or Config.RISK_VAR_CONFIDENCE
+        self.horizons = list(horizons or Config.RISK_VAR_HORIZONS)
+        self.paths = paths or Config.RISK_MC_PATHS
+        self.seed = seed if seed is not None else Config.RISK_MC_SEED
+
+    def compute(self, returns: ReturnMatrix, asset_ids: Sequence[int], values: np.ndarray) -> Dict[str, object]:
+        """Loss measures for holdings ``values`` (BRL, aligned with ``asset_ids``)"""
+        column = {int(asset_id): j for j, asset_id in enumerate(returns.asset_ids)}
+        order = np.array([column[int(asset_id)] for asset_id in asset_ids], dtype=np.int64)
+        values = np.asarray(values, dtype=np.float64)
+        total = float(values.sum())
+
+        daily = returns.returns[:, order]
+        covariance = returns.covariance(annualize=False)[np.ix_(order, order)]
+        # Assets without a variance estimate are left out of the simulation
+        known = ~np.isnan(np.diagonal(covariance))
+
+        return {
+            'confidence': self.confidence,
+            'portfolio_value': round(total, 2),
+            'observations': int(daily.shape[0]),
+            'covered_value': round(float(values[known].sum()), 2),
+            'historical': self._historical(daily, values),
+            'monte_carlo': self._monte_carlo(covariance[np.ix_(known, known)], values[known])
+        }
+
+    def _historical(self, daily: np.ndarray, values: np.ndarray) -> Optional[Dict[str, Dict[str, float]]]:
+        if daily.shape[0] < MIN_HISTORY or not len(values):
+            return None
+        losses = -(np.expm1(np.nan_to_num(daily)) @ values)
+        one_day = tail_measures(losses, self.confidence)
+        return {
+            f"{horizon}d": self._rounded({key: value * math.sqrt(horizon) for key, value in one_day.items()})
+            for horizon in self.horizons
+        }
+
+    def _monte_carlo(self, covariance: np.ndarray, values: np.ndarray) -> Optional[Dict[str, object]]:
+        if not len(values) or values.sum() <= 0:
+            return None
+        factor = cholesky_factor(np.nan_to_num(covariance))
+        losses = self._simulate(factor, values)
+
+        measures = {
+            f"{horizon}d": self._rounded(tail_measures(losses[i], self.confidence))
+            for i, horizon in enumerate(self.horizons)
+        }
+        measures['paths'] = self.paths
+        return measures
+
+    def _simulate(self, factor: np.ndarray, values: np.ndarray) -> np.ndarray:
+        sizes: List[int] = [PATHS_PER_TASK] * (self.paths // PATHS_PER_TASK)
+        if self.paths % PATHS_PER_TASK:
+            sizes.append(self.paths % PATHS_PER_TASK)
+        seeds = np.random.SeedSequence(self.seed).spawn(len(sizes))
+
+        pool = _get_pool() if len(sizes) > 1 else None
+        if pool is None:
+            chunks = [simulate_losses(factor, values, self.horizons, size, seed) for size, seed in zip(sizes, seeds)]
+        else:
+            try:
+                futures = [
+                    pool.submit(simulate_losses, factor, values, self.horizons, size, seed)
+                    for size, seed in zip(sizes, seeds)
+                ]
+                chunks = [future.result() for future in futures]
+            except BrokenProcessPool as e:
+                # A dead worker breaks the whole pool: start over next time, finish inline now
+                logger.error(f"Monte Carlo pool failed, simulating inline: {e}")
+                shutdown_pool()
+                chunks = [simulate_losses(factor, values, self.horizons, size, seed) for size, seed in zip(sizes, seeds)]
+        return np.concatenate(chunks, axis=1)
+
+    @staticmethod
+    def _rounded(measures: Dict[str, float]) -> Dict[str, float]:
+        return {key: round(value, 2) for key, value in measures.items()}
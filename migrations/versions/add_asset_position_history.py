@@ -0,0 +1,38 @@
+"""Add asset_position_history table for point-in-time holdings
+
+Revision ID: add_asset_position_history
+Revises: add_realized_gain_positions
+Create Date: 2026-10-17 12:00:00.000000
+
+History for existing assets is backfilled by
+``python scripts/rebuild_positions.py --all``.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_asset_position_history'
+down_revision = 'add_realized_gain_positions'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    """Create the asset_position_history table"""
+    op.create_table('asset_position_history',
+    sa.Column('asset_id', sa.Integer(), nullable=False),
+    sa.Column('as_of_date', sa.Date(), nullable=False),
+    sa.Column('quantity', sa.Float(), nullable=False),
+    sa.Column('cost_basis', sa.Float(), nullable=False),
+    sa.Column('total_invested', sa.Float(), nullable=False),
+    sa.Column('total_divested', sa.Float(), nullable=False),
+    sa.Column('realized_gain_loss', sa.Float(), nullable=False),
+    sa.ForeignKeyConstraint(['asset_id'], ['assets.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('asset_id', 'as_of_date')
+    )
+
+
+def downgrade():
+    """Drop the asset_position_history table"""
+    op.drop_table('asset_position_history')
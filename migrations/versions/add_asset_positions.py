@@ -0,0 +1,40 @@
+"""Add materialized asset_positions table
+
+Revision ID: add_asset_positions
+Revises: remove_value_field_assets
+Create Date: 2026-10-17 10:00:00.000000
+
+Positions for existing assets can be backfilled with
+``python scripts/rebuild_positions.py --all``. Until then, assets without a
+position row keep being computed from the transaction ledger.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_asset_positions'
+down_revision = 'remove_value_field_assets'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    """Create the asset_positions table"""
+    op.create_table('asset_positions',
+    sa.Column('asset_id', sa.Integer(), nullable=False),
+    sa.Column('quantity', sa.Float(), nullable=False),
+    sa.Column('cost_basis', sa.Float(), nullable=False),
+    sa.Column('total_invested', sa.Float(), nullable=False),
+    sa.Column('total_divested', sa.Float(), nullable=False),
+    sa.Column('last_transaction_date', sa.Date(), nullable=True),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['asset_id'], ['assets.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('asset_id')
+    )
+
+
+def downgrade():
+    """Drop the asset_positions table"""
+    op.drop_table('asset_positions')
@@ -0,0 +1,49 @@
+"""Add composite indexes for the hot query paths
+
+Revision ID: add_hot_path_indexes
+Revises: add_transaction_keyset_indexes
+Create Date: 2026-10-17 14:00:00.000000
+
+quote_history and job_logs are not created by earlier revisions (they come
+from ``db.create_all()`` on existing installs), so their indexes are only
+created when the table is present.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_hot_path_indexes'
+down_revision = 'add_transaction_keyset_indexes'
+branch_labels = None
+depends_on = None
+
+
+INDEXES = [
+    ('ix_transactions_asset_id_transaction_date', 'transactions', ['asset_id', 'transaction_date']),
+    ('ix_quote_history_asset_id_timestamp', 'quote_history', ['asset_id', sa.text('timestamp DESC')]),
+    ('ix_alerts_family_id_criado_em', 'alerts', ['family_id', sa.text('criado_em DESC')]),
+    ('ix_assets_family_id_asset_type', 'assets', ['family_id', 'asset_type']),
+    ('ix_user_family_user_id_family_id', 'user_family', ['user_id', 'family_id']),
+    ('ix_job_logs_job_id_execution_time', 'job_logs', ['job_id', 'execution_time']),
+]
+
+
+def _existing_tables():
+    return set(sa.inspect(op.get_bind()).get_table_names())
+
+
+def upgrade():
+    """Create the composite indexes"""
+    tables = _existing_tables()
+    for name, table, columns in INDEXES:
+        if table in tables:
+            op.create_index(name, table, columns)
+
+
+def downgrade():
+    """Drop the composite indexes"""
+    tables = _existing_tables()
+    for name, table, _ in reversed(INDEXES):
+        if table in tables:
+            op.drop_index(name, table_name=table)
@@ -0,0 +1,48 @@
+"""Add denormalized latest_quotes table
+
+Revision ID: add_latest_quotes
+Revises: add_hot_path_indexes
+Create Date: 2026-10-17 15:00:00.000000
+
+The table is backfilled with the newest quote_history row of every asset
+(highest id on timestamp ties); from then on the ingest path keeps it current.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_latest_quotes'
+down_revision = 'add_hot_path_indexes'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    """Create and backfill the latest_quotes table"""
+    op.create_table('latest_quotes',
+    sa.Column('asset_id', sa.Integer(), nullable=False),
+    sa.Column('price', sa.Float(), nullable=False),
+    sa.Column('currency', sa.String(length=3), nullable=False),
+    sa.Column('source', sa.String(length=50), nullable=False),
+    sa.Column('timestamp', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['asset_id'], ['assets.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('asset_id')
+    )
+
+    if 'quote_history' in sa.inspect(op.get_bind()).get_table_names():
+        op.execute("""
+            INSERT INTO latest_quotes (asset_id, price, currency, source, timestamp)
+            SELECT asset_id, price, currency, source, timestamp
+            FROM (
+                SELECT asset_id, price, currency, source, timestamp,
+                       ROW_NUMBER() OVER (PARTITION BY asset_id ORDER BY timestamp DESC, id DESC) AS rank
+                FROM quote_history
+            ) ranked
+            WHERE rank = 1
+        """)
+
+
+def downgrade():
+    """Drop the latest_quotes table"""
+    op.drop_table('latest_quotes')
@@ -0,0 +1,39 @@
+"""Add quote_daily_bars table for the OHLC rollup
+
+Revision ID: add_quote_daily_bars
+Revises: add_latest_quotes
+Create Date: 2026-10-17 16:00:00.000000
+
+Existing raw quotes are rolled up by the ``rollup_quotes_daily`` job (or
+``QuoteRollupService.rollup()``); raw rows are only deleted after that.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_quote_daily_bars'
+down_revision = 'add_latest_quotes'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    """Create the quote_daily_bars table"""
+    op.create_table('quote_daily_bars',
+    sa.Column('asset_id', sa.Integer(), nullable=False),
+    sa.Column('bar_date', sa.Date(), nullable=False),
+    sa.Column('open', sa.Float(), nullable=False),
+    sa.Column('high', sa.Float(), nullable=False),
+    sa.Column('low', sa.Float(), nullable=False),
+    sa.Column('close', sa.Float(), nullable=False),
+    sa.Column('currency', sa.String(length=3), nullable=False),
+    sa.Column('quote_count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['asset_id'], ['assets.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('asset_id', 'bar_date')
+    )
+
+
+def downgrade():
+    """Drop the quote_daily_bars table"""
+    op.drop_table('quote_daily_bars')
@@ -0,0 +1,26 @@
+"""Add realized_gain_loss to asset_positions
+
+Revision ID: add_realized_gain_positions
+Revises: add_asset_positions
+Create Date: 2026-10-17 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_realized_gain_positions'
+down_revision = 'add_asset_positions'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    """Add FIFO realized gain/loss column to positions"""
+    op.add_column('asset_positions', sa.Column('realized_gain_loss', sa.Float(), nullable=False, server_default='0'))
+
+
+def downgrade():
+    """Remove realized gain/loss column from positions"""
+    op.drop_column('asset_positions', 'realized_gain_loss')
@@ -0,0 +1,57 @@
+"""Add risk_snapshots and the risk_dirty_families queue
+
+Revision ID: add_risk_snapshots
+Revises: add_quote_daily_bars
+Create Date: 2026-10-17 17:00:00.000000
+
+Every family that already holds assets is queued as dirty, so the
+``refresh_risk_snapshots`` job builds the first snapshots on its next run.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_risk_snapshots'
+down_revision = 'add_quote_daily_bars'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    """Create the risk_snapshots and risk_dirty_families tables"""
+    op.create_table('risk_snapshots',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('family_id', sa.Integer(), nullable=False),
+    sa.Column('computed_at', sa.DateTime(), nullable=False),
+    sa.Column('total_value', sa.Float(), nullable=False),
+    sa.Column('weighted_risk_score', sa.Float(), nullable=False),
+    sa.Column('risk_classification', sa.String(length=20), nullable=False),
+    sa.Column('portfolio_volatility', sa.Float(), nullable=True),
+    sa.Column('var_1d', sa.Float(), nullable=True),
+    sa.Column('cvar_1d', sa.Float(), nullable=True),
+    sa.Column('analysis', sa.JSON(), nullable=True),
+    sa.ForeignKeyConstraint(['family_id'], ['family.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_risk_snapshots_family_id_computed_at', 'risk_snapshots', ['family_id', 'computed_at'])
+
+    op.create_table('risk_dirty_families',
+    sa.Column('family_id', sa.Integer(), nullable=False),
+    sa.Column('marked_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['family_id'], ['family.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('family_id')
+    )
+
+    if 'assets' in sa.inspect(op.get_bind()).get_table_names():
+        op.execute("""
+            INSERT INTO risk_dirty_families (family_id, marked_at)
+            SELECT DISTINCT family_id, CURRENT_TIMESTAMP FROM assets
+        """)
+
+
+def downgrade():
+    """Drop the risk snapshot tables"""
+    op.drop_table('risk_dirty_families')
+    op.drop_index('ix_risk_snapshots_family_id_computed_at', table_name='risk_snapshots')
+    op.drop_table('risk_snapshots')
@@ -0,0 +1,29 @@
+"""Add (created_at, id) indexes for keyset pagination of transactions
+
+Revision ID: add_transaction_keyset_indexes
+Revises: add_asset_position_history
+Create Date: 2026-10-17 13:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_transaction_keyset_indexes'
+down_revision = 'add_asset_position_history'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    """Create the keyset pagination indexes"""
+    op.create_index('ix_transactions_created_at_id', 'transactions', ['created_at', 'id'])
+    op.create_index('ix_transactions_asset_created_at_id', 'transactions', ['asset_id', 'created_at', 'id'])
+    op.create_index('ix_transactions_type_created_at_id', 'transactions', ['transaction_type', 'created_at', 'id'])
+
+
+def downgrade():
+    """Drop the keyset pagination indexes"""
+    op.drop_index('ix_transactions_type_created_at_id', table_name='transactions')
+    op.drop_index('ix_transactions_asset_created_at_id', table_name='transactions')
+    op.drop_index('ix_transactions_created_at_id', table_name='transactions')
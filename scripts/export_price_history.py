@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Script para exportar o histórico de preços (barras diárias) para arquivos colunares
+
+Uso:
+    python scripts/export_price_history.py                      # Exporta o mês anterior e o atual
+    python scripts/export_price_history.py --since 2020-01-01   # Exporta a partir de uma data
+    python scripts/export_price_history.py --full               # Exporta todo o histórico
+"""
+
+import sys
+import os
+import argparse
+from datetime import date, datetime
+
+# Adicionar o diretório raiz ao path para importar os módulos
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from app.services.price_history_store import PriceHistoryStore
+
+def export_price_history(since=None):
+    """Exporta as barras diárias para arquivos .npy por ativo e mês"""
+    try:
+        store = PriceHistoryStore()
+        result = store.export(since)
+        print(f"✅ {result['bars']} barras exportadas em {result['partitions']} partições ({store.root})")
+        return result
+    except Exception as e:
+        print(f"❌ Erro ao exportar histórico de preços: {e}")
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description="Script para exportar o histórico de preços")
+    parser.add_argument("--since", help="Data inicial (YYYY-MM-DD)")
+    parser.add_argument("--full", action="store_true", help="Exporta todo o histórico de barras diárias")
+
+    args = parser.parse_args()
+
+    # Criar aplicação Flask
+    app = create_app()
+
+    with app.app_context():
+        if args.full:
+            export_price_history(date.min)
+        elif args.since:
+            export_price_history(datetime.strptime(args.since, "%Y-%m-%d").date())
+        else:
+            export_price_history()
+
+if __name__ == "__main__":
+    main()
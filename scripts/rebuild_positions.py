@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Script para reconstruir as posições materializadas dos ativos a partir das transações
+
+Uso:
+    python scripts/rebuild_positions.py --all              # Reconstrói as posições de todos os ativos
+    python scripts/rebuild_positions.py --family-id 1      # Reconstrói as posições de uma família
+"""
+
+import sys
+import os
+import argparse
+
+# Adicionar o diretório raiz ao path para importar os módulos
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from app.services.position_service import PositionService
+from app.config.extensions import db
+
+def rebuild_positions(family_id=None):
+    """Reconstrói as posições e salva no banco"""
+    try:
+        count = PositionService.rebuild_all(family_id)
+        db.session.commit()
+        print(f"✅ {count} posições reconstruídas com sucesso!")
+        return count
+    except Exception as e:
+        db.session.rollback()
+        print(f"❌ Erro ao reconstruir posições: {e}")
+        return 0
+
+def main():
+    parser = argparse.ArgumentParser(description="Script para reconstruir posições dos ativos")
+    parser.add_argument("--all", action="store_true", help="Reconstrói as posições de todos os ativos")
+    parser.add_argument("--family-id", type=int, help="Reconstrói as posições de uma família específica")
+
+    args = parser.parse_args()
+
+    # Criar aplicação Flask
+    app = create_app()
+
+    with app.app_context():
+        if args.family_id:
+            rebuild_positions(args.family_id)
+        elif args.all:
+            rebuild_positions()
+        else:
+            print("💡 Use --all ou --family-id. Use --help para ver as opções disponíveis.")
+
+if __name__ == "__main__":
+    main()
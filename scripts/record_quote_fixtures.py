@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Script para gravar respostas reais dos provedores de cotação em fixtures locais
+
+Uso:
+    python scripts/record_quote_fixtures.py                    # Grava as cotações de todas as famílias
+    python scripts/record_quote_fixtures.py --family-id 1      # Grava as cotações de uma família
+    python scripts/record_quote_fixtures.py --dir fixtures/q   # Diretório de destino
+
+Depois, com QUOTE_PROVIDER_MODE=replay, os serviços respondem dessas fixtures
+sem acessar a rede (QUOTE_REPLAY_LATENCY_MS, QUOTE_REPLAY_ERROR_RATE e
+QUOTE_PROVIDER_SEED controlam latência e falhas injetadas).
+"""
+
+import sys
+import os
+import argparse
+
+# Adicionar o diretório raiz ao path para importar os módulos
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from app.config.config import Config
+from app.models.family import Family
+
+def record_fixtures(family_ids):
+    """Atualiza as cotações pelos dois serviços gravando cada resposta"""
+    from app.services.market_data_service import MarketDataService
+    from app.services.quote_service import QuoteService
+
+    try:
+        quote_service = QuoteService()
+        market_data = MarketDataService()
+        for family_id in family_ids:
+            result = quote_service.update_asset_quotes(family_id)
+            market_data.update_all_asset_quotes(family_id)
+            print(f"✅ Família {family_id}: {result.get('updated', 0)} cotações gravadas")
+        print(f"📁 Fixtures em {Config.QUOTE_FIXTURES_DIR}")
+    except Exception as e:
+        print(f"❌ Erro ao gravar fixtures: {e}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Script para gravar fixtures dos provedores de cotação")
+    parser.add_argument("--family-id", type=int, help="ID da família")
+    parser.add_argument("--dir", help="Diretório das fixtures (padrão: QUOTE_FIXTURES_DIR)")
+
+    args = parser.parse_args()
+
+    Config.QUOTE_PROVIDER_MODE = "record"
+    if args.dir:
+        Config.QUOTE_FIXTURES_DIR = args.dir
+
+    # Criar aplicação Flask
+    app = create_app()
+
+    with app.app_context():
+        if args.family_id:
+            family_ids = [args.family_id]
+        else:
+            family_ids = [family.id for family in Family.query.all()]
+        record_fixtures(family_ids)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+from datetime import date, datetime
+
+import pytest
+
+from app.models.asset import Asset
+from app.models.asset_position_history import AssetPositionHistory
+from app.models.quote_history import QuoteHistory
+from app.models.transaction import Transaction
+
+
+@pytest.fixture()
+def asset(db, family, headers):
+    family.cash_balance = 100000.0
+    asset = Asset(name="PETR4", asset_type="renda_variavel", family_id=family.id, details={"ticker": "PETR4"})
+    db.session.add(asset)
+    db.session.commit()
+    return asset
+
+
+def trade(client, headers, asset, transaction_type, quantity, unit_price, transaction_date):
+    response = client.post("/transactions", json={
+        "asset_id": asset.id,
+        "transaction_type": transaction_type,
+        "quantity": quantity,
+        "unit_price": unit_price,
+        "transaction_date": transaction_date
+    }, headers=headers)
+    assert response.status_code == 201
+
+
+def add_quote(db, asset, price, timestamp):
+    db.session.add(QuoteHistory(asset_id=asset.id, price=price, currency="BRL", source="test", timestamp=timestamp))
+    db.session.commit()
+
+
+def get_as_of(client, headers, family, as_of):
+    return client.get(f"/assets?family_id={family.id}&as_of={as_of}", headers=headers)
+
+
+def test_as_of_returns_position_and_value_on_date(client, db, family, headers, asset):
+    trade(client, headers, asset, "buy", 10.0, 10.0, "2024-01-10")
+    trade(client, headers, asset, "buy", 10.0, 20.0, "2024-03-01")
+    trade(client, headers, asset, "sell", 5.0, 30.0, "2024-06-01")
+    add_quote(db, asset, 12.0, datetime(2024, 1, 31, 18))
+    add_quote(db, asset, 25.0, datetime(2024, 6, 30, 18))
+
+    assert [row.as_of_date for row in AssetPositionHistory.query.filter_by(asset_id=asset.id)
+            .order_by(AssetPositionHistory.as_of_date)] == [date(2024, 1, 10), date(2024, 3, 1), date(2024, 6, 1)]
+
+    data = get_as_of(client, headers, family, "2024-02-15").json
+    assert len(data) == 1
+    assert data[0]["current_quantity"] == 10.0
+    assert data[0]["current_value"] == 100.0
+    assert data[0]["market_price"] == 12.0
+    assert data[0]["market_value"] == 120.0
+    assert data[0]["unrealized_gain_loss"] == 20.0
+
+    data = get_as_of(client, headers, family, "2024-06-30").json
+    assert data[0]["current_quantity"] == 15.0
+    assert data[0]["current_value"] == 250.0
+    assert data[0]["realized_gain_loss"] == 100.0
+    assert data[0]["market_value"] == 375.0
+
+
+def test_as_of_before_first_trade_is_empty(client, db, family, headers, asset):
+    trade(client, headers, asset, "buy", 10.0, 10.0, "2024-01-10")
+
+    response = get_as_of(client, headers, family, "2023-12-31")
+    assert response.status_code == 200
+    assert response.json == []
+
+
+def test_as_of_replays_ledger_for_assets_without_history(client, db, family, headers, asset):
+    db.session.add_all([
+        Transaction(asset_id=asset.id, transaction_type="buy", quantity=4.0, unit_price=5.0,
+                    transaction_date=date(2024, 1, 1)),
+        Transaction(asset_id=asset.id, transaction_type="sell", quantity=1.0, unit_price=6.0,
+                    transaction_date=date(2024, 2, 1)),
+    ])
+    db.session.commit()
+
+    data = get_as_of(client, headers, family, "2024-01-15").json
+    assert data[0]["current_quantity"] == 4.0
+    assert data[0]["market_price"] is None
+    assert data[0]["unrealized_gain_loss"] == 0.0
+
+
+def test_as_of_prices_from_daily_bars_after_retention(client, db, family, headers, asset):
+    from app.services.quote_rollup_service import QuoteRollupService
+
+    trade(client, headers, asset, "buy", 10.0, 10.0, "2024-01-10")
+    add_quote(db, asset, 15.0, datetime(2024, 1, 31, 10))
+    add_quote(db, asset, 16.0, datetime(2024, 1, 31, 18))
+    before = get_as_of(client, headers, family, "2024-02-15").json
+
+    result = QuoteRollupService.apply_retention()
+
+    assert result["raw_quotes_removed"] == 2
+    assert QuoteHistory.query.count() == 0
+    data = get_as_of(client, headers, family, "2024-02-15").json
+    assert before[0]["market_price"] == data[0]["market_price"] == 16.0
+    assert data[0]["market_value"] == 160.0
+    assert data[0]["price_date"] == "2024-01-31T00:00:00"
+
+
+def test_as_of_invalid_date(client, family, headers):
+    response = get_as_of(client, headers, family, "31/12/2024")
+    assert response.status_code == 400
@@ -0,0 +1,87 @@
+from contextlib import contextmanager
+from datetime import date, datetime
+
+from sqlalchemy import event
+
+from app.models.asset import Asset
+from app.models.quote_history import QuoteHistory
+from app.models.transaction import Transaction
+from app.services.position_service import PositionService
+
+
+@contextmanager
+def count_queries(db):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(db.engine, "before_cursor_execute", before_cursor_execute)
+
+
+def add_assets(db, family, count, materialize=True):
+    for i in range(count):
+        asset = Asset(name=f"Ativo {i}", asset_type="renda_variavel", family_id=family.id,
+                      details={"ticker": f"TCK{i}"})
+        db.session.add(asset)
+        db.session.flush()
+        db.session.add_all([
+            Transaction(asset_id=asset.id, transaction_type="buy", quantity=10.0, unit_price=10.0,
+                        transaction_date=date(2024, 1, 1)),
+            Transaction(asset_id=asset.id, transaction_type="buy", quantity=10.0, unit_price=20.0,
+                        transaction_date=date(2024, 2, 1)),
+            QuoteHistory(asset_id=asset.id, price=12.0, currency="BRL", source="test",
+                         timestamp=datetime(2024, 1, 1)),
+            QuoteHistory(asset_id=asset.id, price=18.0, currency="BRL", source="test",
+                         timestamp=datetime(2024, 2, 1)),
+        ])
+        if materialize:
+            db.session.flush()
+            PositionService.rebuild(asset)
+    db.session.commit()
+
+
+def list_assets(client, db, family, headers):
+    # Start from an empty identity map so every relationship would lazy load
+    db.session.expire_all()
+    with count_queries(db) as statements:
+        response = client.get(f"/assets?family_id={family.id}", headers=headers)
+    assert response.status_code == 200
+    return response.json, len(statements)
+
+
+def test_list_assets_uses_fixed_number_of_queries(client, db, family, headers):
+    add_assets(db, family, 2)
+    _, small = list_assets(client, db, family, headers)
+
+    add_assets(db, family, 8)
+    data, large = list_assets(client, db, family, headers)
+
+    assert len(data) == 10
+    assert large == small
+
+
+def test_list_assets_uses_latest_quote_and_counts(client, db, family, headers):
+    add_assets(db, family, 1)
+    data, _ = list_assets(client, db, family, headers)
+
+    asset = data[0]
+    assert asset["transaction_count"] == 2
+    assert asset["current_quantity"] == 20.0
+    # 20 units at the latest quote (18.00) against 300.00 of cost
+    assert asset["unrealized_gain_loss"] == 60.0
+
+
+def test_list_assets_without_positions(client, db, family, headers):
+    add_assets(db, family, 2, materialize=False)
+    _, small = list_assets(client, db, family, headers)
+
+    add_assets(db, family, 4, materialize=False)
+    data, large = list_assets(client, db, family, headers)
+
+    assert large == small
+    assert all(asset["current_quantity"] == 20.0 for asset in data)
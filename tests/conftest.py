@@ -24,6 +24,25 @@ def app():
     })
     return app
 
+@pytest.fixture(autouse=True)
+def price_history_dir(tmp_path, monkeypatch):
+    """Exported price history files live in a per-test directory"""
+    from app.config.config import Config
+    directory = tmp_path / "price_history"
+    monkeypatch.setattr(Config, "PRICE_HISTORY_DIR", str(directory))
+    return directory
+
+@pytest.fixture(autouse=True)
+def clear_quote_cache():
+    """The shared quote cache and provider health must not leak between tests"""
+    from app.services.cache_service import quote_cache
+    from app.services.circuit_breaker import provider_health
+    quote_cache.clear()
+    provider_health.reset()
+    yield
+    quote_cache.clear()
+    provider_health.reset()
+
 @pytest.fixture()
 def db(app):
     """Access to test database"""
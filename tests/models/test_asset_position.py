@@ -0,0 +1,144 @@
+"""Tests for the materialized asset position"""
+import json
+from datetime import date
+
+import pytest
+from flask_jwt_extended import create_access_token
+
+from app.models.asset import Asset
+from app.models.asset_position import AssetPosition
+from app.models.family import Family
+from app.models.transaction import Transaction
+from app.models.user import User
+from app.services.position_service import PositionService
+
+
+@pytest.fixture()
+def setup_data(db):
+    user = User(email="position@example.com")
+    user.set_password("password123")
+    family = Family(name="Position Family", cash_balance=100000.0)
+    user.families.append(family)
+    db.session.add_all([user, family])
+    db.session.commit()
+
+    asset = Asset(name="PETR4", asset_type="renda_variavel", family_id=family.id, details={"ticker": "PETR4"})
+    db.session.add(asset)
+    db.session.commit()
+
+    token = create_access_token(identity=str(user.id))
+    return {
+        "family": family,
+        "asset": asset,
+        "headers": {"Authorization": f"Bearer {token}"}
+    }
+
+
+def post_transaction(client, headers, **payload):
+    return client.post("/transactions", data=json.dumps(payload), headers=headers, content_type="application/json")
+
+
+class TestPositionMaintenance:
+    """Test that transaction endpoints keep the position in sync"""
+
+    def test_create_transactions_update_position(self, client, db, setup_data):
+        asset, headers = setup_data["asset"], setup_data["headers"]
+
+        post_transaction(client, headers, asset_id=asset.id, transaction_type="buy", quantity=100.0,
+                         unit_price=10.0, transaction_date="2024-01-01")
+        post_transaction(client, headers, asset_id=asset.id, transaction_type="buy", quantity=50.0,
+                         unit_price=12.0, transaction_date="2024-02-01")
+        response = post_transaction(client, headers, asset_id=asset.id, transaction_type="sell", quantity=30.0,
+                                    unit_price=15.0, transaction_date="2024-03-01")
+        assert response.status_code == 201
+
+        position = db.session.get(AssetPosition, asset.id)
+        assert position is not None
+        assert position.quantity == 120.0
+        assert position.cost_basis == pytest.approx(1300.0)
+        assert position.total_invested == 1600.0
+        assert position.total_divested == 450.0
+        assert position.realized_gain_loss == pytest.approx(150.0)
+        assert position.last_transaction_date == date(2024, 3, 1)
+        assert position.version == 3
+
+        assert asset.current_quantity == 120.0
+        assert asset.average_cost == 10.83
+
+    def test_back_dated_transaction_rebuilds_position(self, client, db, setup_data):
+        asset, headers = setup_data["asset"], setup_data["headers"]
+
+        post_transaction(client, headers, asset_id=asset.id, transaction_type="buy", quantity=10.0,
+                         unit_price=20.0, transaction_date="2024-06-01")
+        post_transaction(client, headers, asset_id=asset.id, transaction_type="buy", quantity=10.0,
+                         unit_price=10.0, transaction_date="2024-01-01")
+        post_transaction(client, headers, asset_id=asset.id, transaction_type="sell", quantity=10.0,
+                         unit_price=30.0, transaction_date="2024-07-01")
+
+        position = db.session.get(AssetPosition, asset.id)
+        # The back-dated lot at 10 is the oldest, so FIFO sells it first
+        assert position.quantity == 10.0
+        assert position.cost_basis == pytest.approx(200.0)
+        assert position.last_transaction_date == date(2024, 7, 1)
+
+    def test_update_and_delete_rebuild_position(self, client, db, setup_data):
+        asset, headers = setup_data["asset"], setup_data["headers"]
+
+        response = post_transaction(client, headers, asset_id=asset.id, transaction_type="buy", quantity=10.0,
+                                    unit_price=10.0, transaction_date="2024-01-01")
+        transaction_id = json.loads(response.data)["id"]
+
+        client.put(f"/transactions/{transaction_id}", data=json.dumps({"quantity": 20.0}),
+                   headers=headers, content_type="application/json")
+        position = db.session.get(AssetPosition, asset.id)
+        assert position.quantity == 20.0
+        assert position.total_invested == 200.0
+
+        client.delete(f"/transactions/{transaction_id}", headers=headers)
+        position = db.session.get(AssetPosition, asset.id)
+        assert position.quantity == 0.0
+        assert position.cost_basis == 0.0
+        assert position.last_transaction_date is None
+
+    def test_rebuild_all_matches_ledger(self, db, setup_data):
+        asset = setup_data["asset"]
+        db.session.add_all([
+            Transaction(asset_id=asset.id, transaction_type="buy", quantity=5.0, unit_price=8.0,
+                        transaction_date=date(2024, 1, 1)),
+            Transaction(asset_id=asset.id, transaction_type="sell", quantity=2.0, unit_price=9.0,
+                        transaction_date=date(2024, 1, 2)),
+        ])
+        db.session.commit()
+
+        # Without a position row the values come from the ledger
+        assert asset.position is None
+        assert asset.current_quantity == 3.0
+
+        assert PositionService.rebuild_all(setup_data["family"].id) == 1
+        db.session.commit()
+
+        assert asset.position.quantity == 3.0
+        assert asset.current_value == 24.0
+
+    def test_summary_uses_lot_engine(self, client, db, setup_data):
+        asset, headers = setup_data["asset"], setup_data["headers"]
+
+        post_transaction(client, headers, asset_id=asset.id, transaction_type="buy", quantity=10.0,
+                         unit_price=10.0, transaction_date="2024-01-01")
+        post_transaction(client, headers, asset_id=asset.id, transaction_type="buy", quantity=10.0,
+                         unit_price=20.0, transaction_date="2024-01-02")
+        post_transaction(client, headers, asset_id=asset.id, transaction_type="sell", quantity=10.0,
+                         unit_price=25.0, transaction_date="2024-02-01")
+        post_transaction(client, headers, asset_id=asset.id, transaction_type="sell", quantity=5.0,
+                         unit_price=25.0, transaction_date="2024-03-01")
+
+        response = client.get(f"/transactions/asset/{asset.id}/summary", headers=headers)
+        data = json.loads(response.data)
+
+        assert response.status_code == 200
+        # 10 * (25 - 10) + 5 * (25 - 20)
+        assert data["realized_gain_loss"] == 175.0
+        assert data["current_quantity"] == 5.0
+        assert data["average_cost"] == 20.0
+        assert len(data["open_lots"]) == 1
+        assert asset.realized_gain_loss == 175.0
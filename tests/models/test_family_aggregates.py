@@ -0,0 +1,113 @@
+"""Tests for the SQL-side family aggregates"""
+import json
+from datetime import date
+
+import pytest
+from flask_jwt_extended import create_access_token
+
+from app.models.asset import Asset
+from app.models.family import Family
+from app.models.transaction import Transaction
+from app.models.user import User
+from app.services.position_service import PositionService
+
+
+@pytest.fixture()
+def setup_data(db):
+    user = User(email="aggregates@example.com")
+    user.set_password("password123")
+    family = Family(name="Aggregates Family", cash_balance=1000.0)
+    user.families.append(family)
+    db.session.add_all([user, family])
+    db.session.commit()
+
+    stock = Asset(name="VALE3", asset_type="renda_variavel", family_id=family.id)
+    bond = Asset(name="CDB", asset_type="renda_fixa", family_id=family.id)
+    empty = Asset(name="BTC", asset_type="cripto", family_id=family.id)
+    db.session.add_all([stock, bond, empty])
+    db.session.commit()
+
+    db.session.add_all([
+        Transaction(asset_id=stock.id, transaction_type="buy", quantity=10.0, unit_price=50.0,
+                    transaction_date=date(2024, 1, 1)),
+        Transaction(asset_id=stock.id, transaction_type="sell", quantity=4.0, unit_price=60.0,
+                    transaction_date=date(2024, 2, 1)),
+        Transaction(asset_id=bond.id, transaction_type="buy", quantity=1.0, unit_price=2000.0,
+                    transaction_date=date(2024, 1, 1)),
+    ])
+    db.session.commit()
+
+    token = create_access_token(identity=str(user.id))
+    return {
+        "family": family,
+        "stock": stock,
+        "bond": bond,
+        "headers": {"Authorization": f"Bearer {token}"}
+    }
+
+
+class TestFamilyAggregates:
+    """Test Family.get_aggregates"""
+
+    def test_aggregates_match_per_asset_values(self, db, setup_data):
+        family = setup_data["family"]
+        PositionService.rebuild_all(family.id)
+        db.session.commit()
+
+        aggregates = family.get_aggregates()
+        assert aggregates["asset_count"] == 3
+        assert aggregates["allocation"] == {"renda_variavel": 300.0, "renda_fixa": 2000.0, "cripto": 0.0}
+        assert family.total_invested == sum(asset.current_value for asset in family.assets)
+        assert family.total_patrimony == 3300.0
+
+    def test_assets_without_position_fall_back_to_ledger(self, db, setup_data):
+        family = setup_data["family"]
+        # Only the bond is materialized; the stock must be replayed from its ledger
+        PositionService.rebuild(setup_data["bond"])
+        db.session.commit()
+
+        assert setup_data["stock"].position is None
+        assert family.asset_allocation["renda_variavel"] == 300.0
+        assert family.total_invested == 2300.0
+
+    def test_balance_endpoint_queries_aggregates_once(self, client, db, setup_data, monkeypatch):
+        family = setup_data["family"]
+        PositionService.rebuild_all(family.id)
+        db.session.commit()
+
+        calls = []
+        original = Family._query_aggregates
+
+        def counting_query(self):
+            calls.append(self.id)
+            return original(self)
+
+        monkeypatch.setattr(Family, "_query_aggregates", counting_query)
+
+        response = client.get(f"/families/{family.id}/balance", headers=setup_data["headers"])
+        data = json.loads(response.data)
+
+        assert response.status_code == 200
+        assert data["total_invested"] == 2300.0
+        assert data["total_patrimony"] == 3300.0
+        assert calls == [family.id]
+
+    def test_request_cache_lives_in_g_and_is_invalidated(self, app, db, setup_data, monkeypatch):
+        from flask import g
+
+        family = setup_data["family"]
+        calls = []
+        original = Family._query_aggregates
+        monkeypatch.setattr(Family, "_query_aggregates", lambda self: calls.append(self.id) or original(self))
+
+        with app.test_request_context():
+            family.get_aggregates()
+            family.get_aggregates()
+            assert family.id in g.family_aggregates
+            Family.invalidate_aggregates(family.id)
+            family.get_aggregates()
+
+        with app.test_request_context():
+            family.get_aggregates()
+
+        assert calls == [family.id] * 3
@@ -0,0 +1,74 @@
+"""Tests for the denormalized latest_quotes table"""
+from datetime import datetime
+
+from app.models.asset import Asset
+from app.models.family import Family
+from app.models.latest_quote import LatestQuote
+from app.models.quote_history import QuoteHistory
+from app.services.quote_store import QuoteStore
+from app.services.valuation_service import ValuationService
+
+
+def make_asset(db, name="PETR4"):
+    family = Family(name=f"{name} Family")
+    db.session.add(family)
+    db.session.commit()
+    asset = Asset(name=name, asset_type="renda_variavel", family_id=family.id)
+    db.session.add(asset)
+    db.session.commit()
+    return asset
+
+
+def test_orm_insert_upserts_latest_quote(db):
+    asset = make_asset(db)
+    db.session.add(QuoteHistory(asset_id=asset.id, price=10.0, currency="BRL", source="yahoo_finance",
+                                timestamp=datetime(2024, 1, 2)))
+    db.session.commit()
+    db.session.add(QuoteHistory(asset_id=asset.id, price=12.0, currency="BRL", source="yahoo_finance",
+                                timestamp=datetime(2024, 1, 3)))
+    db.session.commit()
+
+    latest = db.session.get(LatestQuote, asset.id)
+    assert latest.price == 12.0
+    assert latest.timestamp == datetime(2024, 1, 3)
+    assert asset.latest_quote.price == 12.0
+
+
+def test_late_quote_does_not_overwrite_newer_price(db):
+    asset = make_asset(db)
+    db.session.add(QuoteHistory(asset_id=asset.id, price=12.0, currency="BRL", source="yahoo_finance",
+                                timestamp=datetime(2024, 1, 3)))
+    db.session.add(QuoteHistory(asset_id=asset.id, price=9.0, currency="BRL", source="yahoo_finance",
+                                timestamp=datetime(2024, 1, 1)))
+    db.session.commit()
+
+    assert db.session.get(LatestQuote, asset.id).price == 12.0
+
+
+def test_bulk_store_upserts_one_row_per_asset(db):
+    first, second = make_asset(db, "PETR4"), make_asset(db, "VALE3")
+
+    store = QuoteStore(chunk_size=2)
+    store.add(first.id, 10.0, "BRL", "yahoo_finance", datetime(2024, 1, 1))
+    store.add(first.id, 11.0, "BRL", "yahoo_finance", datetime(2024, 1, 2))
+    store.add(second.id, 60.0, "BRL", "yahoo_finance", datetime(2024, 1, 2))
+    store.add(first.id, 10.5, "BRL", "yahoo_finance", datetime(2024, 1, 1, 12))
+    store.flush()
+
+    assert QuoteHistory.query.count() == 4
+    assert LatestQuote.query.count() == 2
+    assert db.session.get(LatestQuote, first.id).price == 11.0
+    assert ValuationService._latest_quotes([first.id, second.id]) == {
+        first.id: (11.0, "BRL"), second.id: (60.0, "BRL")
+    }
+
+
+def test_deleting_asset_removes_latest_quote(db):
+    asset = make_asset(db)
+    db.session.add(QuoteHistory(asset_id=asset.id, price=10.0, currency="BRL", source="yahoo_finance"))
+    db.session.commit()
+
+    db.session.delete(asset)
+    db.session.commit()
+
+    assert LatestQuote.query.count() == 0
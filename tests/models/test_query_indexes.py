@@ -0,0 +1,86 @@
+"""Check that the hot query paths are served by their composite indexes.
+
+SQLite runs always. PostgreSQL runs when TEST_POSTGRES_URL points to a
+database the tests may create a scratch schema in.
+"""
+import os
+import uuid
+
+import pytest
+from sqlalchemy import create_engine, select, text
+
+from app.config.extensions import db as _db
+from app.models.alert import Alert
+from app.models.asset import Asset
+from app.models.job_log import JobLog
+from app.models.quote_history import QuoteHistory
+from app.models.transaction import Transaction
+from app.models.user import user_family
+
+
+HOT_QUERIES = [
+    (
+        "ix_transactions_asset_id_transaction_date",
+        select(Transaction).where(Transaction.asset_id == 1).order_by(Transaction.transaction_date)
+    ),
+    (
+        "ix_quote_history_asset_id_timestamp",
+        select(QuoteHistory).where(QuoteHistory.asset_id == 1).order_by(QuoteHistory.timestamp.desc()).limit(1)
+    ),
+    (
+        "ix_alerts_family_id_criado_em",
+        select(Alert).where(Alert.family_id == 1).order_by(Alert.criado_em.desc()).limit(5)
+    ),
+    (
+        "ix_assets_family_id_asset_type",
+        select(Asset.id).where(Asset.family_id == 1, Asset.asset_type == "renda_fixa")
+    ),
+    (
+        "ix_user_family_user_id_family_id",
+        select(user_family.c.family_id).where(user_family.c.user_id == 1)
+    ),
+    (
+        "ix_job_logs_job_id_execution_time",
+        select(JobLog).where(JobLog.job_id == "update_quotes_daily").order_by(JobLog.execution_time.desc()).limit(10)
+    ),
+]
+
+
+def explain(connection, statement, prefix):
+    sql = str(statement.compile(dialect=connection.dialect, compile_kwargs={"literal_binds": True}))
+    return "\n".join(str(row) for row in connection.execute(text(f"{prefix} {sql}")))
+
+
+@pytest.mark.parametrize("index_name,statement", HOT_QUERIES, ids=[name for name, _ in HOT_QUERIES])
+def test_sqlite_uses_index(db, index_name, statement):
+    with db.engine.connect() as connection:
+        plan = explain(connection, statement, "EXPLAIN QUERY PLAN")
+    assert index_name in plan
+
+
+@pytest.fixture(scope="module")
+def postgres_connection():
+    url = os.environ.get("TEST_POSTGRES_URL")
+    if not url:
+        pytest.skip("TEST_POSTGRES_URL not set")
+
+    engine = create_engine(url)
+    schema = f"test_indexes_{uuid.uuid4().hex[:8]}"
+    with engine.connect() as connection:
+        # DDL is transactional in PostgreSQL: the rollback drops the schema
+        connection.execute(text(f"CREATE SCHEMA {schema}"))
+        connection.execute(text(f"SET LOCAL search_path TO {schema}"))
+        _db.metadata.create_all(bind=connection)
+        # Empty tables would otherwise always be scanned sequentially
+        connection.execute(text("SET LOCAL enable_seqscan = off"))
+        try:
+            yield connection
+        finally:
+            connection.rollback()
+    engine.dispose()
+
+
+@pytest.mark.parametrize("index_name,statement", HOT_QUERIES, ids=[name for name, _ in HOT_QUERIES])
+def test_postgres_uses_index(postgres_connection, index_name, statement):
+    plan = explain(postgres_connection, statement, "EXPLAIN")
+    assert index_name in plan
@@ -0,0 +1,130 @@
+"""Tests for the price/valuation SSE stream"""
+import json
+
+from flask_jwt_extended import create_access_token
+
+from app.models.asset import Asset
+from app.services.price_stream import PriceStreamBroker, price_stream
+from app.services.quote_store import QuoteStore
+
+
+def parse_event(chunk):
+    fields = dict(line.split(": ", 1) for line in chunk.decode().strip().splitlines())
+    return fields["event"], json.loads(fields["data"])
+
+
+def test_stream_pushes_ticks_and_valuation_on_quote_writes(client, db, headers, family, monkeypatch):
+    monkeypatch.setattr("app.config.config.Config.PRICE_STREAM_HEARTBEAT_SECONDS", 0.05)
+    asset = Asset(name="PETR4", asset_type="renda_variavel", family_id=family.id)
+    db.session.add(asset)
+    db.session.commit()
+    asset_id = asset.id
+
+    response = client.get(f"/risk/quotes/stream?family_id={family.id}", headers=headers, buffered=False)
+    assert response.status_code == 200
+    assert response.mimetype == "text/event-stream"
+    body = iter(response.response)
+    assert next(body).startswith(b"retry:")
+    event, snapshot = parse_event(next(body))
+    assert event == "valuation" and snapshot["family_id"] == family.id
+    assert price_stream.subscribed_families() == {family.id}
+
+    store = QuoteStore()
+    store.add(asset_id, 31.5, "BRL", "yahoo_finance")
+    store.flush()
+
+    event, prices = parse_event(next(body))
+    assert event == "prices"
+    assert [(q["asset_id"], q["price"]) for q in prices["quotes"]] == [(asset_id, 31.5)]
+    event, valuation = parse_event(next(body))
+    assert event == "valuation"
+    assert set(valuation) >= {"total_value", "total_pnl", "allocation"}
+    # Idle stream: keep-alive comments
+    assert next(body) == b": keep-alive\n\n"
+
+    response.close()
+    assert price_stream.subscribed_families() == set()
+
+
+def test_stream_accepts_token_in_query_string(client, user, family, db):
+    user.families.append(family)
+    db.session.commit()
+    token = create_access_token(identity=str(user.id))
+
+    response = client.get(f"/risk/quotes/stream?family_id={family.id}&jwt={token}", buffered=False)
+
+    assert response.status_code == 200
+    response.close()
+    assert price_stream.subscribed_families() == set()
+
+
+def test_stream_requires_family_access(client, headers, db):
+    from app.models.family import Family
+    other = Family(name="Outra Familia")
+    db.session.add(other)
+    db.session.commit()
+
+    response = client.get(f"/risk/quotes/stream?family_id={other.id}", headers=headers)
+
+    assert response.status_code == 403
+    assert price_stream.subscribed_families() == set()
+
+
+def test_slow_subscriber_keeps_only_newest_events():
+    broker = PriceStreamBroker(queue_size=2)
+    subscription = broker.subscribe(1)
+
+    for n in range(5):
+        broker.publish(1, "prices", {"n": n})
+
+    received = [json.loads(subscription.get(0).split("data: ")[1]) for _ in range(2)]
+    assert received == [{"n": 3}, {"n": 4}]
+    assert subscription.get(0) is None
+
+
+def test_quotes_without_subscribers_publish_nothing(db):
+    broker = PriceStreamBroker()
+    # No subscribers: returns before touching the database
+    broker.publish_quotes([{"asset_id": 1, "price": 1.0}])
+
+
+def test_postgres_publishes_through_notify(db, family, monkeypatch):
+    broker = PriceStreamBroker()
+    monkeypatch.setattr(PriceStreamBroker, "_cross_process", staticmethod(lambda: True))
+    monkeypatch.setattr(broker, "_ensure_listener", lambda: None)
+    subscription = broker.subscribe(family.id)
+    sent = []
+    monkeypatch.setattr(db.session, "execute", lambda statement, params=None: sent.append(params))
+
+    broker.publish_quotes([{"asset_id": 7, "price": 1.0}, {"asset_id": 3, "price": 2.0}])
+
+    assert sent == [{"channel": "price_stream", "payload": "3,7"}]
+    # Delivered by the listener, not by the writer
+    assert subscription.get(0) is None
+
+
+def test_notify_payloads_fit_the_postgres_limit():
+    payloads = PriceStreamBroker.notify_payloads(range(5000))
+
+    assert len(payloads) > 1
+    assert all(len(payload) <= 7000 for payload in payloads)
+    assert sorted(int(item) for payload in payloads for item in payload.split(",")) == list(range(5000))
+
+
+def test_listener_delivers_stored_quotes(db, family):
+    asset = Asset(name="PETR4", asset_type="renda_variavel", family_id=family.id)
+    db.session.add(asset)
+    db.session.commit()
+    store = QuoteStore()
+    store.add(asset.id, 32.0, "BRL", "yahoo_finance")
+    store.flush()
+
+    broker = PriceStreamBroker()
+    subscription = broker.subscribe(family.id)
+    broker.publish_stored({asset.id})
+
+    event, prices = parse_event(subscription.get(0).encode())
+    assert event == "prices"
+    assert [(q["asset_id"], q["price"]) for q in prices["quotes"]] == [(asset.id, 32.0)]
+    event, _ = parse_event(subscription.get(0).encode())
+    assert event == "valuation"
@@ -0,0 +1,185 @@
+"""Tests for provider circuit breakers and the quote fallback chain"""
+import json
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from app.services.circuit_breaker import (
+    CLOSED, HALF_OPEN, OPEN, CircuitBreaker, ProviderHealthRegistry, provider_health
+)
+from app.services.market_data_service import MarketDataService
+
+
+class StubProviders:
+    """Local HTTP server standing in for Yahoo Finance and Alpha Vantage"""
+
+    def __init__(self):
+        self.hits = Counter()
+        self.yahoo_status = 200
+        self.yahoo_delay = 0.0
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.startswith("/yahoo/"):
+                    stub.hits["yahoo"] += 1
+                    time.sleep(stub.yahoo_delay)
+                    body = {"chart": {"result": [{"meta": {
+                        "regularMarketPrice": 30.0, "chartPreviousClose": 29.0, "currency": "BRL"
+                    }}]}}
+                    self._reply(stub.yahoo_status, body)
+                else:
+                    stub.hits["alpha"] += 1
+                    self._reply(200, {"Global Quote": {"05. price": "31.0", "08. previous close": "30.0"}})
+
+            def _reply(self, status, body):
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                try:
+                    self.wfile.write(payload)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # client already gave up (timeout)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def stub():
+    providers = StubProviders()
+    yield providers
+    providers.close()
+
+
+@pytest.fixture
+def service(stub):
+    service = MarketDataService()
+    service.yahoo_base = f"{stub.url}/yahoo"
+    service.alpha_vantage_base = f"{stub.url}/alpha"
+    service.timeout = 0.5
+    return service
+
+
+def test_breaker_opens_after_threshold_and_probes_once():
+    breaker = CircuitBreaker("p", failure_threshold=2, reset_timeout=0.05)
+
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+
+    time.sleep(0.06)
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
+    assert not breaker.allow()  # only one probe at a time
+
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CLOSED
+
+
+def test_registry_demotes_slow_and_failing_providers():
+    registry = ProviderHealthRegistry()
+    assert registry.order(["primary", "backup"]) == ["primary", "backup"]
+
+    registry.get("primary").observe(5.0, success=True)
+    assert registry.order(["primary", "backup"]) == ["backup", "primary"]
+
+    for _ in range(3):
+        registry.get("primary").observe(0.1, success=True)
+    assert registry.order(["primary", "backup"]) == ["primary", "backup"]
+
+    for _ in range(registry.get("primary").breaker.failure_threshold):
+        registry.get("primary").observe(0.1, success=False)
+    assert registry.get("primary").breaker.state == OPEN
+    assert registry.order(["primary", "backup"]) == ["backup", "primary"]
+
+
+def test_stale_statistics_stop_demoting():
+    registry = ProviderHealthRegistry()
+    health = registry.get("primary")
+    health.breaker.reset_timeout = 0.05
+    health.observe(5.0, success=True)
+    assert health.degraded
+
+    time.sleep(0.06)
+    assert not health.degraded
+
+
+def test_primary_provider_is_used_when_healthy(service, stub):
+    quote = service._fetch_provider_quote("yahoo_finance", "PETR4")
+
+    assert quote.source == "yahoo_finance"
+    assert quote.price == 30.0
+    assert stub.hits == Counter(yahoo=1)
+
+
+def test_failing_provider_falls_back_and_is_skipped_once_open(service, stub):
+    stub.yahoo_status = 500
+    threshold = provider_health.get("yahoo_finance").breaker.failure_threshold
+
+    for _ in range(threshold):
+        assert service._fetch_provider_quote("yahoo_finance", "PETR4").source == "alpha_vantage"
+    assert provider_health.get("yahoo_finance").breaker.state == OPEN
+
+    # Open circuit: no more requests to the failing provider
+    for _ in range(5):
+        assert service._fetch_provider_quote("yahoo_finance", "PETR4").source == "alpha_vantage"
+    assert stub.hits["yahoo"] == threshold
+    assert service.provider_status()["yahoo_finance"]["state"] == OPEN
+
+
+def test_outage_latency_is_bounded_once_circuit_opens(service, stub):
+    stub.yahoo_delay = 2.0
+    threshold = provider_health.get("yahoo_finance").breaker.failure_threshold
+    for _ in range(threshold):
+        service._fetch_provider_quote("yahoo_finance", "PETR4")
+
+    started = time.monotonic()
+    quote = service._fetch_provider_quote("yahoo_finance", "PETR4")
+
+    assert quote.source == "alpha_vantage"
+    assert time.monotonic() - started < service.timeout
+
+
+def test_half_open_probe_closes_circuit_after_recovery(service, stub):
+    stub.yahoo_status = 500
+    breaker = provider_health.get("yahoo_finance").breaker
+    breaker.reset_timeout = 0.05
+    for _ in range(breaker.failure_threshold):
+        service._fetch_provider_quote("yahoo_finance", "PETR4")
+    assert breaker.state == OPEN
+
+    stub.yahoo_status = 200
+    time.sleep(0.06)
+    hits = stub.hits["yahoo"]
+    service._fetch_provider_quote("yahoo_finance", "PETR4")
+
+    assert stub.hits["yahoo"] == hits + 1
+    assert breaker.state == CLOSED
+
+
+def test_all_providers_failing_raises_last_error(service, stub):
+    stub.yahoo_status = 500
+    service.alpha_vantage_base = f"{stub.url}/yahoo/missing"
+
+    with pytest.raises(Exception):
+        service._fetch_provider_quote("yahoo_finance", "PETR4")
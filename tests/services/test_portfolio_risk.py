@@ -0,0 +1,105 @@
+"""Tests for the portfolio risk analysis read path"""
+import time
+from datetime import date, datetime, timedelta
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+from sqlalchemy import event, insert
+
+from app.models.asset import Asset
+from app.models.family import Family
+from app.models.latest_quote import LatestQuote
+from app.models.quote_daily_bar import QuoteDailyBar
+from app.models.transaction import Transaction
+from app.services.market_data_service import MarketData, MarketDataService
+from app.services.position_service import PositionService
+
+
+@pytest.fixture
+def large_family(db, monkeypatch):
+    monkeypatch.setattr("app.config.config.Config.RISK_MC_PATHS", 10_000)
+    family = Family(name="Large")
+    db.session.add(family)
+    db.session.flush()
+
+    rng = np.random.default_rng(11)
+    today = date.today()
+    bars, latest, assets = [], [], []
+    for n in range(200):
+        asset = Asset(name=f"STK{n}", asset_type="renda_variavel", family_id=family.id,
+                      details={"ticker": f"STK{n}"})
+        db.session.add(asset)
+        db.session.flush()
+        db.session.add(Transaction(asset_id=asset.id, transaction_type="buy", quantity=10,
+                                   unit_price=20.0, transaction_date=date(2024, 1, 1)))
+        closes = 20 * np.exp(np.cumsum(rng.normal(0, 0.02, 60)))
+        bars.extend(
+            {'asset_id': asset.id, 'bar_date': today - timedelta(days=60 - i), 'open': float(c), 'high': float(c),
+             'low': float(c), 'close': float(c), 'currency': 'BRL', 'quote_count': 1}
+            for i, c in enumerate(closes)
+        )
+        latest.append({'asset_id': asset.id, 'price': float(closes[-1]), 'currency': 'BRL',
+                       'source': 'yahoo_finance', 'timestamp': datetime.now()})
+        assets.append(asset)
+    db.session.flush()
+    for asset in assets:
+        PositionService.rebuild(asset)
+    db.session.execute(insert(QuoteDailyBar), bars)
+    db.session.execute(insert(LatestQuote), latest)
+    db.session.commit()
+    return family, assets
+
+
+def test_risk_analysis_uses_stored_quotes_without_network(db, large_family):
+    family, assets = large_family
+    service = MarketDataService()
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.engine, "before_cursor_execute", count)
+    try:
+        with patch.object(service.session, "get", side_effect=AssertionError("network call")) as get:
+            started = time.monotonic()
+            analysis = service.get_portfolio_risk_analysis(family.id)
+            elapsed = time.monotonic() - started
+    finally:
+        event.remove(db.engine, "before_cursor_execute", count)
+
+    assert get.call_count == 0
+    assert len(analysis['asset_risks']) == 200
+    assert len(statements) < 15  # fixed number of queries, not per asset
+    assert elapsed < 3.0
+    first = analysis['asset_risks'][0]['risk_metrics']
+    assert first['current_price'] > 0
+    assert first['concentration_risk'] == 10.0  # 0.5% of the family
+    assert first['volatility'] > 0
+    assert analysis['value_at_risk']['monte_carlo']['1d']['var'] > 0
+
+
+def test_cached_quote_takes_precedence_over_stored_one(db, large_family):
+    family, assets = large_family
+    service = MarketDataService()
+    asset = assets[0]
+    cached = MarketData(symbol="STK0.SA", price=99.0, currency="BRL", change_24h=8.0, change_percent_24h=8.7,
+                        volume=0.0, source="yahoo_finance", timestamp=datetime.now())
+    service.cache.put(service._cache_key("yahoo_finance", "STK0.SA"), "yahoo_finance", cached)
+
+    analysis = service.get_portfolio_risk_analysis(family.id)
+
+    metrics = next(r for r in analysis['asset_risks'] if r['asset_id'] == asset.id)['risk_metrics']
+    assert metrics['current_price'] == 99.0
+    assert metrics['price_change_24h'] == 8.7
+    assert metrics['market_risk'] == 75.0
+
+
+def test_vectorized_scores_match_scalar_helpers():
+    service = MarketDataService()
+    volume = np.array([0.0, 50.0, 200.0, 1000.0, 10.0])
+    value = np.array([100.0, 100.0, 400.0, 500.0, 0.0])
+
+    vectorized = service._liquidity_scores(volume, value)
+
+    assert vectorized.tolist() == [service._calculate_liquidity_score(v, a) for v, a in zip(volume, value)]
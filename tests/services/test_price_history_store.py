@@ -0,0 +1,107 @@
+"""Tests for the columnar price history files"""
+from datetime import date, timedelta
+
+import numpy as np
+import pytest
+
+from app.models.asset import Asset
+from app.models.family import Family
+from app.models.quote_daily_bar import QuoteDailyBar
+from app.services.price_history_store import PriceHistoryStore
+
+
+@pytest.fixture()
+def asset(db):
+    family = Family(name="History Family")
+    db.session.add(family)
+    db.session.commit()
+    asset = Asset(name="PETR4", asset_type="renda_variavel", family_id=family.id)
+    db.session.add(asset)
+    db.session.commit()
+    return asset
+
+
+def add_bars(db, asset, start, count):
+    for i in range(count):
+        price = 10.0 + i
+        db.session.add(QuoteDailyBar(asset_id=asset.id, bar_date=start + timedelta(days=i), open=price,
+                                     high=price + 1, low=price - 1, close=price, currency="BRL", quote_count=1))
+    db.session.commit()
+
+
+def test_export_partitions_by_asset_and_month(db, asset, tmp_path):
+    add_bars(db, asset, date(2024, 1, 20), 20)
+    store = PriceHistoryStore(str(tmp_path))
+
+    result = store.export(since=date(2024, 1, 1))
+
+    assert result == {"partitions": 2, "bars": 20}
+    assert store.months(asset.id) == ["2024-01", "2024-02"]
+    assert (tmp_path / f"asset_id={asset.id}" / "2024-02" / "close.npy").exists()
+
+
+def test_read_memory_maps_a_single_partition(db, asset, tmp_path):
+    add_bars(db, asset, date(2024, 1, 1), 31)
+    store = PriceHistoryStore(str(tmp_path))
+    store.export(since=date(2024, 1, 1))
+
+    data = store.read(asset.id, date(2024, 1, 10), date(2024, 1, 12), columns=("date", "close", "high"))
+
+    assert isinstance(data["close"], np.memmap)
+    assert data["date"].tolist() == [date(2024, 1, 10), date(2024, 1, 11), date(2024, 1, 12)]
+    assert data["close"].tolist() == [19.0, 20.0, 21.0]
+    assert data["high"].tolist() == [20.0, 21.0, 22.0]
+
+
+def test_read_across_months_and_reexport(db, asset, tmp_path):
+    add_bars(db, asset, date(2024, 1, 30), 4)
+    store = PriceHistoryStore(str(tmp_path))
+    store.export(since=date(2024, 1, 1))
+
+    # A late correction rewrites the partition
+    db.session.get(QuoteDailyBar, (asset.id, date(2024, 2, 2))).close = 99.0
+    db.session.commit()
+    store.export(since=date(2024, 2, 1))
+
+    data = store.read(asset.id)
+    assert data["close"].tolist() == [10.0, 11.0, 12.0, 99.0]
+    assert store.read(asset.id, date(2025, 1, 1))["close"].size == 0
+    assert store.read(asset.id + 1)["date"].dtype == np.dtype("datetime64[D]")
+
+    with pytest.raises(ValueError):
+        store.read(asset.id, columns=("volume",))
+
+
+def test_daily_closes_read_final_months_from_the_store(db, asset):
+    from app.services.quote_rollup_service import QuoteRollupService
+    from app.services.risk_math import ReturnMatrix
+
+    add_bars(db, asset, date(2024, 1, 1), 60)
+    # First export backfills every bar
+    assert PriceHistoryStore().export() == {"partitions": 2, "bars": 60}
+    # Exported months are served from the files, later bars from the database
+    db.session.get(QuoteDailyBar, (asset.id, date(2024, 1, 10))).close = 99.0
+    db.session.get(QuoteDailyBar, (asset.id, date(2024, 2, 10))).close = 77.0
+    db.session.commit()
+
+    closes = dict(QuoteRollupService.daily_closes(asset.id, 90, today=date(2024, 3, 5)))
+
+    assert closes[date(2024, 1, 10)] == 19.0
+    assert closes[date(2024, 2, 10)] == 77.0
+    assert len(closes) == 60
+    assert ReturnMatrix.load([asset.id], 90, today=date(2024, 3, 5)).observations.tolist() == [59]
+
+
+def test_retention_prunes_old_partitions(db, asset, monkeypatch):
+    from app.config.config import Config
+    from app.services.quote_rollup_service import QuoteRollupService
+
+    monkeypatch.setattr(Config, "QUOTE_BAR_RETENTION_DAYS", 20)
+    add_bars(db, asset, date(2024, 1, 1), 60)
+    store = PriceHistoryStore()
+    store.export(since=date(2024, 1, 1))
+
+    result = QuoteRollupService.apply_retention(today=date(2024, 3, 5))
+
+    assert result["partitions_removed"] == 1
+    assert store.months(asset.id) == ["2024-02"]
@@ -0,0 +1,112 @@
+"""Tests for recording and replaying provider responses"""
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from app.config.config import Config
+from app.services.market_data_service import MarketDataService
+from app.services.provider_session import (
+    RecordingSession, ReplayMissError, ReplaySession, provider_session
+)
+
+
+@pytest.fixture
+def server():
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            payload = json.dumps({"chart": {"result": [{"meta": {
+                "regularMarketPrice": 30.0, "chartPreviousClose": 29.0, "currency": "BRL"
+            }}]}}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args):
+            pass
+
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_recorded_responses_replay_without_network(server, tmp_path):
+    recorder = RecordingSession(str(tmp_path))
+    live = recorder.get(f"{server}/v8/finance/chart/PETR4.SA", params={"range": "1d", "apikey": "secret"})
+
+    replay = ReplaySession(str(tmp_path))
+    # Same request, different secret: still a hit
+    replayed = replay.get(f"{server}/v8/finance/chart/PETR4.SA", params={"apikey": "other", "range": "1d"})
+
+    assert replayed.status_code == 200
+    assert replayed.json() == live.json()
+    fixtures = [name for _, _, names in os.walk(tmp_path) for name in names]
+    assert len(fixtures) == 1
+    assert "secret" not in open(next(tmp_path.rglob("*.json"))).read()
+
+
+def test_missing_fixture_raises_connection_error(tmp_path):
+    replay = ReplaySession(str(tmp_path))
+
+    with pytest.raises(ReplayMissError):
+        replay.get("https://query1.finance.yahoo.com/v8/finance/chart/VALE3.SA")
+    assert issubclass(ReplayMissError, requests.ConnectionError)
+
+
+def test_seeded_fault_injection_is_reproducible(server, tmp_path):
+    RecordingSession(str(tmp_path)).get(f"{server}/quote")
+
+    def outcomes():
+        replay = ReplaySession(str(tmp_path), error_rate=0.5, seed=7)
+        result = []
+        for _ in range(40):
+            try:
+                replay.get(f"{server}/quote")
+                result.append(True)
+            except requests.ConnectionError:
+                result.append(False)
+        return result
+
+    first = outcomes()
+    assert first == outcomes()
+    assert 0 < first.count(False) < 40
+
+
+def test_market_data_service_replays_quotes(server, tmp_path, monkeypatch):
+    RecordingSession(str(tmp_path)).get(
+        f"{server}/v8/finance/chart/PETR4.SA", params={"range": "1d", "interval": "1d"}
+    )
+    monkeypatch.setattr(Config, "QUOTE_PROVIDER_MODE", "replay")
+    monkeypatch.setattr(Config, "QUOTE_FIXTURES_DIR", str(tmp_path))
+
+    service = MarketDataService()
+    service.yahoo_base = server
+
+    assert isinstance(service.session, ReplaySession)
+    assert service._get_yahoo_quote("PETR4").price == 30.0
+
+
+def test_live_mode_uses_plain_session(monkeypatch):
+    monkeypatch.setattr(Config, "QUOTE_PROVIDER_MODE", "live")
+
+    session = provider_session("FamilyOffice/test")
+
+    assert type(session) is requests.Session
+    assert session.headers["User-Agent"] == "FamilyOffice/test"
+
+
+def test_mock_quotes_are_deterministic_with_seed(monkeypatch):
+    monkeypatch.setattr(Config, "QUOTE_PROVIDER_SEED", 42)
+    service = MarketDataService()
+
+    first = service.get_mock_quote("PETR4")
+    service.get_mock_quote("VALE3")
+
+    assert service.get_mock_quote("PETR4").price == first.price
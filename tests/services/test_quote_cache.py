@@ -0,0 +1,111 @@
+"""Tests for the shared quote cache"""
+import threading
+import time
+
+from app.services.cache_service import QuoteCache
+
+
+def counting_fetch(value="fresh", calls=None, delay=0.0):
+    calls = calls if calls is not None else []
+
+    def fetch():
+        calls.append(1)
+        time.sleep(delay)
+        return value
+    return fetch, calls
+
+
+def test_fresh_entries_are_served_without_fetching():
+    cache = QuoteCache(provider_ttl={"coingecko": 60})
+    fetch, calls = counting_fetch("btc")
+
+    assert cache.get_or_fetch("k", "coingecko", fetch) == "btc"
+    assert cache.get_or_fetch("k", "coingecko", fetch) == "btc"
+    assert len(calls) == 1
+    assert cache.stats["hits"] == 1
+
+
+def test_stale_entry_is_served_and_refreshed_once_in_background():
+    cache = QuoteCache(provider_ttl={"yahoo_finance": 60})
+    cache.put("k", "yahoo_finance", "old")
+    cache._entries["k"]["expires_at"] = time.time() - 1
+
+    release = threading.Event()
+    calls = []
+
+    def slow_fetch():
+        calls.append(1)
+        release.wait(2)
+        return "new"
+
+    started = time.monotonic()
+    assert cache.get_or_fetch("k", "yahoo_finance", slow_fetch) == "old"
+    assert cache.get_or_fetch("k", "yahoo_finance", slow_fetch) == "old"
+    assert time.monotonic() - started < 0.5
+
+    release.set()
+    deadline = time.monotonic() + 2
+    while cache.get_or_fetch("k", "yahoo_finance", slow_fetch) != "new" and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert cache.get_or_fetch("k", "yahoo_finance", slow_fetch) == "new"
+    assert len(calls) == 1
+
+
+def test_failures_are_negatively_cached():
+    cache = QuoteCache(negative_ttl=60)
+    fetch, calls = counting_fetch(None)
+
+    assert cache.get_or_fetch("k", "bacen", fetch) is None
+    assert cache.get_or_fetch("k", "bacen", fetch) is None
+    assert len(calls) == 1
+    assert cache.stats["negative_hits"] == 1
+
+
+def test_failure_keeps_last_good_price():
+    cache = QuoteCache()
+    cache.put("k", "bacen", 5.1)
+    cache.put("k", "bacen", None)
+
+    assert cache.get_or_fetch("k", "bacen", lambda: 9.9) == 5.1
+
+
+def test_cold_miss_serves_fallback_without_waiting():
+    cache = QuoteCache()
+    release = threading.Event()
+
+    def slow_fetch():
+        release.wait(2)
+        return "live"
+
+    started = time.monotonic()
+    assert cache.get_or_fetch("k", "alpha_vantage", slow_fetch, fallback=lambda: "stored") == "stored"
+    assert time.monotonic() - started < 0.5
+    release.set()
+
+
+def test_risk_metrics_use_stored_quote_while_provider_is_slow(db, monkeypatch):
+    from app.models.asset import Asset
+    from app.models.family import Family
+    from app.models.quote_history import QuoteHistory
+    from app.services.market_data_service import MarketDataService
+
+    family = Family(name="Cache Family")
+    db.session.add(family)
+    db.session.commit()
+    asset = Asset(name="PETR4", asset_type="renda_variavel", family_id=family.id, details={"ticker": "PETR4"})
+    db.session.add(asset)
+    db.session.commit()
+    db.session.add(QuoteHistory(asset_id=asset.id, price=38.5, currency="BRL", source="alpha_vantage"))
+    db.session.commit()
+
+    release = threading.Event()
+    monkeypatch.setattr(MarketDataService, "_fetch_provider_quote",
+                        lambda self, provider, symbol: release.wait(2) and None)
+
+    started = time.monotonic()
+    metrics = MarketDataService().get_asset_risk_metrics(asset)
+    release.set()
+
+    assert time.monotonic() - started < 0.5
+    assert metrics["current_price"] == 38.5
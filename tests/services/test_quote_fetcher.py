@@ -0,0 +1,255 @@
+"""Tests for the concurrent quote fetch pipeline"""
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+from unittest.mock import Mock, patch
+
+from app.models.asset import Asset
+from app.models.family import Family
+from app.models.quote_history import QuoteHistory
+from app.services.market_data_service import MarketData, MarketDataService
+from app.services.quote_fetcher import QuoteFetcher
+from app.services.quote_service import QuoteService
+
+
+def test_provider_limits_are_respected():
+    lock = threading.Lock()
+    running = defaultdict(int)
+    peak = defaultdict(int)
+
+    def fetch(provider, symbol):
+        with lock:
+            running[provider] += 1
+            peak[provider] = max(peak[provider], running[provider])
+        time.sleep(0.02)
+        with lock:
+            running[provider] -= 1
+        return {"symbol": symbol}
+
+    jobs = {i: ("coingecko" if i % 2 else "yahoo_finance", f"S{i}") for i in range(20)}
+    fetcher = QuoteFetcher(max_workers=16, deadline=5, provider_limits={"coingecko": 2, "yahoo_finance": 4})
+
+    result = fetcher.fetch_all(jobs, fetch)
+
+    assert len(result.quotes) == 20
+    assert peak["coingecko"] <= 2
+    assert peak["yahoo_finance"] <= 4
+
+
+def test_deadline_drops_slow_calls():
+    def fetch(provider, symbol):
+        if symbol == "SLOW":
+            time.sleep(1)
+        return {"symbol": symbol}
+
+    jobs = {"fast": ("bacen", "USD"), "slow": ("yahoo_finance", "SLOW")}
+    fetcher = QuoteFetcher(max_workers=4, deadline=0.2)
+
+    started = time.monotonic()
+    result = fetcher.fetch_all(jobs, fetch)
+
+    assert time.monotonic() - started < 0.8
+    assert set(result.quotes) == {"fast"}
+    assert result.failed == {"slow": "deadline exceeded"}
+    assert result.timed_out == 1
+
+
+def test_failures_are_reported_per_key():
+    def fetch(provider, symbol):
+        if symbol == "BOOM":
+            raise RuntimeError("provider down")
+        return None if symbol == "NONE" else {"symbol": symbol}
+
+    result = QuoteFetcher(max_workers=2, deadline=5).fetch_all(
+        {1: ("bacen", "USD"), 2: ("bacen", "BOOM"), 3: ("bacen", "NONE")}, fetch
+    )
+
+    assert set(result.quotes) == {1}
+    assert result.failed == {2: "provider down", 3: "no quote"}
+
+
+def test_update_asset_quotes_writes_one_batch(db, monkeypatch):
+    family = Family(name="Quotes Family")
+    db.session.add(family)
+    db.session.commit()
+    assets = [
+        Asset(name="PETR4", asset_type="renda_variavel", family_id=family.id, details={"ticker": "PETR4.SA"}),
+        Asset(name="Bitcoin", asset_type="criptomoeda", family_id=family.id, details={"coin_id": "bitcoin"}),
+        Asset(name="Dólar", asset_type="moeda_estrangeira", family_id=family.id, details={}),
+        Asset(name="Sem ticker", asset_type="renda_variavel", family_id=family.id, details={}),
+    ]
+    db.session.add_all(assets)
+    db.session.commit()
+
+    prices = {"PETR4.SA": 38.5, "bitcoin": 65000.0, "USD": 5.1}
+
+    def fake_fetch(self, provider, symbol):
+        return {"price": prices[symbol], "currency": "BRL", "source": provider, "timestamp": datetime.now()}
+
+    commits = []
+    monkeypatch.setattr(QuoteService, "_fetch_quote", fake_fetch)
+    monkeypatch.setattr(QuoteService, "_fetch_quote_batch",
+                        lambda self, provider, symbols: {s: fake_fetch(self, provider, s) for s in symbols})
+    original_commit = db.session.commit
+    monkeypatch.setattr(db.session, "commit", lambda: commits.append(1) or original_commit())
+
+    result = QuoteService().update_asset_quotes(family.id)
+
+    assert result["updated"] == 3
+    assert result["errors"] == 1
+    assert result["timed_out"] == 0
+    assert len(commits) == 1
+    assert sorted(q.price for q in QuoteHistory.query.all()) == [5.1, 38.5, 65000.0]
+
+
+def test_update_asset_quotes_fetches_each_instrument_once(db, monkeypatch):
+    families = [Family(name=f"Family {i}") for i in range(3)]
+    db.session.add_all(families)
+    db.session.commit()
+    for family in families:
+        db.session.add_all([
+            Asset(name="PETR4", asset_type="renda_variavel", family_id=family.id, details={"ticker": "petr4.sa"}),
+            Asset(name="Dólar", asset_type="moeda_estrangeira", family_id=family.id, details={"currency": "USD"}),
+        ])
+    db.session.commit()
+
+    calls = []
+
+    def fake_fetch(self, provider, symbol):
+        calls.append((provider, symbol))
+        return {"price": 10.0, "currency": "BRL", "source": provider, "timestamp": datetime.now()}
+
+    monkeypatch.setattr(QuoteService, "_fetch_quote", fake_fetch)
+    monkeypatch.setattr(QuoteService, "_fetch_quote_batch",
+                        lambda self, provider, symbols: {s: fake_fetch(self, provider, s) for s in symbols})
+
+    result = QuoteService().update_asset_quotes()
+
+    assert sorted(calls) == [("bacen", "USD"), ("yahoo_finance", "PETR4.SA")]
+    assert result["symbols"] == 2
+    assert result["updated"] == 6
+    assert QuoteHistory.query.count() == 6
+
+
+def test_batched_providers_send_one_request_per_chunk():
+    batches = []
+
+    def batch_fetch(provider, symbols):
+        batches.append((provider, list(symbols)))
+        # The provider silently omits unknown ids
+        return {symbol: {"symbol": symbol} for symbol in symbols if symbol != "unknown"}
+
+    def fetch(provider, symbol):
+        return {"symbol": symbol}
+
+    jobs = {i: ("coingecko", f"coin-{i % 5}") for i in range(12)}
+    jobs["missing"] = ("coingecko", "unknown")
+    jobs["usd"] = ("bacen", "USD")
+
+    result = QuoteFetcher(max_workers=4, deadline=5).fetch_all(
+        jobs, fetch, batch_fetch=batch_fetch, batch_sizes={"coingecko": 4}
+    )
+
+    # 6 unique coin ids -> 2 chunks, plus one single BACEN call
+    assert result.requests == 3
+    assert sorted(len(symbols) for _, symbols in batches) == [2, 4]
+    assert len(result.quotes) == 13
+    assert result.failed == {"missing": "no quote"}
+
+
+def test_coingecko_quotes_map_back_from_one_request():
+    service = QuoteService()
+    response = Mock()
+    response.json.return_value = {
+        "bitcoin": {"usd": 60000.0, "brl": 300000.0},
+        "ethereum": {"usd": 3000.0, "brl": 15000.0},
+    }
+
+    with patch.object(service.session, "get", return_value=response) as mock_get:
+        quotes = service.get_coingecko_quotes(["bitcoin", "ethereum", "dogecoin"])
+
+    mock_get.assert_called_once()
+    assert mock_get.call_args.kwargs["params"]["ids"] == "bitcoin,ethereum,dogecoin"
+    assert set(quotes) == {"bitcoin", "ethereum"}
+    assert quotes["ethereum"]["price_brl"] == 15000.0
+
+
+def test_coingecko_skips_coins_without_prices():
+    service = QuoteService()
+    response = Mock()
+    response.json.return_value = {
+        "bitcoin": {"usd": 60000.0, "brl": 300000.0},
+        "obscure": {"usd": 0.01},
+    }
+
+    with patch.object(service.session, "get", return_value=response):
+        quotes = service.get_coingecko_quotes(["bitcoin", "obscure", "unknown"])
+
+    assert set(quotes) == {"bitcoin"}
+
+
+def test_yahoo_symbols_are_fetched_one_chart_call_each():
+    service = QuoteService()
+
+    def chart(url, params=None, timeout=None):
+        symbol = url.rsplit("/", 1)[-1]
+        response = Mock()
+        response.json.return_value = {"chart": {"result": [
+            {"meta": {"regularMarketPrice": 38.5 if symbol == "PETR4.SA" else 190.0,
+                      "currency": "BRL" if symbol == "PETR4.SA" else "USD"}}
+        ]}}
+        return response
+
+    with patch.object(service.session, "get", side_effect=chart) as mock_get:
+        quotes = service._fetch_quote_batch("yahoo_finance", ["PETR4.SA", "AAPL"])
+
+    assert mock_get.call_count == 2
+    assert all("/v8/finance/chart/" in call.args[0] for call in mock_get.call_args_list)
+    assert quotes["PETR4.SA"]["price"] == 38.5
+    assert quotes["AAPL"]["currency"] == "USD"
+
+
+def test_update_asset_quotes_warms_the_risk_analysis_cache(db, monkeypatch):
+    family = Family(name="Cache Family")
+    db.session.add(family)
+    db.session.commit()
+    asset = Asset(name="PETR4", asset_type="renda_variavel", family_id=family.id, details={"ticker": "petr4"})
+    db.session.add(asset)
+    db.session.commit()
+
+    monkeypatch.setattr(QuoteService, "_fetch_quote", lambda self, provider, symbol: {
+        "price": 38.5, "currency": "BRL", "source": provider, "timestamp": datetime.now()
+    })
+    QuoteService().update_asset_quotes(family.id)
+
+    market = MarketDataService()
+    cached = market.cache.peek(market._cache_key(*MarketDataService.quote_source(asset)))
+    assert isinstance(cached, MarketData)
+    assert (cached.symbol, cached.price, cached.currency) == ("PETR4.SA", 38.5, "BRL")
+
+
+def test_crypto_cache_entry_is_in_brl_whichever_service_writes(db, monkeypatch):
+    family = Family(name="Crypto Family")
+    db.session.add(family)
+    db.session.commit()
+    asset = Asset(name="Bitcoin", asset_type="criptomoeda", family_id=family.id, details={"coin_id": "bitcoin"})
+    db.session.add(asset)
+    db.session.commit()
+    response = Mock()
+    response.json.return_value = {"bitcoin": {"usd": 60000.0, "brl": 300000.0, "usd_24h_change": 1.5}}
+    key = MarketDataService._cache_key(*MarketDataService.quote_source(asset))
+
+    quote_service = QuoteService()
+    with patch.object(quote_service.session, "get", return_value=response):
+        quote_service.update_asset_quotes(family.id)
+    market = MarketDataService()
+    from_quote_service = market.cache.peek(key)
+
+    with patch.object(market.session, "get", return_value=response):
+        market.update_all_asset_quotes(family.id)
+    from_market_service = quote_service.cache.peek(key)
+
+    assert (from_quote_service.price, from_quote_service.currency) == (300000.0, "BRL")
+    assert (from_market_service.price, from_market_service.currency) == (300000.0, "BRL")
+    assert [(q.price, q.currency) for q in QuoteHistory.query.all()] == [(300000.0, "BRL")] * 2
@@ -0,0 +1,91 @@
+"""Tests for daily OHLC rollup and tiered retention of quotes"""
+from datetime import date, datetime
+
+import pytest
+
+from app.config.config import Config
+from app.models.asset import Asset
+from app.models.family import Family
+from app.models.quote_daily_bar import QuoteDailyBar
+from app.models.quote_history import QuoteHistory
+from app.services.quote_rollup_service import QuoteRollupService
+
+
+@pytest.fixture()
+def asset(db):
+    family = Family(name="Rollup Family")
+    db.session.add(family)
+    db.session.commit()
+    asset = Asset(name="PETR4", asset_type="renda_variavel", family_id=family.id)
+    db.session.add(asset)
+    db.session.commit()
+    return asset
+
+
+def add_quotes(db, asset, quotes):
+    for timestamp, price in quotes:
+        db.session.add(QuoteHistory(asset_id=asset.id, price=price, currency="BRL",
+                                    source="yahoo_finance", timestamp=timestamp))
+    db.session.commit()
+
+
+def test_rollup_builds_ohlc_bars_for_finished_days(db, asset):
+    add_quotes(db, asset, [
+        (datetime(2024, 3, 1, 10), 10.0),
+        (datetime(2024, 3, 1, 12), 12.5),
+        (datetime(2024, 3, 1, 11), 9.0),
+        (datetime(2024, 3, 1, 17), 11.0),
+        (datetime(2024, 3, 2, 10), 11.5),
+        # Today: not finished, not rolled up
+        (datetime(2024, 3, 3, 10), 20.0),
+    ])
+
+    result = QuoteRollupService.rollup(until=date(2024, 3, 3))
+
+    assert result == {"bars": 2, "raw_quotes": 5}
+    bar = db.session.get(QuoteDailyBar, (asset.id, date(2024, 3, 1)))
+    assert (bar.open, bar.high, bar.low, bar.close, bar.quote_count) == (10.0, 12.5, 9.0, 11.0, 4)
+
+    # Idempotent: a second run replaces instead of duplicating
+    QuoteRollupService.rollup(until=date(2024, 3, 3))
+    assert QuoteDailyBar.query.count() == 2
+
+
+def test_retention_keeps_history_as_bars(db, asset, monkeypatch):
+    monkeypatch.setattr(Config, "QUOTE_RAW_RETENTION_DAYS", 10)
+    monkeypatch.setattr(Config, "QUOTE_BAR_RETENTION_DAYS", 365)
+    add_quotes(db, asset, [
+        (datetime(2023, 1, 2, 10), 5.0),
+        (datetime(2024, 2, 1, 10), 8.0),
+        (datetime(2024, 2, 1, 15), 9.0),
+        (datetime(2024, 3, 1, 10), 10.0),
+    ])
+    # Bar of a day whose raw quotes are already gone
+    db.session.add(QuoteDailyBar(asset_id=asset.id, bar_date=date(2024, 1, 15), open=7.0, high=7.0,
+                                 low=7.0, close=7.0, currency="BRL", quote_count=1))
+    db.session.commit()
+
+    result = QuoteRollupService.apply_retention(today=date(2024, 3, 5))
+
+    assert result == {"raw_quotes_removed": 3, "daily_bars_removed": 1, "partitions_removed": 0}
+    assert [q.price for q in QuoteHistory.query.all()] == [10.0]
+    assert [bar.bar_date for bar in QuoteDailyBar.query.order_by(QuoteDailyBar.bar_date)] == [
+        date(2024, 1, 15), date(2024, 2, 1), date(2024, 3, 1)
+    ]
+    assert QuoteRollupService.daily_closes(asset.id, 365, today=date(2024, 3, 5)) == [
+        (date(2024, 1, 15), 7.0), (date(2024, 2, 1), 9.0), (date(2024, 3, 1), 10.0)
+    ]
+
+
+def test_daily_closes_include_days_not_rolled_up(db, asset):
+    db.session.add(QuoteDailyBar(asset_id=asset.id, bar_date=date(2024, 3, 1), open=10.0, high=10.0,
+                                 low=10.0, close=10.0, currency="BRL", quote_count=1))
+    add_quotes(db, asset, [
+        (datetime(2024, 3, 1, 10), 10.0),
+        (datetime(2024, 3, 2, 10), 10.5),
+        (datetime(2024, 3, 2, 16), 10.8),
+    ])
+
+    closes = QuoteRollupService.daily_closes(asset.id, 30, today=date(2024, 3, 2))
+
+    assert closes == [(date(2024, 3, 1), 10.0), (date(2024, 3, 2), 10.8)]
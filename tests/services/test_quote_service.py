@@ -104,94 +104,98 @@ class TestQuoteService:
             assert result['currency'] == "USD"
             assert result['source'] == "bacen"
     
-    def test_get_quote_for_asset_renda_variavel(self):
-        """Test quote fetching for renda_variavel asset type"""
-        with patch.object(self.quote_service, 'get_yahoo_finance_quote') as mock_yahoo:
-            mock_yahoo.return_value = {'price': 25.50, 'source': 'yahoo_finance'}
-            
-            result = self.quote_service._get_quote_for_asset(self.mock_asset)
-            
-            assert result is not None
-            mock_yahoo.assert_called_once_with("PETR4")
+    def test_quote_source_for_asset_renda_variavel(self):
+        """Test quote source for renda_variavel asset type (B3 tickers get .SA)"""
+        result = self.quote_service._quote_source_for_asset(self.mock_asset)
+        
+        assert result == ("yahoo_finance", "PETR4.SA")
     
-    def test_get_quote_for_asset_criptomoeda(self):
-        """Test quote fetching for criptomoeda asset type"""
+    def test_quote_source_for_asset_criptomoeda(self):
+        """Test quote source for criptomoeda asset type"""
         self.mock_asset.asset_type = "criptomoeda"
-        self.mock_asset.details = {"coin_id": "bitcoin"}
+        self.mock_asset.details = {"coin_id": "BTC"}
         
-        with patch.object(self.quote_service, 'get_coingecko_quote') as mock_coingecko:
-            mock_coingecko.return_value = {'price_usd': 45000.0, 'source': 'coingecko'}
-            
-            result = self.quote_service._get_quote_for_asset(self.mock_asset)
-            
-            assert result is not None
-            mock_coingecko.assert_called_once_with("bitcoin")
+        result = self.quote_service._quote_source_for_asset(self.mock_asset)
+        
+        assert result == ("coingecko", "bitcoin")
     
-    def test_get_quote_for_asset_moeda_estrangeira(self):
-        """Test quote fetching for moeda_estrangeira asset type"""
+    def test_quote_source_for_asset_moeda_estrangeira(self):
+        """Test quote source for moeda_estrangeira asset type"""
         self.mock_asset.asset_type = "moeda_estrangeira"
-        self.mock_asset.details = {"currency": "EUR"}
+        self.mock_asset.details = {"currency": "eur"}
         
-        with patch.object(self.quote_service, 'get_bacen_quote') as mock_bacen:
-            mock_bacen.return_value = {'rate': 5.5, 'source': 'bacen'}
-            
-            result = self.quote_service._get_quote_for_asset(self.mock_asset)
-            
-            assert result is not None
-            mock_bacen.assert_called_once_with("EUR")
+        result = self.quote_service._quote_source_for_asset(self.mock_asset)
+        
+        assert result == ("bacen", "EUR")
     
-    def test_get_quote_for_asset_unknown_type(self):
-        """Test quote fetching for unknown asset type"""
+    def test_quote_source_for_asset_unknown_type(self):
+        """Test quote source for unknown asset type"""
         self.mock_asset.asset_type = "unknown_type"
         
-        result = self.quote_service._get_quote_for_asset(self.mock_asset)
+        result = self.quote_service._quote_source_for_asset(self.mock_asset)
         
         assert result is None
     
     def test_update_asset_quotes_success(self):
-        """Test successful bulk quote update"""
-        # Mock the Asset class
-        with patch('app.services.quote_service.Asset') as mock_asset_class:
-            # Mock assets
-            mock_assets = [self.mock_asset]
-            mock_asset_class.query.filter_by.return_value.all.return_value = mock_assets
-            
-            with patch.object(self.quote_service, '_get_quote_for_asset') as mock_get_quote:
-                with patch.object(self.quote_service, '_save_quote_history') as mock_save:
-                    mock_get_quote.return_value = {'price': 25.50, 'source': 'yahoo_finance'}
-                    
-                    result = self.quote_service.update_asset_quotes()
-                    
-                    assert result['updated'] == 1
-                    assert result['errors'] == 0
-                    assert result['total'] == 1
-                    mock_save.assert_called_once()
+        """Test bulk quote update: fetched through QuoteFetcher, written through QuoteStore"""
+        with patch('app.services.quote_service.Asset') as mock_asset_class, \
+                patch('app.services.quote_service.QuoteStore') as mock_store_class, \
+                patch.object(self.quote_service.session, 'get') as mock_get:
+            mock_asset_class.query.all.return_value = [self.mock_asset]
+            
+            # Mock the Yahoo chart response for the normalised symbol
+            mock_response = Mock()
+            mock_response.json.return_value = {
+                'chart': {'result': [{'meta': {'regularMarketPrice': 25.50, 'currency': 'BRL'}}]}
+            }
+            mock_get.return_value = mock_response
+            
+            mock_store = mock_store_class.return_value
+            mock_store.flush.return_value = Mock(saved=1, failed=[])
+            
+            result = self.quote_service.update_asset_quotes()
+            
+            assert result['updated'] == 1
+            assert result['errors'] == 0
+            assert result['total'] == 1
+            assert result['requests'] == 1
+            assert "PETR4.SA" in mock_get.call_args[0][0]
+            mock_store.add.assert_called_once()
+            saved = mock_store.add.call_args.kwargs
+            assert saved['asset_id'] == 1
+            assert saved['price'] == 25.50
+            assert saved['currency'] == "BRL"
+            assert saved['source'] == "yahoo_finance"
+            mock_store.flush.assert_called_once()
     
     def test_update_asset_quotes_with_errors(self):
-        """Test bulk quote update with some errors"""
-        # Mock the Asset class
-        with patch('app.services.quote_service.Asset') as mock_asset_class:
-            # Mock assets
-            mock_assets = [self.mock_asset]
-            mock_asset_class.query.filter_by.return_value.all.return_value = mock_assets
-            
-            with patch.object(self.quote_service, '_get_quote_for_asset') as mock_get_quote:
-                mock_get_quote.return_value = None  # Simulate error
-                
-                result = self.quote_service.update_asset_quotes()
-                
-                assert result['updated'] == 0
-                assert result['errors'] == 1
-                assert result['total'] == 1
+        """Test bulk quote update when the provider returns nothing"""
+        with patch('app.services.quote_service.Asset') as mock_asset_class, \
+                patch('app.services.quote_service.QuoteStore') as mock_store_class, \
+                patch.object(self.quote_service.session, 'get') as mock_get:
+            mock_asset_class.query.all.return_value = [self.mock_asset]
+            
+            # Simulate a provider error
+            mock_get.side_effect = Exception("API Error")
+            
+            mock_store = mock_store_class.return_value
+            mock_store.flush.return_value = Mock(saved=0, failed=[])
+            
+            result = self.quote_service.update_asset_quotes()
+            
+            assert result['updated'] == 0
+            assert result['errors'] == 1
+            assert result['total'] == 1
+            mock_store.add.assert_not_called()
     
     def test_get_asset_current_price_success(self):
         """Test getting current asset price"""
-        # Mock the QuoteHistory class
-        with patch('app.services.quote_service.QuoteHistory') as mock_quote_history_class:
+        # Mock the latest_quotes lookup
+        with patch('app.services.quote_service.db') as mock_db:
             # Mock quote
             mock_quote = Mock()
             mock_quote.price = 25.50
-            mock_quote_history_class.query.filter_by.return_value.order_by.return_value.first.return_value = mock_quote
+            mock_db.session.get.return_value = mock_quote
             
             result = self.quote_service.get_asset_current_price(1)
             
@@ -199,9 +203,9 @@ class TestQuoteService:
     
     def test_get_asset_current_price_no_quotes(self):
         """Test getting current asset price when no quotes exist"""
-        # Mock the QuoteHistory class
-        with patch('app.services.quote_service.QuoteHistory') as mock_quote_history_class:
-            mock_quote_history_class.query.filter_by.return_value.order_by.return_value.first.return_value = None
+        # Mock the latest_quotes lookup
+        with patch('app.services.quote_service.db') as mock_db:
+            mock_db.session.get.return_value = None
             
             result = self.quote_service.get_asset_current_price(1)
             
@@ -0,0 +1,66 @@
+"""Tests for bulk quote persistence"""
+from datetime import datetime
+
+from sqlalchemy import event
+
+from app.models.asset import Asset
+from app.models.family import Family
+from app.models.quote_history import QuoteHistory
+from app.services.quote_store import QuoteStore
+
+
+def make_asset(db):
+    family = Family(name="Store Family")
+    db.session.add(family)
+    db.session.commit()
+    asset = Asset(name="PETR4", asset_type="renda_variavel", family_id=family.id)
+    db.session.add(asset)
+    db.session.commit()
+    return asset
+
+
+def test_rows_are_inserted_in_chunks(db):
+    asset = make_asset(db)
+    statements = []
+
+    def count_inserts(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith("INSERT INTO quote_history"):
+            statements.append(executemany)
+
+    event.listen(db.engine, "before_cursor_execute", count_inserts)
+    try:
+        store = QuoteStore(chunk_size=4)
+        for i in range(10):
+            store.add(asset.id, 10.0 + i, "BRL", "yahoo_finance", datetime(2024, 1, 1, 10, i))
+        result = store.flush()
+    finally:
+        event.remove(db.engine, "before_cursor_execute", count_inserts)
+
+    assert result.saved == 10
+    assert result.failed == []
+    assert statements == [True, True, True]
+    assert QuoteHistory.query.count() == 10
+
+
+def test_bad_rows_are_reported_without_aborting_the_batch(db):
+    asset = make_asset(db)
+
+    store = QuoteStore(chunk_size=3)
+    store.add(asset.id, 10.0, "BRL", "yahoo_finance")
+    store.add(asset.id, float("nan"), "BRL", "yahoo_finance")
+    # Rejected by the database (NOT NULL), only detectable on insert
+    store.add(None, 11.0, "BRL", "yahoo_finance")
+    store.add(asset.id, 12.0, "BRL", "yahoo_finance")
+    store.add(asset.id, 13.0, "USDT", "coingecko")
+    result = store.flush()
+
+    assert result.saved == 2
+    assert len(result.failed) == 3
+    assert result.failed[0]["error"] == "invalid price nan"
+    assert sorted(q.price for q in QuoteHistory.query.all()) == [10.0, 12.0]
+
+
+def test_flush_without_rows(db):
+    result = QuoteStore().flush()
+    assert result.saved == 0
+    assert result.failed == []
@@ -0,0 +1,118 @@
+"""Tests for the vectorized risk math"""
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pytest
+
+from app.models.asset import Asset
+from app.models.family import Family
+from app.models.quote_daily_bar import QuoteDailyBar
+from app.models.quote_history import QuoteHistory
+from app.services.market_data_service import MarketDataService
+from app.services.risk_math import (
+    PERIODS_PER_YEAR, ReturnMatrix, default_volatility, portfolio_volatility, volatility_of
+)
+
+START = date(2024, 1, 1)
+
+
+def series(prices, step=1):
+    return [(START + timedelta(days=i * step), price) for i, price in enumerate(prices)]
+
+
+@pytest.fixture
+def complete():
+    rng = np.random.default_rng(3)
+    prices = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, size=(60, 3)), axis=0))
+    closes = {asset_id: series(prices[:, j].tolist()) for j, asset_id in enumerate((7, 3, 5))}
+    returns = np.diff(np.log(prices), axis=0)[:, [1, 2, 0]]  # columns sorted by asset id
+    return ReturnMatrix.from_closes(closes), returns
+
+
+def test_statistics_match_numpy_on_complete_history(complete):
+    matrix, returns = complete
+
+    assert matrix.asset_ids.tolist() == [3, 5, 7]
+    np.testing.assert_allclose(matrix.covariance(), np.cov(returns, rowvar=False) * PERIODS_PER_YEAR)
+    np.testing.assert_allclose(matrix.correlation(), np.corrcoef(returns, rowvar=False))
+    np.testing.assert_allclose(
+        matrix.volatility(), returns.std(axis=0, ddof=1) * np.sqrt(PERIODS_PER_YEAR) * 100
+    )
+
+
+def test_gaps_do_not_create_zero_returns():
+    # Stock closes every other day, crypto every day
+    closes = {1: series([10.0, 11.0, 12.1], step=2), 2: series([1.0, 1.1, 1.0, 1.1, 1.0])}
+
+    matrix = ReturnMatrix.from_closes(closes)
+
+    stock = matrix.returns[:, 0]
+    np.testing.assert_allclose(stock[~np.isnan(stock)], np.log([1.1, 1.1]))
+    assert matrix.observations.tolist() == [2, 4]
+
+
+def test_pairwise_covariance_uses_overlapping_dates():
+    a = [100.0, 101.0, 99.0, 102.0, 103.0, 101.0]
+    b = [50.0, 51.0, 50.5, None, 52.0, 51.0]
+    closes = {1: series(a), 2: [(day, price) for day, price in series(b) if price]}
+
+    cov = ReturnMatrix.from_closes(closes).covariance(annualize=False)
+
+    ra = np.diff(np.log(a))
+    rb_days = [1, 2, 4, 5]
+    rb = np.diff(np.log([50.0, 51.0, 50.5, 52.0, 51.0]))
+    overlap = np.cov(ra[[day - 1 for day in rb_days]], rb)
+    assert cov[0, 1] == pytest.approx(overlap[0, 1])
+    assert cov[1, 1] == pytest.approx(np.var(rb, ddof=1))
+
+
+def test_missing_history_is_nan_and_defaults_are_deterministic():
+    matrix = ReturnMatrix.from_closes({1: series([10.0, 10.5]), 2: series([5.0]), 3: []})
+
+    volatility = matrix.volatility()
+    assert np.isnan(volatility).all()
+    assert np.isnan(matrix.correlation()).all()
+    assert volatility_of(series([10.0])) is None
+    assert default_volatility("criptomoeda") > default_volatility("renda_fixa")
+    assert default_volatility("unknown") == default_volatility("outro")
+
+
+def test_portfolio_volatility_skips_assets_without_history():
+    sigma = np.array([[0.04, 0.0, np.nan], [0.0, 0.09, np.nan], [np.nan, np.nan, np.nan]])
+
+    result = portfolio_volatility(sigma, np.array([0.25, 0.25, 0.5]))
+
+    assert result == pytest.approx(np.sqrt(0.25 * 0.04 + 0.25 * 0.09) * 100)
+    assert portfolio_volatility(np.full((1, 1), np.nan), np.array([1.0])) is None
+
+
+def test_family_analysis_uses_bars_and_raw_quotes(db):
+    family = Family(name="Risk")
+    db.session.add(family)
+    db.session.flush()
+    stock = Asset(name="PETR4", asset_type="renda_variavel", family_id=family.id)
+    bond = Asset(name="Tesouro", asset_type="renda_fixa", family_id=family.id)
+    db.session.add_all([stock, bond])
+    db.session.flush()
+
+    today = date.today()
+    for i, close in enumerate([30.0, 31.0, 30.5, 32.0]):
+        db.session.add(QuoteDailyBar(asset_id=stock.id, bar_date=today - timedelta(days=5 - i),
+                                     open=close, high=close, low=close, close=close, currency="BRL"))
+    db.session.add(QuoteHistory(asset_id=stock.id, price=31.0, currency="BRL", source="test",
+                                timestamp=datetime.combine(today, datetime.min.time())))
+    db.session.commit()
+
+    matrix = ReturnMatrix.load([stock.id, bond.id], days=30)
+    service = MarketDataService()
+
+    assert matrix.observations.tolist() == [4, 0]
+    expected = volatility_of([(today - timedelta(days=5 - i), c) for i, c in enumerate([30.0, 31.0, 30.5, 32.0])]
+                             + [(today, 31.0)])
+    assert service._calculate_volatility(stock.id) == pytest.approx(expected, abs=0.01)
+    assert service._calculate_volatility(bond.id, asset_type="renda_fixa") == default_volatility("renda_fixa")
+
+    analysis = service.get_portfolio_risk_analysis(family.id)
+    correlation = analysis['correlation_matrix']
+    assert correlation['asset_ids'] == sorted([stock.id, bond.id])
+    assert correlation['matrix'][0][0] == 1.0 and correlation['matrix'][1][1] is None
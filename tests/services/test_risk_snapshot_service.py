@@ -0,0 +1,143 @@
+"""Tests for persisted risk snapshots and dirty-family events"""
+from datetime import date, datetime, timedelta
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+
+from app.models.asset import Asset
+from app.models.quote_daily_bar import QuoteDailyBar
+from app.models.risk_snapshot import RiskDirtyFamily, RiskSnapshot
+from app.models.transaction import Transaction
+from app.services.position_service import PositionService
+from app.services.quote_store import QuoteStore
+from app.services.risk_snapshot_service import RiskSnapshotService
+
+
+@pytest.fixture
+def holding(db, family, monkeypatch):
+    monkeypatch.setattr("app.config.config.Config.RISK_MC_PATHS", 2000)
+    asset = Asset(name="PETR4", asset_type="renda_variavel", family_id=family.id, details={"ticker": "PETR4"})
+    db.session.add(asset)
+    db.session.flush()
+    db.session.add(Transaction(asset_id=asset.id, transaction_type="buy", quantity=100,
+                               unit_price=30.0, transaction_date=date(2024, 1, 1)))
+    rng = np.random.default_rng(8)
+    today = date.today()
+    for i, close in enumerate(30 * np.exp(np.cumsum(rng.normal(0, 0.02, 30)))):
+        db.session.add(QuoteDailyBar(asset_id=asset.id, bar_date=today - timedelta(days=30 - i),
+                                     open=close, high=close, low=close, close=float(close), currency="BRL"))
+    db.session.flush()
+    PositionService.rebuild(asset)
+    db.session.commit()
+    return asset
+
+
+def dirty_families(db):
+    return {row.family_id for row in RiskDirtyFamily.query.all()}
+
+
+def test_writes_queue_their_family(db, family, holding):
+    assert dirty_families(db) == {family.id}
+    RiskDirtyFamily.query.delete()
+    db.session.commit()
+
+    holding.name = "PETR4 ON"
+    db.session.commit()
+    assert dirty_families(db) == {family.id}
+    RiskDirtyFamily.query.delete()
+    db.session.commit()
+
+    store = QuoteStore()
+    store.add(holding.id, 31.0, "BRL", "test")
+    store.flush()
+    assert dirty_families(db) == {family.id}
+
+
+def test_refresh_recomputes_only_dirty_families(db, family, holding):
+    service = RiskSnapshotService()
+
+    result = service.refresh_dirty()
+
+    assert result == {'families': 1, 'errors': 0, 'pending': 0}
+    snapshot = RiskSnapshotService.latest(family.id)
+    assert snapshot.total_value > 0
+    assert snapshot.var_1d > 0
+    assert snapshot.analysis['number_of_assets'] == 1
+
+    with patch.object(service.market_data_service, "get_portfolio_risk_analysis") as analyse:
+        assert service.refresh_dirty()['families'] == 0
+    analyse.assert_not_called()
+
+
+def test_change_during_recomputation_keeps_family_queued(db, family, holding):
+    service = RiskSnapshotService()
+    analyse = service.market_data_service.get_portfolio_risk_analysis
+
+    def analyse_while_price_arrives(family_id):
+        RiskDirtyFamily.mark(db.session.connection(), family_ids=[family_id])
+        db.session.get(RiskDirtyFamily, family_id).marked_at = datetime.now() + timedelta(seconds=1)
+        return analyse(family_id)
+
+    with patch.object(service.market_data_service, "get_portfolio_risk_analysis",
+                      side_effect=analyse_while_price_arrives):
+        service.compute(family.id)
+
+    assert dirty_families(db) == {family.id}
+
+
+def test_only_newest_snapshot_keeps_the_analysis(db, family, holding):
+    service = RiskSnapshotService()
+
+    first = service.compute(family.id)
+    second = service.compute(family.id)
+
+    db.session.refresh(first)
+    assert first.analysis is None
+    assert second.analysis is not None
+    points = RiskSnapshotService.history(family.id, days=1)
+    assert [point['computed_at'] for point in points] == [first.computed_at.isoformat(),
+                                                          second.computed_at.isoformat()]
+
+
+def test_retention_keeps_latest_snapshot(db, family, holding):
+    service = RiskSnapshotService()
+    old = service.compute(family.id)
+    old.computed_at = datetime.now() - timedelta(days=400)
+    db.session.commit()
+
+    assert RiskSnapshotService.apply_retention() == 0
+    newer = service.compute(family.id)
+    newer.computed_at = datetime.now() - timedelta(days=390)
+    db.session.commit()
+
+    assert RiskSnapshotService.apply_retention() == 1
+    assert RiskSnapshot.query.count() == 1
+
+
+def test_portfolio_risk_serves_the_stored_snapshot(client, db, headers, family, holding):
+    response = client.get(f"/risk/portfolio/risk?family_id={family.id}", headers=headers)
+    assert response.status_code == 200
+    first = response.get_json()
+    assert first['snapshot_at']
+    assert first['stale'] is False
+
+    with patch("app.services.market_data_service.MarketDataService.get_portfolio_risk_analysis") as analyse:
+        again = client.get(f"/risk/portfolio/risk?family_id={family.id}", headers=headers).get_json()
+    analyse.assert_not_called()
+    assert again['snapshot_at'] == first['snapshot_at']
+
+    history = client.get(f"/risk/portfolio/risk/history?family_id={family.id}", headers=headers)
+    assert history.status_code == 200
+    assert len(history.get_json()['points']) == 1
+
+
+def test_trigger_recomputes_and_summary_reports_snapshot(client, db, headers, family, holding):
+    response = client.post(f"/families/{family.id}/risk/trigger", headers=headers)
+
+    assert response.status_code == 200
+    assert response.get_json()['snapshot']['total_value'] > 0
+    assert dirty_families(db) == set()
+    summary = client.get(f"/families/{family.id}/risk/summary", headers=headers).get_json()
+    assert summary['snapshot']['var_1d'] == response.get_json()['snapshot']['var_1d']
+    assert summary['snapshot']['stale'] is False
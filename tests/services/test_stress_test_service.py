@@ -0,0 +1,110 @@
+"""Tests for the batched scenario stress test"""
+from datetime import date, datetime
+
+import pytest
+from sqlalchemy import insert
+
+from app.models.asset import Asset
+from app.models.family import Family
+from app.models.latest_quote import LatestQuote
+from app.models.suitability import SuitabilityProfile
+from app.models.transaction import Transaction
+from app.services.position_service import PositionService
+from app.services.stress_test_service import StressScenario, StressTestService
+
+CRISIS = {"name": "crise", "asset_type": {"renda_variavel": -20}, "currency": {"BRL": -10}, "rate_bp": 200}
+
+
+def hold(db, family, name, asset_type, quantity, unit_price, details, price=None):
+    asset = Asset(name=name, asset_type=asset_type, family_id=family.id, details=details)
+    db.session.add(asset)
+    db.session.flush()
+    db.session.add(Transaction(asset_id=asset.id, transaction_type="buy", quantity=quantity,
+                               unit_price=unit_price, transaction_date=date(2024, 1, 1)))
+    db.session.flush()
+    PositionService.rebuild(asset)
+    if price is not None:
+        db.session.execute(insert(LatestQuote), [{'asset_id': asset.id, 'price': price, 'currency': 'BRL',
+                                                  'source': 'test', 'timestamp': datetime.now()}])
+    return asset
+
+
+@pytest.fixture
+def fleet(db, family):
+    equities = family
+    hedged = Family(name="Hedged")
+    db.session.add(hedged)
+    db.session.flush()
+    maturity = date(date.today().year + 5, date.today().month, 1).isoformat()
+
+    hold(db, equities, "PETR4", "renda_variavel", 100, 8.0, {"ticker": "PETR4"}, price=10.0)
+    hold(db, equities, "VALE3", "renda_variavel", 100, 10.0, {"ticker": "VALE3.SA"}, price=10.0)
+    hold(db, equities, "Prefixado", "renda_fixa", 1, 2000.0, {"indexador": "prefixado", "vencimento": maturity})
+    hold(db, hedged, "Dólar", "moeda_estrangeira", 200, 5.0, {"currency": "USD"}, price=5.0)
+    hold(db, hedged, "CDB", "renda_fixa", 1, 1000.0, {"indexador": "CDI", "vencimento": maturity})
+    db.session.commit()
+    return equities, hedged
+
+
+def by_family(scenario):
+    return {row['family_id']: row for row in scenario['families']}
+
+
+def test_scenario_is_applied_to_every_family_in_one_pass(db, fleet):
+    equities, hedged = fleet
+
+    result = StressTestService.run([StressScenario.from_dict(CRISIS)])
+
+    assert result['families'] == 2 and result['assets'] == 5
+    rows = by_family(result['scenarios'][0])
+    # Stocks -20% of 2000, 5y fixed-rate bond ~-10% of 2000
+    assert rows[equities.id]['value'] == 4000.0
+    assert rows[equities.id]['pnl'] == pytest.approx(-400 - 2000 * 0.02 * 5, rel=0.02)
+    assert rows[equities.id]['breach'] is True
+    # Weaker real lifts the dollar holding; the CDI bond does not move
+    assert rows[hedged.id]['pnl'] == pytest.approx(1000 / 0.9 - 1000, abs=0.01)
+    assert rows[hedged.id]['breach'] is False
+    assert result['scenarios'][0]['breaches'] == [equities.id]
+
+
+def test_instrument_shock_overrides_asset_type(db, fleet):
+    equities, _ = fleet
+    scenario = StressScenario.from_dict({"asset_type": {"renda_variavel": -10}, "instrument": {"vale3": 50}})
+
+    result = StressTestService.run([scenario], family_ids=[equities.id])
+
+    assert result['scenarios'][0]['name'] == "cenario_1"
+    assert result['scenarios'][0]['families'][0]['pnl'] == pytest.approx(-100 + 500)
+
+
+def test_limits_follow_suitability_unless_given(db, user, fleet):
+    equities, hedged = fleet
+    db.session.add(SuitabilityProfile(user_id=user.id, family_id=hedged.id, risk_tolerance="conservative",
+                                      investment_horizon="short_term", liquidity_needs="high",
+                                      investment_experience="beginner", primary_goal="capital_preservation"))
+    db.session.commit()
+    scenario = StressScenario.from_dict({"currency": {"USD": -12}})
+
+    profiled = by_family(StressTestService.run([scenario])['scenarios'][0])
+    explicit = StressTestService.run([scenario], max_loss_pct=8, only_breaches=True)['scenarios'][0]
+
+    assert profiled[hedged.id]['loss_limit_pct'] == 5.0
+    assert profiled[hedged.id]['pnl_pct'] == pytest.approx(-6.0)
+    assert profiled[hedged.id]['breach'] is True
+    assert profiled[equities.id]['loss_limit_pct'] == 10.0
+    assert explicit['families'] == [] and explicit['breaches'] == []
+
+
+def test_stress_endpoint_is_scoped_to_the_users_families(client, db, headers, fleet):
+    equities, hedged = fleet
+
+    response = client.post("/risk/stress", json={"scenarios": [CRISIS]}, headers=headers)
+    assert response.status_code == 200
+    assert [row['family_id'] for row in response.get_json()['scenarios'][0]['families']] == [equities.id]
+
+    forbidden = client.post("/risk/stress", json={"scenarios": [CRISIS], "family_ids": [hedged.id]}, headers=headers)
+    assert forbidden.status_code == 403
+
+    invalid = client.post("/risk/stress", json={"scenarios": [{"asset_type": {"renda_variavel": -150}}]},
+                          headers=headers)
+    assert invalid.status_code == 400
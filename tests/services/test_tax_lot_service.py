@@ -0,0 +1,105 @@
+"""Tests for the FIFO tax lot engine"""
+from datetime import date
+from types import SimpleNamespace
+
+import pytest
+
+from app.services.tax_lot_service import TaxLotService
+
+
+def make_transaction(id, transaction_type, quantity, unit_price, transaction_date):
+    return SimpleNamespace(
+        id=id,
+        transaction_type=transaction_type,
+        quantity=quantity,
+        unit_price=unit_price,
+        total_value=round(quantity * unit_price, 2),
+        transaction_date=transaction_date
+    )
+
+
+class TestTaxLotService:
+    """Test TaxLotService.process"""
+
+    def test_partial_sell_consumes_oldest_lot(self):
+        report = TaxLotService.process([
+            make_transaction(1, "buy", 100.0, 10.0, date(2024, 1, 1)),
+            make_transaction(2, "buy", 50.0, 12.0, date(2024, 2, 1)),
+            make_transaction(3, "sell", 30.0, 15.0, date(2024, 3, 1)),
+        ])
+
+        assert report.quantity == 120.0
+        assert report.cost_basis == pytest.approx(1300.0)
+        assert report.average_cost == pytest.approx(1300.0 / 120.0)
+        assert report.total_invested == 1600.0
+        assert report.total_divested == 450.0
+        assert [(lot.transaction_id, lot.quantity) for lot in report.open_lots] == [(1, 70.0), (2, 50.0)]
+
+        sale = report.realized_sales[0]
+        assert sale.cost_basis == pytest.approx(300.0)
+        assert sale.gain_loss == pytest.approx(150.0)
+
+    def test_consecutive_sells_do_not_reuse_consumed_lots(self):
+        report = TaxLotService.process([
+            make_transaction(1, "buy", 10.0, 10.0, date(2024, 1, 1)),
+            make_transaction(2, "buy", 10.0, 20.0, date(2024, 1, 2)),
+            make_transaction(3, "sell", 10.0, 25.0, date(2024, 2, 1)),
+            make_transaction(4, "sell", 10.0, 25.0, date(2024, 3, 1)),
+        ])
+
+        first, second = report.realized_sales
+        assert first.cost_basis == pytest.approx(100.0)
+        # The second sell is matched against the 20.00 lot, not the consumed one
+        assert second.cost_basis == pytest.approx(200.0)
+        assert report.realized_gain_loss == pytest.approx(200.0)
+        assert report.quantity == 0.0
+        assert report.cost_basis == 0.0
+        assert report.open_lots == []
+
+    def test_ledger_order_is_chronological(self):
+        report = TaxLotService.process([
+            make_transaction(3, "sell", 5.0, 30.0, date(2024, 6, 1)),
+            make_transaction(2, "buy", 5.0, 20.0, date(2024, 3, 1)),
+            make_transaction(1, "buy", 5.0, 10.0, date(2024, 1, 1)),
+        ])
+
+        assert report.realized_sales[0].cost_basis == pytest.approx(50.0)
+        assert report.open_lots[0].unit_price == 20.0
+        assert report.last_transaction_date == date(2024, 6, 1)
+
+    def test_sell_without_lots_is_reported_as_unmatched(self):
+        report = TaxLotService.process([
+            make_transaction(1, "sell", 5.0, 10.0, date(2024, 1, 1)),
+        ])
+
+        sale = report.realized_sales[0]
+        assert sale.unmatched_quantity == 5.0
+        assert sale.cost_basis == 0.0
+
+    def test_unrealized_and_realized_between(self):
+        report = TaxLotService.process([
+            make_transaction(1, "buy", 10.0, 10.0, date(2023, 6, 1)),
+            make_transaction(2, "sell", 4.0, 15.0, date(2023, 12, 1)),
+            make_transaction(3, "sell", 2.0, 8.0, date(2024, 2, 1)),
+        ])
+
+        assert report.unrealized_gain_loss(12.0) == pytest.approx(8.0)
+        assert report.unrealized_gain_loss(None) == 0.0
+
+        sales_2024 = report.realized_between(date(2024, 1, 1), date(2024, 12, 31))
+        assert len(sales_2024) == 1
+        assert sales_2024[0].gain_loss == pytest.approx(-4.0)
+
+    def test_snapshots_are_end_of_day(self):
+        report = TaxLotService.process([
+            make_transaction(1, "buy", 10.0, 10.0, date(2024, 1, 1)),
+            make_transaction(2, "buy", 10.0, 20.0, date(2024, 1, 1)),
+            make_transaction(3, "sell", 15.0, 30.0, date(2024, 3, 1)),
+        ])
+
+        assert [snapshot.as_of for snapshot in report.snapshots] == [date(2024, 1, 1), date(2024, 3, 1)]
+        assert report.snapshot_on(date(2023, 12, 31)) is None
+        assert report.snapshot_on(date(2024, 2, 1)).quantity == 20.0
+        march = report.snapshot_on(date(2024, 12, 31))
+        assert march.cost_basis == pytest.approx(100.0)
+        assert march.realized_gain_loss == pytest.approx(450.0 - 200.0)
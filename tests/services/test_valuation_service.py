@@ -0,0 +1,101 @@
+"""Tests for the vectorized valuation engine"""
+from datetime import date, datetime
+
+import numpy as np
+import pytest
+
+from app.models.asset import Asset
+from app.models.family import Family
+from app.models.quote_history import QuoteHistory
+from app.models.transaction import Transaction
+from app.services.position_service import PositionService
+from app.services.valuation_service import ValuationService
+
+
+def add_holding(db, family, name, asset_type, quantity, unit_price, details=None):
+    asset = Asset(name=name, asset_type=asset_type, family_id=family.id, details=details or {})
+    db.session.add(asset)
+    db.session.flush()
+    db.session.add(Transaction(asset_id=asset.id, transaction_type="buy", quantity=quantity,
+                               unit_price=unit_price, transaction_date=date(2024, 1, 1)))
+    db.session.flush()
+    PositionService.rebuild(asset)
+    return asset
+
+
+def add_quote(db, asset, price, currency, timestamp):
+    db.session.add(QuoteHistory(asset_id=asset.id, price=price, currency=currency,
+                                source="test", timestamp=timestamp))
+
+
+@pytest.fixture()
+def portfolios(db):
+    first = Family(name="First")
+    second = Family(name="Second")
+    db.session.add_all([first, second])
+    db.session.flush()
+
+    stock = add_holding(db, first, "PETR4", "renda_variavel", 100.0, 10.0, {"ticker": "PETR4"})
+    us_stock = add_holding(db, first, "AAPL", "renda_variavel", 10.0, 500.0, {"ticker": "AAPL"})
+    dollar = add_holding(db, first, "Dólar", "moeda_estrangeira", 1000.0, 4.8, {"currency": "USD"})
+    bond = add_holding(db, first, "CDB", "renda_fixa", 1.0, 2000.0)
+    other = add_holding(db, second, "VALE3", "renda_variavel", 10.0, 60.0, {"ticker": "VALE3"})
+
+    add_quote(db, stock, 11.0, "BRL", datetime(2024, 1, 1, 10))
+    add_quote(db, stock, 12.0, "BRL", datetime(2024, 1, 2, 10))
+    add_quote(db, us_stock, 110.0, "USD", datetime(2024, 1, 2, 10))
+    add_quote(db, dollar, 5.0, "USD", datetime(2024, 1, 2, 10))
+    add_quote(db, other, 70.0, "BRL", datetime(2024, 1, 2, 10))
+    db.session.commit()
+    return {"first": first, "second": second, "stock": stock, "bond": bond}
+
+
+class TestValuationService:
+    """Test ValuationService.load and PortfolioValuation"""
+
+    def test_market_value_uses_latest_price_and_fx(self, db, portfolios):
+        valuation = ValuationService.load([portfolios["first"].id])
+
+        values = dict(zip(valuation.asset_ids.tolist(), valuation.market_value.tolist()))
+        assert values[portfolios["stock"].id] == pytest.approx(1200.0)
+        # Unpriced assets are carried at cost
+        assert values[portfolios["bond"].id] == pytest.approx(2000.0)
+
+        # 1200 + 10 * 110 USD * 5.0 + 1000 USD * 5.0 + 2000
+        assert valuation.total_value() == pytest.approx(13700.0)
+        assert valuation.total_cost() == pytest.approx(12800.0)
+        assert valuation.total_pnl() == pytest.approx(900.0)
+        assert valuation.weights.sum() == pytest.approx(1.0)
+
+    def test_allocation_by_class(self, db, portfolios):
+        valuation = ValuationService.load([portfolios["first"].id])
+
+        assert valuation.allocation() == {
+            "moeda_estrangeira": 5000.0,
+            "renda_fixa": 2000.0,
+            "renda_variavel": 6700.0
+        }
+        assert valuation.type_counts() == {"moeda_estrangeira": 1, "renda_fixa": 1, "renda_variavel": 2}
+
+    def test_multi_family_load_keeps_families_apart(self, db, portfolios):
+        valuation = ValuationService.load()
+        first_id, second_id = portfolios["first"].id, portfolios["second"].id
+
+        assert valuation.family_totals() == {first_id: 13700.0, second_id: 700.0}
+        assert valuation.allocation(second_id) == {"renda_variavel": 700.0}
+        second_weights = valuation.weights[valuation.family_ids == second_id]
+        assert np.allclose(second_weights, [1.0])
+
+        result = ValuationService.revalue_all_families()
+        assert result["families"] == 2
+        assert result["total_market_value"] == pytest.approx(14400.0)
+
+    def test_empty_family(self, db):
+        family = Family(name="Empty")
+        db.session.add(family)
+        db.session.commit()
+
+        valuation = ValuationService.load([family.id])
+        assert len(valuation) == 0
+        assert valuation.total_value() == 0.0
+        assert valuation.allocation() == {}
@@ -0,0 +1,129 @@
+"""Tests for the VaR/CVaR engine"""
+from datetime import date, timedelta
+
+import numpy as np
+import pytest
+
+from app.models.asset import Asset
+from app.models.quote_daily_bar import QuoteDailyBar
+from app.models.transaction import Transaction
+from app.services.position_service import PositionService
+from app.services.risk_math import ReturnMatrix
+from app.services.var_engine import VaREngine, cholesky_factor, shutdown_pool, tail_measures
+
+START = date(2024, 1, 1)
+
+
+def matrix_from_returns(returns):
+    """ReturnMatrix whose daily log returns are exactly ``returns`` (T × N)"""
+    prices = 100 * np.exp(np.vstack([np.zeros(returns.shape[1]), np.cumsum(returns, axis=0)]))
+    return ReturnMatrix.from_closes({
+        j + 1: [(START + timedelta(days=t), float(p)) for t, p in enumerate(prices[:, j])]
+        for j in range(returns.shape[1])
+    })
+
+
+def test_monte_carlo_matches_closed_form_for_one_asset():
+    sigma = 0.02
+    rng = np.random.default_rng(1)
+    returns = rng.normal(0, sigma, size=(500, 1))
+    matrix = matrix_from_returns(returns)
+    estimated = float(np.std(returns, ddof=1))
+
+    result = VaREngine(confidence=0.95, horizons=[1, 10], paths=50_000, seed=3).compute(
+        matrix, [1], np.array([1000.0])
+    )
+
+    for horizon in (1, 10):
+        expected = 1000.0 * -np.expm1(-1.6449 * estimated * np.sqrt(horizon))
+        measures = result['monte_carlo'][f"{horizon}d"]
+        assert measures['var'] == pytest.approx(expected, rel=0.03)
+        assert measures['cvar'] > measures['var']
+    assert result['historical']['10d']['var'] == pytest.approx(result['historical']['1d']['var'] * np.sqrt(10), rel=0.01)
+
+
+def test_diversification_lowers_var():
+    rng = np.random.default_rng(2)
+    base = rng.normal(0, 0.02, size=(250, 1))
+    together = matrix_from_returns(np.hstack([base, base]))
+    hedged = matrix_from_returns(np.hstack([base, -base]))
+    engine = VaREngine(horizons=[1], paths=20_000, seed=1)
+    values = np.array([500.0, 500.0])
+
+    correlated = engine.compute(together, [1, 2], values)
+    offset = engine.compute(hedged, [1, 2], values)
+
+    assert offset['monte_carlo']['1d']['var'] < correlated['monte_carlo']['1d']['var'] / 5
+    assert offset['historical']['1d']['var'] < correlated['historical']['1d']['var'] / 5
+
+
+def test_historical_var_is_the_loss_quantile():
+    losses = np.arange(1.0, 101.0)
+
+    measures = tail_measures(losses, 0.95)
+
+    assert measures['var'] == pytest.approx(np.quantile(losses, 0.95))
+    assert measures['cvar'] == pytest.approx(losses[losses >= measures['var']].mean())
+
+
+def test_short_or_missing_history_is_reported_as_none():
+    matrix = ReturnMatrix.from_closes({1: [(START, 10.0), (START + timedelta(days=1), 10.5)], 2: []})
+
+    result = VaREngine(paths=1000).compute(matrix, [2, 1], np.array([100.0, 50.0]))
+
+    assert result['historical'] is None
+    assert result['monte_carlo'] is None
+    assert result['covered_value'] == 0.0
+
+
+def test_non_positive_definite_covariance_still_factorizes():
+    covariance = np.array([[1.0, 0.9, 0.0], [0.9, 1.0, 0.9], [0.0, 0.9, 1.0]])
+
+    factor = cholesky_factor(covariance)
+
+    eigenvalues = np.linalg.eigvalsh(covariance)
+    assert eigenvalues.min() < 0
+    assert np.allclose(factor @ factor.T, covariance, atol=-eigenvalues.min() + 1e-9)
+
+
+def test_pool_results_match_inline_run(monkeypatch):
+    rng = np.random.default_rng(4)
+    matrix = matrix_from_returns(rng.normal(0, 0.01, size=(100, 3)))
+    values = np.array([100.0, 200.0, 300.0])
+    engine = VaREngine(horizons=[1, 10], paths=25_000, seed=9)
+
+    monkeypatch.setattr("app.config.config.Config.RISK_MC_WORKERS", 1)
+    inline = engine.compute(matrix, [1, 2, 3], values)
+    monkeypatch.setattr("app.config.config.Config.RISK_MC_WORKERS", 2)
+    try:
+        pooled = engine.compute(matrix, [1, 2, 3], values)
+    finally:
+        shutdown_pool()
+
+    assert pooled == inline
+
+
+def test_portfolio_risk_endpoint_reports_var(client, db, headers, family, monkeypatch):
+    monkeypatch.setattr("app.config.config.Config.RISK_MC_PATHS", 5000)
+    asset = Asset(name="PETR4", asset_type="renda_variavel", family_id=family.id)
+    db.session.add(asset)
+    db.session.flush()
+    db.session.add(Transaction(asset_id=asset.id, transaction_type="buy", quantity=100,
+                               unit_price=30.0, transaction_date=date(2024, 1, 1)))
+    rng = np.random.default_rng(5)
+    today = date.today()
+    for i, close in enumerate(30 * np.exp(np.cumsum(rng.normal(0, 0.02, 40)))):
+        db.session.add(QuoteDailyBar(asset_id=asset.id, bar_date=today - timedelta(days=40 - i),
+                                     open=close, high=close, low=close, close=float(close), currency="BRL"))
+    db.session.flush()
+    PositionService.rebuild(asset)
+    db.session.commit()
+
+    response = client.get(f"/risk/portfolio/risk?family_id={family.id}", headers=headers)
+
+    assert response.status_code == 200
+    var = response.get_json()['value_at_risk']
+    assert var['confidence'] == 0.95
+    assert var['monte_carlo']['paths'] == 5000
+    assert 0 < var['monte_carlo']['1d']['var'] < var['monte_carlo']['10d']['var']
+    assert var['historical']['1d']['var'] > 0
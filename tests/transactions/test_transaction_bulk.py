@@ -0,0 +1,141 @@
+"""Tests for the bulk transaction import endpoint"""
+import io
+import json
+
+import pytest
+from flask_jwt_extended import create_access_token
+
+from app.models.asset import Asset
+from app.models.asset_position import AssetPosition
+from app.models.family import Family
+from app.models.transaction import Transaction
+from app.models.user import User
+from app.services import transaction_import_service
+
+
+@pytest.fixture()
+def setup_data(db):
+    user = User(email="bulk@example.com")
+    user.set_password("password123")
+    family = Family(name="Bulk Family", cash_balance=10000.0)
+    other_family = Family(name="Other Family", cash_balance=10000.0)
+    user.families.append(family)
+    db.session.add_all([user, family, other_family])
+    db.session.commit()
+
+    stock = Asset(name="PETR4", asset_type="renda_variavel", family_id=family.id)
+    bond = Asset(name="CDB", asset_type="renda_fixa", family_id=family.id)
+    foreign = Asset(name="VALE3", asset_type="renda_variavel", family_id=other_family.id)
+    db.session.add_all([stock, bond, foreign])
+    db.session.commit()
+
+    token = create_access_token(identity=str(user.id))
+    return {
+        "family": family,
+        "stock": stock,
+        "bond": bond,
+        "foreign": foreign,
+        "headers": {"Authorization": f"Bearer {token}"}
+    }
+
+
+def post_bulk(client, headers, payload):
+    return client.post("/transactions/bulk", data=json.dumps(payload), headers=headers,
+                       content_type="application/json")
+
+
+class TestBulkTransactions:
+    """Test POST /transactions/bulk"""
+
+    def test_json_import_applies_cash_and_positions_once(self, client, db, setup_data, monkeypatch):
+        stock, bond = setup_data["stock"], setup_data["bond"]
+        monkeypatch.setattr(transaction_import_service, "BULK_INSERT_CHUNK_SIZE", 2)
+
+        response = post_bulk(client, setup_data["headers"], [
+            # Out of order on purpose: the sell is validated after both buys
+            {"asset_id": stock.id, "transaction_type": "sell", "quantity": 5.0, "unit_price": 30.0,
+             "transaction_date": "2024-03-01"},
+            {"asset_id": stock.id, "transaction_type": "buy", "quantity": 10.0, "unit_price": 10.0,
+             "transaction_date": "2024-01-01"},
+            {"asset_id": stock.id, "transaction_type": "buy", "quantity": 10.0, "unit_price": 20.0,
+             "transaction_date": "2024-02-01"},
+            {"asset_id": bond.id, "transaction_type": "buy", "quantity": 1.0, "unit_price": 1000.0,
+             "transaction_date": "2024-01-05"},
+        ])
+        data = json.loads(response.data)
+
+        assert response.status_code == 201
+        assert data["imported"] == 4
+        assert data["assets_updated"] == 2
+        # -100 - 200 - 1000 + 150
+        assert data["cash_delta"] == {str(setup_data["family"].id): -1150.0}
+
+        assert Transaction.query.count() == 4
+        assert db.session.get(Family, setup_data["family"].id).cash_balance == 8850.0
+        position = db.session.get(AssetPosition, stock.id)
+        assert position.quantity == 15.0
+        assert position.realized_gain_loss == pytest.approx(100.0)
+
+    def test_errors_are_reported_per_row_and_nothing_is_written(self, client, db, setup_data):
+        stock = setup_data["stock"]
+
+        response = post_bulk(client, setup_data["headers"], {"transactions": [
+            {"asset_id": stock.id, "transaction_type": "buy", "quantity": 10.0, "unit_price": 10.0,
+             "transaction_date": "2024-01-01"},
+            {"asset_id": stock.id, "transaction_type": "sell", "quantity": 50.0, "unit_price": 10.0,
+             "transaction_date": "2024-01-02"},
+            {"asset_id": stock.id, "transaction_type": "hold", "quantity": 1.0, "unit_price": 1.0},
+            {"asset_id": setup_data["foreign"].id, "transaction_type": "buy", "quantity": 1.0,
+             "unit_price": 1.0},
+            {"asset_id": 9999, "transaction_type": "buy", "quantity": 1.0, "unit_price": 1.0},
+            {"asset_id": stock.id, "transaction_type": "buy", "quantity": 1.0, "unit_price": 20000.0,
+             "transaction_date": "2024-01-03"},
+        ]})
+        data = json.loads(response.data)
+
+        assert response.status_code == 400
+        assert data["imported"] == 0
+        assert [error["row"] for error in data["errors"]] == [2, 3, 4, 5, 6]
+        assert "transaction_type" in data["errors"][1]["errors"]
+        assert data["errors"][0]["errors"]["quantity"] == ["Cannot sell more than current quantity"]
+
+        assert Transaction.query.count() == 0
+        assert db.session.get(Family, setup_data["family"].id).cash_balance == 10000.0
+
+    def test_csv_upload(self, client, db, setup_data):
+        stock = setup_data["stock"]
+        content = (
+            "asset_id,transaction_type,quantity,unit_price,transaction_date,description\n"
+            f"{stock.id},buy,10,10.5,2024-01-01,Carga inicial\n"
+            f"{stock.id},sell,4,12,2024-02-01,\n"
+        )
+
+        response = client.post(
+            "/transactions/bulk",
+            data={"file": (io.BytesIO(content.encode("utf-8")), "trades.csv")},
+            headers=setup_data["headers"],
+            content_type="multipart/form-data"
+        )
+        data = json.loads(response.data)
+
+        assert response.status_code == 201
+        assert data["imported"] == 2
+        assert stock.current_quantity == 6.0
+        assert Transaction.query.filter_by(description="Carga inicial").count() == 1
+
+    def test_raw_csv_body(self, client, db, setup_data):
+        stock = setup_data["stock"]
+        content = f"asset_id,transaction_type,quantity,unit_price\n{stock.id},buy,1,100\n"
+
+        response = client.post("/transactions/bulk", data=content, headers=setup_data["headers"],
+                               content_type="text/csv")
+
+        assert response.status_code == 201
+        assert json.loads(response.data)["imported"] == 1
+
+    def test_invalid_payload(self, client, db, setup_data):
+        response = post_bulk(client, setup_data["headers"], {"asset_id": 1})
+        assert response.status_code == 400
+
+        response = post_bulk(client, setup_data["headers"], [])
+        assert response.status_code == 400
@@ -254,10 +254,7 @@ class TestAssetWithTransactions:
         assert current_quantity == 120.0
         # Average cost: Using FIFO, sold 30 from first buy at $10, remaining 70 at $10 + 50 at $12
         # Average = (70*10 + 50*12) / 120 = (700 + 600) / 120 = 1300 / 120 = 10.83 (rounded)
-        # But our algorithm uses remaining from first purchase: (70*10 + 50*12) / 120 = 10.83
-        # Actually, let's check what the algorithm is doing
-        print(f"Debug - Average cost: {average_cost}")  # Temporary debug
-        assert round(average_cost, 2) == 10.33  # Adjust based on actual calculation
+        assert round(average_cost, 2) == 10.83
     
     def test_asset_current_value_no_transactions(self, db):
         """Test asset current value when no transactions exist"""
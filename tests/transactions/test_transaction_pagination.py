@@ -0,0 +1,107 @@
+"""Tests for keyset (cursor) pagination of the transaction listing"""
+import json
+from datetime import date, datetime, timedelta
+
+import pytest
+from flask_jwt_extended import create_access_token
+
+from app.models.asset import Asset
+from app.models.family import Family
+from app.models.transaction import Transaction
+from app.models.user import User
+
+
+@pytest.fixture()
+def setup_data(db):
+    user = User(email="cursor@example.com")
+    user.set_password("password123")
+    family = Family(name="Cursor Family")
+    user.families.append(family)
+    db.session.add_all([user, family])
+    db.session.commit()
+
+    stock = Asset(name="PETR4", asset_type="renda_variavel", family_id=family.id)
+    bond = Asset(name="CDB", asset_type="renda_fixa", family_id=family.id)
+    db.session.add_all([stock, bond])
+    db.session.commit()
+
+    base = datetime(2024, 1, 1, 10)
+    for i in range(7):
+        # Pairs of rows share created_at, so id has to break the ties
+        db.session.add(Transaction(
+            asset_id=stock.id if i % 2 == 0 else bond.id,
+            transaction_type="buy",
+            quantity=1.0 + i,
+            unit_price=10.0,
+            transaction_date=date(2024, 1, 1),
+            created_at=base + timedelta(minutes=i // 2)
+        ))
+    db.session.commit()
+
+    token = create_access_token(identity=str(user.id))
+    return {
+        "stock": stock,
+        "headers": {"Authorization": f"Bearer {token}"}
+    }
+
+
+def walk(client, headers, query):
+    pages = []
+    cursor = ""
+    while cursor is not None:
+        response = client.get(f"/transactions?cursor={cursor}&{query}", headers=headers)
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        pages.append([item["id"] for item in data["items"]])
+        cursor = data["next_cursor"]
+    return pages
+
+
+class TestTransactionCursorPagination:
+    """Test cursor-based listing"""
+
+    def test_pages_follow_created_at_then_id(self, client, db, setup_data):
+        expected = [t.id for t in Transaction.query.order_by(
+            Transaction.created_at.desc(), Transaction.id.desc()).all()]
+
+        pages = walk(client, setup_data["headers"], "limit=3")
+
+        assert [len(page) for page in pages] == [3, 3, 1]
+        assert [i for page in pages for i in page] == expected
+
+    def test_inserts_between_requests_do_not_shift_pages(self, client, db, setup_data):
+        headers = setup_data["headers"]
+        first = json.loads(client.get("/transactions?cursor=&limit=3", headers=headers).data)
+
+        db.session.add(Transaction(asset_id=setup_data["stock"].id, transaction_type="buy", quantity=1.0,
+                                   unit_price=1.0, transaction_date=date(2024, 1, 2),
+                                   created_at=datetime(2024, 2, 1)))
+        db.session.commit()
+
+        second = json.loads(client.get(f"/transactions?cursor={first['next_cursor']}&limit=3", headers=headers).data)
+        first_ids = {item["id"] for item in first["items"]}
+        assert not first_ids & {item["id"] for item in second["items"]}
+        assert len(second["items"]) == 3
+
+    def test_cursor_with_filter(self, client, db, setup_data):
+        stock_id = setup_data["stock"].id
+        pages = walk(client, setup_data["headers"], f"limit=2&asset_id={stock_id}")
+
+        ids = [i for page in pages for i in page]
+        assert len(ids) == 4
+        assert all(db.session.get(Transaction, i).asset_id == stock_id for i in ids)
+
+    def test_offset_listing_is_unchanged(self, client, db, setup_data):
+        response = client.get("/transactions?limit=2&offset=1", headers=setup_data["headers"])
+        data = json.loads(response.data)
+        assert isinstance(data, list)
+        assert len(data) == 2
+
+    def test_invalid_cursor(self, client, db, setup_data):
+        response = client.get("/transactions?cursor=not-a-cursor", headers=setup_data["headers"])
+        assert response.status_code == 400
+
+    def test_cursor_rejects_limit_below_one(self, client, db, setup_data):
+        for limit in ("0", "-5"):
+            response = client.get(f"/transactions?cursor=&limit={limit}", headers=setup_data["headers"])
+            assert response.status_code == 400